@@ -1,17 +1,41 @@
 # app_gui.py
+import multiprocessing
 import tkinter as tk
 from tkinter import ttk, filedialog, messagebox
 
 from compare_core import (
     is_excel,
     get_excel_sheet_names,
-    auto_detect_header_and_load,
+    load_preview,
     index_to_excel_col_letter,
     auto_pick_best_column_index,
     compare_files,
     xlookup_join,
     differences_report,
+    STAGES,
+    PREVIEW_ROWS,
 )
+from worker import BackgroundJob
+
+STAGE_LABELS = {
+    "loading_a": "بارگذاری فایل A",
+    "loading_b": "بارگذاری فایل B",
+    "normalizing": "نرمال‌سازی کلیدها",
+    "joining": "مقایسه / ادغام",
+    "writing": "نوشتن خروجی",
+}
+
+
+def timings_text(res: dict) -> str:
+    # stage breakdown of a finished run for the status bar
+    timings = res.get("timings")
+    if not timings:
+        return ""
+    parts = [f"{STAGE_LABELS.get(stage, stage)} {sec:.1f}s" for stage, sec in timings["stages"].items()]
+    text = f" | {timings['total']:.1f}s: " + "، ".join(parts)
+    if timings.get("peak_mb"):
+        text += f" | حافظه {max(timings['peak_mb'].values()):.0f}MB"
+    return text
 
 class App(tk.Tk):
     def __init__(self):
@@ -30,6 +54,7 @@ class App(tk.Tk):
 
         self.case_insensitive = tk.BooleanVar(value=False)
         self.keep_duplicates = tk.BooleanVar(value=False)  # compare only
+        self.multiset = tk.BooleanVar(value=False)  # compare only
         self.keep_blanks = tk.BooleanVar(value=False)
 
         self.pick_mode = tk.StringVar(value="auto")   # auto | manual
@@ -39,6 +64,7 @@ class App(tk.Tk):
         self.df_b = None
         self.header_note_a = ""
         self.header_note_b = ""
+        self.job = None
 
         self._build_ui()
 
@@ -50,12 +76,16 @@ class App(tk.Tk):
         frm_files.pack(fill="x")
 
         ttk.Label(frm_files, text="فایل A:").grid(row=0, column=0, sticky="w")
-        ttk.Entry(frm_files, textvariable=self.file_a, width=86).grid(row=0, column=1, sticky="we", padx=6)
-        ttk.Button(frm_files, text="انتخاب...", command=self.pick_a).grid(row=0, column=2)
+        entry_a = ttk.Entry(frm_files, textvariable=self.file_a, width=86)
+        entry_a.grid(row=0, column=1, sticky="we", padx=6)
+        pick_a_btn = ttk.Button(frm_files, text="انتخاب...", command=self.pick_a)
+        pick_a_btn.grid(row=0, column=2)
 
         ttk.Label(frm_files, text="فایل B:").grid(row=1, column=0, sticky="w", pady=(8,0))
-        ttk.Entry(frm_files, textvariable=self.file_b, width=86).grid(row=1, column=1, sticky="we", padx=6, pady=(8,0))
-        ttk.Button(frm_files, text="انتخاب...", command=self.pick_b).grid(row=1, column=2, pady=(8,0))
+        entry_b = ttk.Entry(frm_files, textvariable=self.file_b, width=86)
+        entry_b.grid(row=1, column=1, sticky="we", padx=6, pady=(8,0))
+        pick_b_btn = ttk.Button(frm_files, text="انتخاب...", command=self.pick_b)
+        pick_b_btn.grid(row=1, column=2, pady=(8,0))
 
         frm_files.columnconfigure(1, weight=1)
 
@@ -69,6 +99,8 @@ class App(tk.Tk):
         ttk.Label(frm_keys, text="Sheet B:").grid(row=0, column=2, sticky="w")
         self.sheet_b_cb = ttk.Combobox(frm_keys, textvariable=self.sheet_b, width=30, state="readonly")
         self.sheet_b_cb.grid(row=0, column=3, sticky="w", padx=6)
+        self.sheet_a_cb.bind("<<ComboboxSelected>>", lambda e: self.load_and_preview())
+        self.sheet_b_cb.bind("<<ComboboxSelected>>", lambda e: self.load_and_preview())
 
         ttk.Radiobutton(frm_keys, text="Auto (پیشنهادی)", variable=self.pick_mode, value="auto", command=self.refresh_columns).grid(row=1, column=0, sticky="w", pady=(10,0))
         ttk.Radiobutton(frm_keys, text="Manual (انتخاب دستی)", variable=self.pick_mode, value="manual", command=self.refresh_columns).grid(row=1, column=1, sticky="w", pady=(10,0))
@@ -81,7 +113,13 @@ class App(tk.Tk):
         self.col_b_cb = ttk.Combobox(frm_keys, textvariable=self.col_b, width=30, state="readonly")
         self.col_b_cb.grid(row=2, column=3, sticky="w", padx=6, pady=(10,0))
 
-        ttk.Button(frm_keys, text="Load / Preview", command=self.load_and_preview).grid(row=0, column=4, padx=(12,0))
+        self.key_note = ttk.Label(frm_keys, text="", foreground="gray")
+        self.key_note.grid(row=1, column=2, columnspan=3, sticky="w", pady=(10,0))
+
+        load_btn = ttk.Button(frm_keys, text="Load / Preview", command=self.load_and_preview)
+        load_btn.grid(row=0, column=4, padx=(12,0))
+        # inputs that change what is loaded; disabled while a job runs so the preview can't go stale
+        self.input_widgets = [entry_a, pick_a_btn, entry_b, pick_b_btn, self.sheet_a_cb, self.sheet_b_cb, load_btn]
         ttk.Button(frm_keys, text="Refresh Columns", command=self.refresh_columns).grid(row=2, column=4, padx=(12,0), pady=(10,0))
 
         frm_action = ttk.LabelFrame(root, text="نوع عملیات", padding=10)
@@ -108,6 +146,7 @@ class App(tk.Tk):
         ttk.Checkbutton(frm_opts, text="حساس نبودن به حروف بزرگ/کوچک", variable=self.case_insensitive).grid(row=0, column=0, sticky="w")
         ttk.Checkbutton(frm_opts, text="نگه داشتن تکراری‌ها (Occurrences) [Compare]", variable=self.keep_duplicates).grid(row=0, column=1, sticky="w", padx=12)
         ttk.Checkbutton(frm_opts, text="نگه داشتن خالی‌ها", variable=self.keep_blanks).grid(row=0, column=2, sticky="w", padx=12)
+        ttk.Checkbutton(frm_opts, text="شمارش تکرار کلیدها (KeyCounts) [Compare]", variable=self.multiset).grid(row=0, column=3, sticky="w", padx=12)
 
         ttk.Label(frm_opts, text="خروجی (xlsx):").grid(row=1, column=0, sticky="w", pady=(10,0))
         ttk.Entry(frm_opts, textvariable=self.out_path, width=76).grid(row=1, column=1, sticky="w", pady=(10,0))
@@ -116,7 +155,12 @@ class App(tk.Tk):
         frm_run = ttk.Frame(root)
         frm_run.pack(fill="x")
 
-        ttk.Button(frm_run, text="Run", command=self.run_action).pack(side="left")
+        self.run_btn = ttk.Button(frm_run, text="Run", command=self.run_action)
+        self.run_btn.pack(side="left")
+        self.cancel_btn = ttk.Button(frm_run, text="Cancel", command=self.cancel_job, state="disabled")
+        self.cancel_btn.pack(side="left", padx=(6,0))
+        self.progress = ttk.Progressbar(frm_run, mode="determinate", maximum=len(STAGES), length=180)
+        self.progress.pack(side="left", padx=(12,0))
         self.status = ttk.Label(frm_run, text="آماده", anchor="w")
         self.status.pack(side="left", padx=12)
 
@@ -164,20 +208,85 @@ class App(tk.Tk):
                 var.set("")
 
     def load_and_preview(self):
-        try:
-            if self.file_a.get():
-                df, _, mode = auto_detect_header_and_load(self.file_a.get(), self.sheet_a.get() or None)
-                self.df_a = df
-                self.header_note_a = mode
-            if self.file_b.get():
-                df, _, mode = auto_detect_header_and_load(self.file_b.get(), self.sheet_b.get() or None)
-                self.df_b = df
-                self.header_note_b = mode
-
-            self.refresh_columns()
-            self.preview()
-        except Exception as e:
-            messagebox.showerror("خطا", str(e))
+        if self.job is not None:
+            return
+        file_a, sheet_a = self.file_a.get(), self.sheet_a.get() or None
+        file_b, sheet_b = self.file_b.get(), self.sheet_b.get() or None
+
+        def load(progress):
+            # only the header and the first PREVIEW_ROWS rows; Run loads the full sheets
+            loaded = {}
+            for stage, which, path, sheet in (("loading_a", "a", file_a, sheet_a), ("loading_b", "b", file_b, sheet_b)):
+                if path:
+                    progress(stage)
+                    df, header, mode = load_preview(path, sheet)
+                    loaded[which] = (df, mode)
+            return loaded
+
+        self._start_job(load, self._on_loaded)
+
+    def _on_loaded(self, loaded):
+        if "a" in loaded:
+            self.df_a, self.header_note_a = loaded["a"]
+        if "b" in loaded:
+            self.df_b, self.header_note_b = loaded["b"]
+        self.refresh_columns()
+        self.preview()
+        self.status.config(text="آماده")
+
+    def _start_job(self, fn, on_done, **kwargs):
+        self.job = BackgroundJob(fn, **kwargs).start()
+        self._on_job_done = on_done
+        self.progress["value"] = 0
+        self.run_btn.config(state="disabled")
+        self.cancel_btn.config(state="normal")
+        self._set_inputs_state("disabled")
+        self.status.config(text="در حال اجرا...")
+        self.after(100, self._poll_job)
+
+    def _finish_job(self):
+        self.job = None
+        self.run_btn.config(state="normal")
+        self.cancel_btn.config(state="disabled")
+        self._set_inputs_state("normal")
+
+    def _set_inputs_state(self, state):
+        for w in self.input_widgets:
+            if isinstance(w, ttk.Combobox):
+                w.config(state="readonly" if state == "normal" else state)
+            else:
+                w.config(state=state)
+
+    def _poll_job(self):
+        job = self.job
+        if job is None:
+            return
+        while not job.events.empty():
+            kind, payload = job.events.get_nowait()
+            if kind == "stage":
+                self.progress["value"] = STAGES.index(payload)
+                self.status.config(text=f"{STAGE_LABELS.get(payload, payload)}...")
+            elif kind == "done":
+                self.progress["value"] = len(STAGES)
+                self._finish_job()
+                self._on_job_done(payload)
+                return
+            elif kind == "cancelled":
+                self.progress["value"] = 0
+                self._finish_job()
+                self.status.config(text="لغو شد")
+                return
+            else:
+                self._finish_job()
+                self.status.config(text="خطا")
+                messagebox.showerror("خطا", str(payload))
+                return
+        self.after(100, self._poll_job)
+
+    def cancel_job(self):
+        if self.job is not None:
+            self.job.cancel()
+            self.status.config(text="در حال لغو...")
 
     def refresh_columns(self):
         def build_col_list(df):
@@ -201,7 +310,10 @@ class App(tk.Tk):
             if self.df_b is not None and b_list:
                 idx = auto_pick_best_column_index(self.df_b)
                 self.col_b.set(b_list[idx])
+            # the preview holds only the first rows; Run scores the whole sheet and may pick another column
+            self.key_note.config(text=f"پیشنهاد از {PREVIEW_ROWS} ردیف اول (موقت) - Run کلید را از کل شیت انتخاب می‌کند")
         else:
+            self.key_note.config(text="")
             if not self.col_a.get() and a_list:
                 self.col_a.set(a_list[0])
             if not self.col_b.get() and b_list:
@@ -218,6 +330,21 @@ class App(tk.Tk):
             for c in common:
                 self.diffcols_list.insert("end", str(c))
 
+    def show_used_keys(self, res: dict):
+        # auto mode: replace the preview suggestion with the key columns the run actually used
+        if self.pick_mode.get() != "auto":
+            return
+        used = []
+        for side, var, cb in (("a", self.col_a, self.col_a_cb), ("b", self.col_b, self.col_b_cb)):
+            col = res.get(f"col_{side}")
+            if col is None:
+                continue
+            match = [v for v in cb["values"] if self._extract_letter(v) == str(col)]
+            var.set(match[0] if match else str(col))
+            used.append(f"{side.upper()}={var.get()}")
+        if used:
+            self.key_note.config(text="کلید استفاده‌شده در اجرا: " + "  ".join(used))
+
     def _extract_letter(self, combo_value: str):
         if not combo_value:
             return None
@@ -226,86 +353,79 @@ class App(tk.Tk):
     def preview(self):
         self.txt.delete("1.0", "end")
         if self.df_a is not None:
-            self.txt.insert("end", f"=== A ({self.header_note_a}) shape={self.df_a.shape} ===\n")
+            self.txt.insert("end", f"=== A ({self.header_note_a}) first {len(self.df_a)} rows ===\n")
             self.txt.insert("end", f"columns: {list(self.df_a.columns)}\n")
             self.txt.insert("end", self.df_a.head(12).to_string(index=False))
             self.txt.insert("end", "\n\n")
         if self.df_b is not None:
-            self.txt.insert("end", f"=== B ({self.header_note_b}) shape={self.df_b.shape} ===\n")
+            self.txt.insert("end", f"=== B ({self.header_note_b}) first {len(self.df_b)} rows ===\n")
             self.txt.insert("end", f"columns: {list(self.df_b.columns)}\n")
             self.txt.insert("end", self.df_b.head(12).to_string(index=False))
             self.txt.insert("end", "\n")
 
     def run_action(self):
+        if self.job is not None:
+            return
         if not self.file_a.get() or not self.file_b.get():
             messagebox.showwarning("هشدار", "لطفاً هر دو فایل را انتخاب کن.")
             return
 
-        try:
-            key_a = self._extract_letter(self.col_a.get())
-            key_b = self._extract_letter(self.col_b.get())
-
-            self.status.config(text="در حال اجرا...")
-            self.update_idletasks()
-
-            if self.action.get() == "compare":
-                res = compare_files(
-                    file_a=self.file_a.get(),
-                    file_b=self.file_b.get(),
-                    sheet_a=self.sheet_a.get() or None,
-                    sheet_b=self.sheet_b.get() or None,
-                    col_a=key_a if self.pick_mode.get() == "manual" else None,
-                    col_b=key_b if self.pick_mode.get() == "manual" else None,
-                    out_path=self.out_path.get(),
-                    case_insensitive=self.case_insensitive.get(),
-                    keep_duplicates=self.keep_duplicates.get(),
-                    keep_blanks=self.keep_blanks.get(),
-                )
-                self.status.config(text=f"تمام شد | Matched={res['matched']} OnlyInA={res['only_a']} OnlyInB={res['only_b']}")
+        key_a = self._extract_letter(self.col_a.get())
+        key_b = self._extract_letter(self.col_b.get())
+        manual = self.pick_mode.get() == "manual"
+
+        inputs = dict(
+            file_a=self.file_a.get(),
+            file_b=self.file_b.get(),
+            sheet_a=self.sheet_a.get() or None,
+            sheet_b=self.sheet_b.get() or None,
+        )
+        common = dict(
+            col_a=key_a if manual else None,
+            col_b=key_b if manual else None,
+            out_path=self.out_path.get(),
+            case_insensitive=self.case_insensitive.get(),
+            keep_blanks=self.keep_blanks.get(),
+        )
+
+        if self.action.get() == "compare":
+            def on_done(res):
+                self.show_used_keys(res)
+                text = f"تمام شد | Matched={res['matched']} OnlyInA={res['only_a']} OnlyInB={res['only_b']}"
+                text += f" Unbalanced={res['unbalanced_keys']}" if res.get("unbalanced_keys") is not None else ""
+                self.status.config(text=text + timings_text(res))
                 messagebox.showinfo("تمام شد", f"خروجی Compare ساخته شد:\n{res['out']}")
-                return
 
-            if self.action.get() == "lookup":
-                sel_idx = list(self.bcols_list.curselection())
-                selected_cols = [self.bcols_list.get(i) for i in sel_idx] if sel_idx else None
-                res = xlookup_join(
-                    file_a=self.file_a.get(),
-                    file_b=self.file_b.get(),
-                    sheet_a=self.sheet_a.get() or None,
-                    sheet_b=self.sheet_b.get() or None,
-                    col_a=key_a if self.pick_mode.get() == "manual" else None,
-                    col_b=key_b if self.pick_mode.get() == "manual" else None,
-                    b_return_cols=selected_cols,
-                    out_path=self.out_path.get(),
-                    case_insensitive=self.case_insensitive.get(),
-                    keep_blanks=self.keep_blanks.get(),
-                )
-                self.status.config(text=f"تمام شد | NotFound={res['not_found']} | DuplicatesInB={res['dup_rows_in_b']}")
+            self._start_job(
+                compare_files, on_done, **inputs, **common,
+                keep_duplicates=self.keep_duplicates.get(), multiset=self.multiset.get(),
+            )
+            return
+
+        if self.action.get() == "lookup":
+            sel_idx = list(self.bcols_list.curselection())
+            selected_cols = [self.bcols_list.get(i) for i in sel_idx] if sel_idx else None
+
+            def on_done(res):
+                self.show_used_keys(res)
+                self.status.config(text=f"تمام شد | NotFound={res['not_found']} | DuplicatesInB={res['dup_rows_in_b']}" + timings_text(res))
                 messagebox.showinfo("تمام شد", f"خروجی Lookup ساخته شد:\n{res['out']}")
-                return
 
-            # diff
-            sel_idx = list(self.diffcols_list.curselection())
-            selected_cols = [self.diffcols_list.get(i) for i in sel_idx] if sel_idx else None
-            res = differences_report(
-                file_a=self.file_a.get(),
-                file_b=self.file_b.get(),
-                sheet_a=self.sheet_a.get() or None,
-                sheet_b=self.sheet_b.get() or None,
-                col_a=key_a if self.pick_mode.get() == "manual" else None,
-                col_b=key_b if self.pick_mode.get() == "manual" else None,
-                compare_cols=selected_cols,
-                out_path=self.out_path.get(),
-                case_insensitive=self.case_insensitive.get(),
-                keep_blanks=self.keep_blanks.get(),
-            )
-            self.status.config(text=f"تمام شد | Differences={res['differences']} Same={res['same']} NotFound={res['not_found']}")
-            messagebox.showinfo("تمام شد", f"خروجی Differences ساخته شد:\n{res['out']}")
+            self._start_job(xlookup_join, on_done, **inputs, **common, b_return_cols=selected_cols)
+            return
+
+        # diff
+        sel_idx = list(self.diffcols_list.curselection())
+        selected_cols = [self.diffcols_list.get(i) for i in sel_idx] if sel_idx else None
 
-        except Exception as e:
-            self.status.config(text="خطا")
-            messagebox.showerror("خطا", str(e))
+        def on_done(res):
+            self.show_used_keys(res)
+            self.status.config(text=f"تمام شد | Differences={res['differences']} Same={res['same']} NotFound={res['not_found']}" + timings_text(res))
+            messagebox.showinfo("تمام شد", f"خروجی Differences ساخته شد:\n{res['out']}")
 
+        self._start_job(differences_report, on_done, **inputs, **common, compare_cols=selected_cols)
 
 if __name__ == "__main__":
+    # a frozen (PyInstaller) build re-runs this entry point in every load-pool worker
+    multiprocessing.freeze_support()
     App().mainloop()
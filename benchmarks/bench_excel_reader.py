@@ -0,0 +1,99 @@
+# benchmarks/bench_excel_reader.py
+# Sheet load benchmark: the direct XML reader (xlsx_reader) against openpyxl's read-only worksheets.
+#   python benchmarks/bench_excel_reader.py --rows 100000 --cols 12
+#   python benchmarks/bench_excel_reader.py --path big.xlsx    (an existing workbook, first sheet)
+import argparse
+import datetime
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import compare_core  # noqa: E402
+from compare_core import auto_detect_header_and_load, set_excel_reader  # noqa: E402
+from xlsx_writer import StreamWorkbook  # noqa: E402
+
+
+def make_rows(rows: int, cols: int, seed: int = 0):
+    # key, text, amount, date, then integer columns; about one text cell in ten blank
+    rng = np.random.default_rng(seed)
+    words = ["Tehran", "Shiraz", "Tabriz", "Mashhad", "Isfahan", "كرج", "a & b", "x <y>"]
+    base = datetime.datetime(2020, 1, 1)
+    yield ["key", "name", "amount", "date"] + [f"c{j}" for j in range(max(cols - 4, 0))]
+    for i in range(rows):
+        word = words[int(rng.integers(len(words)))] if rng.random() > 0.1 else None
+        yield [
+            f"K{i:08d}",
+            word,
+            round(float(rng.random()) * 1e4, 2),
+            base + datetime.timedelta(days=int(rng.integers(2000))),
+        ] + [int(v) for v in rng.integers(0, 10**6, max(cols - 4, 0))]
+
+
+def write_workbook(path: str, rows: int, cols: int, with_openpyxl: bool) -> None:
+    if with_openpyxl:
+        import openpyxl
+
+        wb = openpyxl.Workbook()
+        ws = wb.active
+        for row in make_rows(rows, cols):
+            ws.append(row)
+        wb.save(path)
+        return
+    with StreamWorkbook(path) as wb:
+        sheet = wb.add_sheet("Data")
+        for row in make_rows(rows, cols):
+            sheet.append(row)
+
+
+def best_of(reader: str, path: str, repeat: int) -> tuple:
+    set_excel_reader(reader)
+    best, out = float("inf"), None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        out = auto_detect_header_and_load(path, None, use_cache=False)
+        best = min(best, time.perf_counter() - t0)
+    return best, out
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--rows", type=int, default=100_000)
+    ap.add_argument("--cols", type=int, default=12)
+    ap.add_argument("--openpyxl-writer", action="store_true", help="write the workbook with openpyxl instead of xlsx_writer")
+    ap.add_argument("--repeat", type=int, default=3)
+    ap.add_argument("--path", default=None, help="benchmark an existing workbook instead")
+    args = ap.parse_args()
+
+    path = args.path
+    tmp = None
+    if path is None:
+        tmp = tempfile.NamedTemporaryFile(suffix=".xlsx", delete=False)
+        tmp.close()
+        path = tmp.name
+        write_workbook(path, args.rows, args.cols, args.openpyxl_writer)
+
+    try:
+        reader = compare_core.EXCEL_READER
+        try:
+            t_old, (df_old, _, _) = best_of("openpyxl", path, args.repeat)
+            t_new, (df_new, _, _) = best_of("fast", path, args.repeat)
+        finally:
+            set_excel_reader(reader)
+    finally:
+        if tmp is not None:
+            os.unlink(tmp.name)
+
+    assert df_old.equals(df_new) and list(df_old.columns) == list(df_new.columns)
+    print(f"rows={len(df_new)} cols={df_new.shape[1]}")
+    print(f"openpyxl read-only     : {t_old:8.3f}s")
+    print(f"direct XML reader      : {t_new:8.3f}s")
+    print(f"speedup                : {t_old / t_new:8.2f}x")
+
+
+if __name__ == "__main__":
+    main()
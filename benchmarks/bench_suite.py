@@ -0,0 +1,348 @@
+# benchmarks/bench_suite.py
+# End-to-end benchmark of compare_files / xlookup_join / differences_report on synthetic A/B inputs.
+# Every (operation, input format) run happens in a fresh process so its peak memory is its own, with the sheet
+# load pool off so parsing happens inside that process too; the timings, per-stage splits and peaks go to a JSON
+# file that later runs can be checked against.
+#   python benchmarks/bench_suite.py --rows 200000 --cols 20 --json bench.json
+#   python benchmarks/bench_suite.py --rows 200000 --cols 20 --baseline bench.json
+import argparse
+import datetime
+import json
+import multiprocessing
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import compare_core  # noqa: E402
+from compare_core import (  # noqa: E402
+    auto_detect_header_and_load,
+    build_keys,
+    compare_files,
+    detect_csv_header,
+    differences_report,
+    is_csv,
+    read_csv,
+    read_excel_raw_grid,
+    resolve_key_column,
+    xlookup_join,
+)
+from xlsx_writer import StreamWorkbook  # noqa: E402
+
+OPERATIONS = {
+    "compare": compare_files,
+    "lookup": xlookup_join,
+    "diff": differences_report,
+}
+INPUT_FORMATS = ("xlsx", "csv")
+# progress stages (compare_core.STAGES) as named in the report
+STAGE_NAMES = {
+    "loading_a": "load_a",
+    "loading_b": "load_b",
+    "normalizing": "key_pick_normalize",
+    "joining": "join",
+    "writing": "write",
+}
+# result dict entries kept as a check that runs did the same work
+RESULT_COUNTS = ("matched", "only_a", "only_b", "not_found", "dup_rows_in_b", "differences", "same")
+WORDS = np.array(["Tehran", "Shiraz", "Tabriz", "Mashhad", "Isfahan", "کرج", "a & b", "x <y>"], dtype=object)
+
+
+def make_inputs(
+    rows: int,
+    cols: int,
+    key_cardinality: float = 1.0,
+    dup_rate: float = 0.01,
+    blank_rate: float = 0.02,
+    diff_rate: float = 0.01,
+    match_rate: float = 0.9,
+    seed: int = 0,
+) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    # A: rows rows over rows*key_cardinality distinct keys. B: match_rate of A's keys plus new ones, dup_rate of
+    # its rows repeating another B key; B's cells differ from A's for the same key at diff_rate, any value
+    # cell is blank at blank_rate. Value columns alternate between small integers and words.
+    rng = np.random.default_rng(seed)
+    n_keys = max(1, int(rows * key_cardinality))
+    keys_a = rng.permutation(n_keys)[np.arange(rows) % n_keys]
+
+    def values(n: int) -> Dict[str, np.ndarray]:
+        out = {}
+        for j in range(cols):
+            if j % 2:
+                out[f"c{j}"] = WORDS[rng.integers(len(WORDS), size=n)]
+            else:
+                out[f"c{j}"] = rng.integers(0, 10_000, size=n).astype(str).astype(object)
+        return out
+
+    # one value row per distinct key, so repeated keys in A carry identical cells
+    base = values(n_keys)
+    shared = rng.permutation(n_keys)[: int(n_keys * match_rate)]
+    b_distinct = np.concatenate([shared, np.arange(n_keys, n_keys + max(rows - len(shared), 0))])[:rows]
+    keys_b = b_distinct[rng.permutation(len(b_distinct))]
+    dup = rng.random(rows) < dup_rate
+    keys_b[dup] = keys_b[rng.integers(rows, size=int(dup.sum()))]
+
+    extra = values(max(rows, 1))
+    df_a = {"key": np.char.add("K", keys_a.astype(str)).astype(object)}
+    df_b = {"key": np.char.add("K", keys_b.astype(str)).astype(object)}
+    in_a = keys_b < n_keys
+    for j, name in enumerate(base):
+        a_col = base[name][keys_a].copy()
+        b_col = extra[name][:rows].copy()
+        b_col[in_a] = base[name][keys_b[in_a]]
+        changed = in_a & (rng.random(rows) < diff_rate)
+        b_col[changed] = np.char.add(b_col[changed].astype(str), "x").astype(object)
+        a_col[rng.random(rows) < blank_rate] = None
+        b_col[rng.random(rows) < blank_rate] = None
+        df_a[name] = a_col
+        df_b[name] = b_col
+    return pd.DataFrame(df_a), pd.DataFrame(df_b)
+
+
+def write_inputs(df_a: pd.DataFrame, df_b: pd.DataFrame, folder: str, formats: List[str]) -> Dict[str, Tuple[str, str]]:
+    paths = {}
+    for fmt in formats:
+        pair = []
+        for side, df in (("a", df_a), ("b", df_b)):
+            path = os.path.join(folder, f"{side}.{fmt}")
+            if fmt == "csv":
+                df.to_csv(path, index=False)
+            else:
+                with StreamWorkbook(path) as wb:
+                    sheet = wb.add_sheet("Data")
+                    sheet.append(list(df.columns))
+                    for row in df.itertuples(index=False, name=None):
+                        sheet.append(row)
+            pair.append(path)
+        paths[fmt] = tuple(pair)
+    return paths
+
+
+def _stage_clock() -> Tuple[Callable[[str], None], List[Tuple[str, float]]]:
+    marks: List[Tuple[str, float]] = []
+    return (lambda stage: marks.append((stage, time.perf_counter()))), marks
+
+
+def _stage_seconds(marks: List[Tuple[str, float]], end: float) -> Dict[str, float]:
+    # each progress mark opens a stage that lasts until the next one (the last until the call returns)
+    out = {}
+    for (stage, t0), (_, t1) in zip(marks, marks[1:] + [("", end)]):
+        name = STAGE_NAMES.get(stage, stage)
+        out[name] = round(out.get(name, 0.0) + t1 - t0, 4)
+    return out
+
+
+def memory_source() -> str:
+    # "resource": peak RSS (Unix); "psutil": peak working set (Windows), else current RSS;
+    # "tracemalloc": peak of Python allocations only (no Arrow buffers), when neither is available
+    try:
+        import resource  # noqa: F401
+        return "resource"
+    except ImportError:
+        pass
+    try:
+        import psutil  # noqa: F401
+        return "psutil"
+    except ImportError:
+        return "tracemalloc"
+
+
+def _peak_rss_mb(source: str) -> float:
+    if source == "resource":
+        import resource
+
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # kilobytes on Linux, bytes on macOS
+        return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+    if source == "psutil":
+        import psutil
+
+        info = psutil.Process().memory_info()
+        return round(getattr(info, "peak_wset", info.rss) / (1024 * 1024), 1)
+    return round(tracemalloc.get_traced_memory()[1] / (1024 * 1024), 1)
+
+
+def _component_seconds(path_a: str, path_b: str) -> Dict[str, float]:
+    # the parts of the loading / normalizing stages, timed on their own: raw read, header detection, key pick,
+    # key normalization
+    out = {"read": 0.0, "header_detection": 0.0}
+    frames = []
+    for path in (path_a, path_b):
+        t0 = time.perf_counter()
+        if is_csv(path):
+            header = detect_csv_header(path)
+            t1 = time.perf_counter()
+            df = read_csv(path, header)
+            t2 = time.perf_counter()
+            out["header_detection"] += t1 - t0
+            out["read"] += t2 - t1
+        else:
+            # the loader reads the grid again; header detection is what it takes on top of that read
+            read_excel_raw_grid(path, None)
+            t1 = time.perf_counter()
+            df = auto_detect_header_and_load(path, None, use_cache=False)[0]
+            t2 = time.perf_counter()
+            out["read"] += t1 - t0
+            out["header_detection"] += max(t2 - t1 - (t1 - t0), 0.0)
+        frames.append(df)
+
+    t0 = time.perf_counter()
+    col_a, _ = resolve_key_column(frames[0], None)
+    col_b, _ = resolve_key_column(frames[1], None)
+    t1 = time.perf_counter()
+    build_keys(frames[0], frames[1], col_a, col_b, False, True)
+    t2 = time.perf_counter()
+    out["key_pick"] = t1 - t0
+    out["normalize"] = t2 - t1
+    return {k: round(v, 4) for k, v in out.items()}
+
+
+def run_case(op: str, fmt: str, path_a: str, path_b: str, out_path: str, use_cache: bool) -> dict:
+    # runs in a fresh process: the operation first (cold caches), then its components one by one.
+    # no load pool: ru_maxrss / the working set would not see the worker processes doing the parsing
+    compare_core.PARALLEL_LOAD = False
+    source = memory_source()
+    if source == "tracemalloc":
+        tracemalloc.start()
+    rss_before = _peak_rss_mb(source)
+    progress, marks = _stage_clock()
+    started = time.perf_counter()
+    result = OPERATIONS[op](path_a, path_b, out_path=out_path, use_cache=use_cache, progress=progress)
+    ended = time.perf_counter()
+    rss_peak = _peak_rss_mb(source)
+
+    arrow_peak = None
+    if compare_core.pyarrow is not None:
+        arrow_peak = round(compare_core.pyarrow.default_memory_pool().max_memory() / (1024 * 1024), 1)
+    return {
+        "op": op,
+        "format": fmt,
+        "seconds": round(ended - started, 4),
+        "stages": _stage_seconds(marks, ended),
+        "components": _component_seconds(path_a, path_b),
+        "peak_rss_mb": rss_peak,
+        "rss_before_mb": rss_before,
+        "memory_source": source,
+        "arrow_peak_mb": arrow_peak,
+        "counts": {k: result[k] for k in RESULT_COUNTS if k in result},
+    }
+
+
+def _git_revision() -> Optional[str]:
+    try:
+        out = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True, timeout=10)
+        return out.stdout.strip() or None
+    except Exception:
+        return None
+
+
+def compare_to_baseline(report: dict, baseline: dict, tolerance: float) -> List[str]:
+    # runs slower (or heavier) than the baseline by more than tolerance; only runs present in both are checked
+    regressions = []
+    old = {(r["op"], r["format"]): r for r in baseline.get("runs", [])}
+    for run in report["runs"]:
+        ref = old.get((run["op"], run["format"]))
+        if ref is None:
+            continue
+        for metric in ("seconds", "peak_rss_mb"):
+            if metric == "peak_rss_mb" and ref.get("memory_source", "resource") != run["memory_source"]:
+                continue
+            if ref.get(metric) and run[metric] > ref[metric] * (1 + tolerance):
+                regressions.append(f"{run['op']}/{run['format']} {metric}: {ref[metric]} -> {run[metric]}")
+    return regressions
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--rows", type=int, default=100_000)
+    ap.add_argument("--cols", type=int, default=10)
+    ap.add_argument("--key-cardinality", type=float, default=1.0, help="distinct keys in A as a share of its rows")
+    ap.add_argument("--dup-rate", type=float, default=0.01, help="share of B rows repeating another B key")
+    ap.add_argument("--blank-rate", type=float, default=0.02)
+    ap.add_argument("--diff-rate", type=float, default=0.01, help="share of B cells differing from A for the same key")
+    ap.add_argument("--match-rate", type=float, default=0.9, help="share of A keys also in B")
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--ops", default=",".join(OPERATIONS), help="comma separated subset of compare,lookup,diff")
+    ap.add_argument("--formats", default=",".join(INPUT_FORMATS), help="comma separated input formats: xlsx,csv")
+    ap.add_argument("--out-format", default="xlsx", choices=compare_core.OUTPUT_FORMATS)
+    ap.add_argument("--cache", action="store_true", help="let the runs use the sheet cache (default: parse every time)")
+    ap.add_argument("--data-dir", default=None, help="keep the generated inputs and outputs here")
+    ap.add_argument("--json", dest="json_path", default=None, help="write the results to this file")
+    ap.add_argument("--baseline", default=None, help="earlier --json output to check for regressions")
+    ap.add_argument("--tolerance", type=float, default=0.2, help="allowed slowdown / growth vs the baseline")
+    args = ap.parse_args()
+
+    ops = [o for o in args.ops.split(",") if o]
+    formats = [f for f in args.formats.split(",") if f]
+    folder = args.data_dir or tempfile.mkdtemp(prefix="compare_bench_")
+    os.makedirs(folder, exist_ok=True)
+    params = {k: getattr(args, k) for k in ("rows", "cols", "key_cardinality", "dup_rate", "blank_rate",
+                                            "diff_rate", "match_rate", "seed", "out_format", "cache")}
+
+    try:
+        t0 = time.perf_counter()
+        df_a, df_b = make_inputs(args.rows, args.cols, args.key_cardinality, args.dup_rate, args.blank_rate,
+                                 args.diff_rate, args.match_rate, args.seed)
+        inputs = write_inputs(df_a, df_b, folder, formats)
+        print(f"inputs: {args.rows} rows x {args.cols + 1} cols in {time.perf_counter() - t0:.1f}s ({folder})",
+              file=sys.stderr)
+
+        runs = []
+        spawn = multiprocessing.get_context("spawn")
+        for fmt in formats:
+            for op in ops:
+                out_path = os.path.join(folder, f"{op}_{fmt}_result.{args.out_format}")
+                with ProcessPoolExecutor(max_workers=1, mp_context=spawn) as pool:
+                    run = pool.submit(run_case, op, fmt, *inputs[fmt], out_path, args.cache).result()
+                runs.append(run)
+                stages = " ".join(f"{k}={v:.2f}" for k, v in run["stages"].items())
+                print(f"{op:8s} {fmt:5s} {run['seconds']:8.2f}s peak {run['peak_rss_mb']:8.1f} MB  {stages}",
+                      file=sys.stderr)
+    finally:
+        if args.data_dir is None:
+            shutil.rmtree(folder, ignore_errors=True)
+
+    report = {
+        "created": datetime.datetime.now().isoformat(timespec="seconds"),
+        "revision": _git_revision(),
+        "python": platform.python_version(),
+        "pandas": pd.__version__,
+        "pyarrow": getattr(compare_core.pyarrow, "__version__", None),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "params": params,
+        "runs": runs,
+    }
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.json_path:
+        with open(args.json_path, "w", encoding="utf-8") as f:
+            f.write(text)
+    else:
+        print(text)
+
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        if baseline.get("params") != params:
+            print("note: the baseline was generated with different parameters", file=sys.stderr)
+        regressions = compare_to_baseline(report, baseline, args.tolerance)
+        for line in regressions:
+            print(f"REGRESSION {line}", file=sys.stderr)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,335 @@
+# cli.py
+# Headless entry point: python cli.py compare|lookup|diff ... or python cli.py batch manifest.yaml
+import argparse
+import functools
+import json
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import List, Optional
+
+import compare_core
+from compare_core import (
+    DATE_GRANULARITIES,
+    FUZZY_THRESHOLD,
+    KEY_DETECTION_MODES,
+    NORMALIZE_STEPS,
+    OUTPUT_FORMATS,
+    STAGES,
+    auto_detect_header_and_load,
+    compare_files,
+    differences_report,
+    parse_sheet_spec,
+    set_instrumentation,
+    set_key_detection_mode,
+    xlookup_join,
+)
+from compare_workbook import FRAME_OPERATIONS, WORKBOOK_PAIRINGS, compare_workbooks
+
+try:
+    import yaml
+except Exception:
+    yaml = None
+
+
+OPERATIONS = {
+    "compare": compare_files,
+    "lookup": xlookup_join,
+    "diff": differences_report,
+}
+# workbook subcommand flags, by the --op whose frame operation takes them
+WORKBOOK_OP_ARGS = {
+    "compare": ("keep_duplicates", "multiset", "fuzzy", "fuzzy_threshold"),
+    "lookup": ("b_return_cols", "fuzzy", "fuzzy_threshold"),
+    "diff": ("compare_cols", "typed", "abs_tol", "rel_tol", "granularity"),
+}
+
+
+def _split_cols(value: Optional[str]) -> Optional[List[str]]:
+    if not value:
+        return None
+    cols = [c.strip() for c in value.split(",") if c.strip()]
+    return cols or None
+
+
+def _key_spec(value: str):
+    cols = _split_cols(value) or []
+    return cols[0] if len(cols) == 1 else (cols or None)
+
+
+def _stderr_progress(stage: str) -> None:
+    print(f"[{STAGES.index(stage) + 1}/{len(STAGES)}] {stage}", file=sys.stderr, flush=True)
+
+
+def _add_common_args(p: argparse.ArgumentParser, default_out: str) -> None:
+    p.add_argument("file_a")
+    p.add_argument("file_b")
+    p.add_argument("--sheet-a", default=None, help="sheet name or 1-based index (default: first sheet)")
+    p.add_argument("--sheet-b", default=None)
+    p.add_argument("--col-a", type=_key_spec, default=None,
+                   help="key column(s): 1-based index, Excel letter or header name, comma separated for a composite key "
+                        "(default: auto)")
+    p.add_argument("--col-b", type=_key_spec, default=None)
+    p.add_argument("--out", dest="out_path", default=default_out)
+    p.add_argument("--format", dest="out_format", choices=OUTPUT_FORMATS, default=None,
+                   help="output format (default: from the --out extension)")
+    p.add_argument("--case-insensitive", action="store_true")
+    p.add_argument("--keep-blanks", action="store_true")
+    p.add_argument("--normalize", type=_split_cols, default=None,
+                   help=f"comma separated extra normalization steps for keys and compared values: {', '.join(NORMALIZE_STEPS)}")
+    p.add_argument("--no-cache", dest="use_cache", action="store_false")
+    p.add_argument("--key-detection", choices=KEY_DETECTION_MODES, default=None,
+                   help="how auto key columns are scored (default: auto, sampled on long sheets)")
+    p.add_argument("--progress", action="store_true", help="print stages to stderr")
+    _add_instrumentation_args(p)
+
+
+def _add_instrumentation_args(p: argparse.ArgumentParser) -> None:
+    p.add_argument("--trace-memory", action="store_true",
+                   help="record tracemalloc peaks per stage in the timings (slower)")
+    p.add_argument("--profile", dest="profile_path", default=None,
+                   help="write a cProfile of the run to this file (pstats format)")
+
+
+def _default(value, optional: bool):
+    # optional: the flag only shows up in the parsed args when given (workbook mode passes it on to the operation)
+    return argparse.SUPPRESS if optional else value
+
+
+def _add_fuzzy_args(p: argparse.ArgumentParser, optional: bool = False) -> None:
+    p.add_argument("--fuzzy", action="store_true", default=_default(False, optional),
+                   help="pair keys left unmatched by near-equal text (case, punctuation, Persian/Arabic letter variants)")
+    p.add_argument("--fuzzy-threshold", type=float, default=_default(FUZZY_THRESHOLD, optional),
+                   help=f"minimum similarity 0..1 for a fuzzy pair (default: {FUZZY_THRESHOLD})")
+
+
+def _add_compare_args(p: argparse.ArgumentParser, optional: bool = False) -> None:
+    p.add_argument("--keep-duplicates", action="store_true", default=_default(False, optional))
+    p.add_argument("--multiset", action="store_true", default=_default(False, optional),
+                   help="add a KeyCounts sheet with count_a, count_b and surplus per key")
+
+
+def _add_lookup_args(p: argparse.ArgumentParser, optional: bool = False) -> None:
+    p.add_argument("--return-cols", dest="b_return_cols", type=_split_cols, default=_default(None, optional),
+                   help="comma separated B columns to bring back (default: all)")
+
+
+def _add_diff_args(p: argparse.ArgumentParser, optional: bool = False) -> None:
+    p.add_argument("--compare-cols", type=_split_cols, default=_default(None, optional),
+                   help="comma separated columns to compare (default: all shared)")
+    p.add_argument("--typed", action="store_true", default=_default(False, optional),
+                   help="compare columns inferred as numbers / dates by value and add DELTA__ columns")
+    p.add_argument("--abs-tol", type=float, default=_default(0.0, optional),
+                   help="absolute tolerance for typed numeric columns")
+    p.add_argument("--rel-tol", type=float, default=_default(0.0, optional),
+                   help="relative tolerance for typed numeric columns")
+    p.add_argument("--granularity", choices=list(DATE_GRANULARITIES), default=_default("day", optional),
+                   help="precision typed date columns are compared at (default: day)")
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="compare_excel", description="Compare / XLOOKUP / Differences without the GUI")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("compare", help="key set comparison (Matched / OnlyInA / OnlyInB)")
+    _add_common_args(p, "compare_result.xlsx")
+    _add_compare_args(p)
+    p.add_argument("--streaming", action="store_true", help="constant-memory engine for large CSV inputs")
+    _add_fuzzy_args(p)
+
+    p = sub.add_parser("lookup", help="XLOOKUP B columns into A")
+    _add_common_args(p, "lookup_result.xlsx")
+    _add_lookup_args(p)
+    p.add_argument("--out-of-core", action="store_true", help="hash-partitioned join spilled to disk")
+    _add_fuzzy_args(p)
+
+    p = sub.add_parser("diff", help="column-by-column differences for matching keys")
+    _add_common_args(p, "diff_result.xlsx")
+    _add_diff_args(p)
+
+    p = sub.add_parser("workbook", help="every sheet of A against its counterpart in B, one consolidated result")
+    p.add_argument("file_a")
+    p.add_argument("file_b")
+    p.add_argument("--op", choices=list(FRAME_OPERATIONS), default="compare")
+    p.add_argument("--pairing", choices=WORKBOOK_PAIRINGS, default="name",
+                   help="pair sheets by name or position, or stack all sheets into one table per side")
+    p.add_argument("--col-a", type=_key_spec, default=None)
+    p.add_argument("--col-b", type=_key_spec, default=None)
+    p.add_argument("--out", dest="out_path", default="workbook_result.xlsx")
+    p.add_argument("--format", dest="out_format", choices=OUTPUT_FORMATS, default=None)
+    p.add_argument("--case-insensitive", action="store_true")
+    p.add_argument("--keep-blanks", action="store_true")
+    p.add_argument("--normalize", type=_split_cols, default=None)
+    p.add_argument("--no-cache", dest="use_cache", action="store_false")
+    p.add_argument("--workers", type=int, default=None, help="processes for the per-sheet comparisons")
+    p.add_argument("--key-detection", choices=KEY_DETECTION_MODES, default=None)
+    p.add_argument("--progress", action="store_true", help="print stages to stderr")
+    _add_instrumentation_args(p)
+    # per --op options; each applies only to the operations listed in WORKBOOK_OP_ARGS
+    _add_compare_args(p, optional=True)
+    _add_lookup_args(p, optional=True)
+    _add_diff_args(p, optional=True)
+    _add_fuzzy_args(p, optional=True)
+
+    p = sub.add_parser("batch", help="run every job of a YAML/JSON manifest")
+    p.add_argument("manifest")
+    p.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    p.add_argument("--progress", action="store_true", help="print each job's stages to stderr")
+    _add_instrumentation_args(p)
+
+    return parser
+
+
+def load_manifest(path: str) -> List[dict]:
+    # either a list of jobs or {"defaults": {...}, "jobs": [...]}; job keys are the core keyword arguments plus "op"
+    with open(path, "r", encoding="utf-8") as f:
+        if os.path.splitext(path.lower())[1] in (".yaml", ".yml"):
+            if yaml is None:
+                raise RuntimeError("PyYAML is required for YAML manifests")
+            doc = yaml.safe_load(f)
+        else:
+            doc = json.load(f)
+
+    if isinstance(doc, list):
+        doc = {"jobs": doc}
+    defaults = doc.get("defaults") or {}
+    jobs = []
+    for i, entry in enumerate(doc.get("jobs") or [], start=1):
+        job = {**defaults, **entry}
+        op = job.get("op")
+        if op not in OPERATIONS:
+            raise ValueError(f"Job {i}: unknown op {op!r} (expected one of {', '.join(OPERATIONS)})")
+        for key in ("file_a", "file_b"):
+            if not job.get(key):
+                raise ValueError(f"Job {i}: {key} is required")
+        job.setdefault("name", f"{op}_{i}")
+        jobs.append(job)
+    return jobs
+
+
+def _loads_whole_sheet(job: dict) -> bool:
+    return job.get("use_cache", True) and not job.get("streaming") and not job.get("out_of_core")
+
+
+def distinct_inputs(jobs: List[dict]) -> List[tuple]:
+    seen = []
+    for job in jobs:
+        if not _loads_whole_sheet(job):
+            continue
+        for file_key, sheet_key in (("file_a", "sheet_a"), ("file_b", "sheet_b")):
+            item = (job[file_key], job.get(sheet_key))
+            if item not in seen:
+                seen.append(item)
+    return seen
+
+
+def _job_progress(name: str, stage: str) -> None:
+    print(f"{name} [{STAGES.index(stage) + 1}/{len(STAGES)}] {stage}", file=sys.stderr, flush=True)
+
+
+def _init_batch_worker(trace_memory: bool = False, profile_path: Optional[str] = None) -> None:
+    # the batch already spreads jobs over processes; no nested load pools inside them
+    compare_core.PARALLEL_LOAD = False
+    set_instrumentation(trace_memory, profile_path)
+
+
+def _warm_input(path: str, sheet: Optional[str]) -> None:
+    auto_detect_header_and_load(path, parse_sheet_spec(sheet), use_cache=True)
+
+
+def _run_job(job: dict, progress: bool = False) -> dict:
+    kwargs = {k: v for k, v in job.items() if k not in ("op", "name", "key_detection")}
+    if progress:
+        kwargs["progress"] = functools.partial(_job_progress, job["name"])
+    key_detection = compare_core.KEY_DETECTION_MODE
+    profile_path = compare_core.PROFILE_PATH
+    started = time.perf_counter()
+    try:
+        set_key_detection_mode(job.get("key_detection") or key_detection)
+        if profile_path:
+            # one profile per job: run.prof -> run.<job name>.prof
+            root, ext = os.path.splitext(profile_path)
+            compare_core.PROFILE_PATH = f"{root}.{job['name']}{ext}"
+        result = OPERATIONS[job["op"]](**kwargs)
+    except Exception as e:
+        return {"name": job["name"], "op": job["op"], "status": "error", "error": f"{type(e).__name__}: {e}",
+                "seconds": round(time.perf_counter() - started, 3)}
+    finally:
+        # pool workers are reused across jobs
+        compare_core.KEY_DETECTION_MODE = key_detection
+        compare_core.PROFILE_PATH = profile_path
+    return {"name": job["name"], "op": job["op"], "status": "ok", "result": result,
+            "seconds": round(time.perf_counter() - started, 3)}
+
+
+def run_batch(
+    jobs: List[dict],
+    workers: int,
+    progress: bool = False,
+    trace_memory: bool = False,
+    profile_path: Optional[str] = None,
+) -> dict:
+    started = time.perf_counter()
+    workers = max(1, workers)
+    with ProcessPoolExecutor(
+        max_workers=workers, initializer=_init_batch_worker, initargs=(trace_memory, profile_path)
+    ) as pool:
+        # every distinct input is parsed once into the sheet cache; the jobs then load it from there
+        warm = [pool.submit(_warm_input, path, sheet) for path, sheet in distinct_inputs(jobs)]
+        for fut in as_completed(warm):
+            try:
+                fut.result()
+            except Exception:
+                pass  # the job that reads this input reports the error
+        futures = [pool.submit(_run_job, job, progress) for job in jobs]
+        results = [fut.result() for fut in futures]
+
+    failed = sum(1 for r in results if r["status"] != "ok")
+    return {
+        "jobs": results,
+        "ok": len(results) - failed,
+        "failed": failed,
+        "workers": workers,
+        "seconds": round(time.perf_counter() - started, 3),
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = build_parser()
+    args = vars(parser.parse_args(argv))
+    command = args.pop("command")
+
+    if command == "batch":
+        summary = run_batch(
+            load_manifest(args["manifest"]), args["workers"],
+            progress=args["progress"], trace_memory=args["trace_memory"], profile_path=args["profile_path"],
+        )
+        print(json.dumps(summary, ensure_ascii=False, indent=2, default=str))
+        return 1 if summary["failed"] else 0
+
+    key_detection = args.pop("key_detection")
+    if key_detection:
+        set_key_detection_mode(key_detection)
+    trace_memory, profile_path = args.pop("trace_memory"), args.pop("profile_path")
+    if trace_memory or profile_path:
+        set_instrumentation(trace_memory, profile_path)
+    if args.pop("progress"):
+        args["progress"] = _stderr_progress
+    if command == "workbook":
+        given = {dest for names in WORKBOOK_OP_ARGS.values() for dest in names if dest in args}
+        stray = sorted(given.difference(WORKBOOK_OP_ARGS[args["op"]]))
+        if stray:
+            flags = ", ".join("--" + ("return-cols" if d == "b_return_cols" else d.replace("_", "-")) for d in stray)
+            parser.error(f"not used by --op {args['op']}: {flags}")
+        result = compare_workbooks(**args)
+    else:
+        result = OPERATIONS[command](**args)
+    print(json.dumps(result, ensure_ascii=False, indent=2, default=str))
+    return 0
+
+
+if __name__ == "__main__":
+    multiprocessing.freeze_support()
+    sys.exit(main())
@@ -1,15 +1,306 @@
 # compare_core.py
+import contextlib
+import cProfile
+import csv
+import datetime
+import functools
+import hashlib
+import math
+import json
 import os
 import re
-from typing import Optional, Union, Tuple, List
-
+import tempfile
+import time
+import tracemalloc
+import weakref
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from decimal import MAX_EMAX, MIN_EMIN, Context, Decimal
+from concurrent.futures.process import BrokenProcessPool
+from typing import Callable, Dict, Iterable, Iterator, Optional, Union, Tuple, List
+
+import numpy as np
 import pandas as pd
+from pandas.errors import EmptyDataError
+from pandas.io.parsers import TextParser
+
+from xlsx_writer import STYLE_HEADER, StreamWorkbook
 
 try:
     import openpyxl
 except Exception:
     openpyxl = None
 
+try:
+    import xlsx_reader
+except Exception:
+    xlsx_reader = None
+
+try:
+    import pyarrow
+    import pyarrow.feather as feather
+    import pyarrow.ipc
+    import pyarrow.parquet as parquet
+except Exception:
+    pyarrow = None
+    feather = None
+    parquet = None
+
+
+_EXCEL_ERROR_CODES = {"#NULL!", "#DIV/0!", "#VALUE!", "#REF!", "#NAME?", "#NUM!", "#N/A", "#GETTING_DATA"}
+
+# "pyarrow" keeps loaded cells in Arrow string arrays (strip/lower/compare run as Arrow kernels);
+# "python" is pandas' object-backed StringDtype
+STRING_STORAGE = os.environ.get("COMPARE_EXCEL_STRING_STORAGE", "pyarrow" if pyarrow is not None else "python")
+
+# xlsx sheets: "fast" parses the sheet XML directly (xlsx_reader), "openpyxl" goes through openpyxl's
+# read-only worksheets; both produce the same grid. .xls and layouts the fast reader rejects use openpyxl / pandas
+EXCEL_READERS = ("fast", "openpyxl")
+EXCEL_READER = os.environ.get("COMPARE_EXCEL_READER", "fast")
+
+EXCEL_MAX_ROWS = 1_048_576
+WRITE_CHUNK_ROWS = 50_000
+
+# result sets go to one xlsx workbook, or to a directory holding one <sheet>.csv / <sheet>.parquet per sheet
+OUTPUT_FORMATS = ("xlsx", "csv", "parquet")
+_OUTPUT_EXTENSIONS = {".xlsx": "xlsx", ".xlsm": "xlsx", ".csv": "csv", ".parquet": "parquet", ".pq": "parquet"}
+
+# key detection: "exact" scores every row, "sample" scores the head plus a seeded uniform sample,
+# "auto" samples only sheets longer than KEY_SAMPLE_ROWS
+KEY_DETECTION_MODES = ("auto", "exact", "sample")
+KEY_DETECTION_MODE = os.environ.get("COMPARE_EXCEL_KEY_DETECTION", "auto")
+KEY_SAMPLE_ROWS = 20_000
+KEY_SAMPLE_HEAD = 1_000
+
+PREVIEW_ROWS = 200
+
+# composite keys are shown in output sheets as their parts joined with this
+KEY_SEPARATOR = " | "
+# minimum similarity (0..1) for a fuzzy key pair
+FUZZY_THRESHOLD = 0.85
+
+# normalization steps for keys and compared values; they always run in this order. "strip" is always on,
+# "lower" comes from case_insensitive (keys only), the rest are opted into with normalize=[...]
+NORMALIZE_STEPS = ("nfkc", "digits", "whitespace", "strip", "lower", "leading_zeros", "numeric")
+# steps with no Arrow kernel; columns using them are normalized once per distinct value
+_PER_VALUE_STEPS = ("digits", "numeric")
+# normalized Arrow-backed columns kept for reuse by later operations on the same frame
+NORMALIZE_CACHE_SIZE = 32
+_normalized_columns: "OrderedDict[tuple, tuple]" = OrderedDict()
+DIGIT_FOLD = {
+    **{chr(0x0660 + d): str(d) for d in range(10)},  # Arabic-Indic digits
+    **{chr(0x06F0 + d): str(d) for d in range(10)},  # Persian digits
+    "\u066b": ".",  # Arabic decimal separator
+}
+_DIGIT_TABLE = str.maketrans(DIGIT_FOLD)
+_NUMBER = r"[+-]?(?:\d+\.?\d*|\.\d+)(?:[eE][+-]?\d+)?"
+
+# typed differences: columns whose sampled values are (nearly) all numbers or dates are compared as such,
+# numbers within abs_tol / rel_tol, dates at DATE_GRANULARITIES[granularity]; other cells stay text
+DATE_GRANULARITIES = {"year": "Y", "month": "M", "day": "D", "hour": "h", "minute": "m", "second": "s"}
+TYPED_MIN_SHARE = 0.95
+_EXCEL_EPOCH = pd.Timestamp("1899-12-30")
+_EXCEL_MAX_SERIAL = 2_958_466  # 9999-12-31
+
+STAGES = ("loading_a", "loading_b", "normalizing", "joining", "writing")
+# every operation times its stages; TRACE_MEMORY adds tracemalloc peaks per stage (slows the run down),
+# PROFILE_PATH dumps a cProfile of the whole operation there (pstats format)
+TRACE_MEMORY = os.environ.get("COMPARE_EXCEL_TRACE_MEMORY", "0") == "1"
+PROFILE_PATH = os.environ.get("COMPARE_EXCEL_PROFILE") or None
+
+SHEET_CACHE_DIR = os.environ.get(
+    "COMPARE_EXCEL_CACHE_DIR", os.path.join(os.path.expanduser("~"), ".cache", "compare_excel")
+)
+SHEET_CACHE_MAX_BYTES = int(os.environ.get("COMPARE_EXCEL_CACHE_MAX_BYTES", 1024 * 1024 * 1024))
+_SHEET_CACHE_VERSION = 2
+# .pkl: data files of version 1 entries, still cleaned up by eviction and invalidation
+_CACHE_ENTRY_EXTS = (".meta", ".feather", ".pkl")
+# column label types the JSON cache meta tags and restores (anything else is not cached)
+_LABEL_TYPES = {"datetime": datetime.datetime, "date": datetime.date, "time": datetime.time}
+# temp files left by a writer that died mid-store are removed by eviction after this long
+_STALE_TMP_SECONDS = 3600
+CONTENT_HASH_CACHE_SIZE = 256
+_content_hashes: "OrderedDict[Tuple[str, int, int], str]" = OrderedDict()
+
+# sheets that miss the cache are parsed in worker processes and sent back as Arrow IPC streams
+LOAD_WORKERS = int(os.environ.get("COMPARE_EXCEL_LOAD_WORKERS", min(4, os.cpu_count() or 1)))
+PARALLEL_LOAD = LOAD_WORKERS > 1 and os.environ.get("COMPARE_EXCEL_PARALLEL_LOAD", "1") != "0"
+_load_pool: Optional[ProcessPoolExecutor] = None
+
+
+def string_dtype() -> pd.StringDtype:
+    storage = STRING_STORAGE if pyarrow is not None else "python"
+    return pd.StringDtype(storage)
+
+
+def set_string_storage(storage: str) -> None:
+    global STRING_STORAGE
+    if storage not in ("pyarrow", "python"):
+        raise ValueError(f"Unknown string storage: {storage}")
+    if storage == "pyarrow" and pyarrow is None:
+        raise RuntimeError("pyarrow is not installed")
+    STRING_STORAGE = storage
+
+
+def set_excel_reader(reader: str) -> None:
+    global EXCEL_READER
+    if reader not in EXCEL_READERS:
+        raise ValueError(f"Unknown Excel reader: {reader}")
+    EXCEL_READER = reader
+
+
+def set_instrumentation(trace_memory: bool = False, profile_path: Optional[str] = None) -> None:
+    global TRACE_MEMORY, PROFILE_PATH
+    TRACE_MEMORY = bool(trace_memory)
+    PROFILE_PATH = profile_path or None
+
+
+def set_key_detection_mode(mode: str) -> None:
+    global KEY_DETECTION_MODE
+    if mode not in KEY_DETECTION_MODES:
+        raise ValueError(f"Unknown key detection mode: {mode}")
+    KEY_DETECTION_MODE = mode
+
+
+KeySpec = Union[str, List[str], None]
+
+
+class JobCancelled(Exception):
+    pass
+
+
+def report_stage(progress: Optional[Callable[[str], None]], stage: str) -> None:
+    if progress is not None:
+        progress(stage)
+
+
+class StageTimer:
+    # progress callback that closes the running stage on every report before passing it on;
+    # sections time named steps inside a stage (key detection)
+    def __init__(self, progress: Optional[Callable[[str], None]] = None) -> None:
+        self.progress = progress
+        self.stages: Dict[str, float] = {}
+        self.sections: Dict[str, float] = {}
+        self.peaks: Dict[str, float] = {}
+        self.rows: Dict[str, int] = {}
+        self.profile_path = PROFILE_PATH
+        self._stage: Optional[str] = None
+        self._started = self._stage_started = time.perf_counter()
+        self._owns_tracing = TRACE_MEMORY and not tracemalloc.is_tracing()
+        self.trace_memory = TRACE_MEMORY and (self._owns_tracing or tracemalloc.is_tracing())
+        if self._owns_tracing:
+            tracemalloc.start()
+        if self.trace_memory:
+            tracemalloc.reset_peak()
+        self._arrow_start = pyarrow.total_allocated_bytes() if pyarrow is not None else 0
+        self._arrow_peak = self._arrow_start
+        self._profile = None
+        if self.profile_path:
+            self._profile = cProfile.Profile()
+            self._profile.enable()
+        self._total: Optional[float] = None
+
+    def __call__(self, stage: str) -> None:
+        self._close_stage()
+        self._stage = stage
+        report_stage(self.progress, stage)
+
+    def _close_stage(self) -> None:
+        now = time.perf_counter()
+        if self._stage is not None:
+            self.stages[self._stage] = self.stages.get(self._stage, 0.0) + now - self._stage_started
+            if self.trace_memory:
+                peak = tracemalloc.get_traced_memory()[1] / 2**20
+                self.peaks[self._stage] = max(self.peaks.get(self._stage, 0.0), peak)
+                tracemalloc.reset_peak()
+        if pyarrow is not None:
+            self._arrow_peak = max(self._arrow_peak, pyarrow.total_allocated_bytes())
+        self._stage_started = now
+
+    @contextlib.contextmanager
+    def section(self, name: str) -> Iterator[None]:
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.sections[name] = self.sections.get(name, 0.0) + time.perf_counter() - started
+
+    def note_rows(self, **counts: int) -> None:
+        self.rows.update({k: int(v) for k, v in counts.items()})
+
+    def close(self) -> None:
+        if self._total is not None:
+            return
+        self._close_stage()
+        self._stage = None
+        self._total = time.perf_counter() - self._started
+        if self._profile is not None:
+            self._profile.disable()
+            self._profile.dump_stats(self.profile_path)
+        if self._owns_tracing:
+            tracemalloc.stop()
+
+    def meta_items(self) -> List[Tuple[str, str]]:
+        # stages finished so far; Meta is built inside the writing stage, so its time is only in report()
+        items = [(f"seconds_{stage}", f"{sec:.3f}") for stage, sec in self.stages.items()]
+        items += [(f"seconds_{name}", f"{sec:.3f}") for name, sec in self.sections.items()]
+        items += [(f"rows_{name}", str(n)) for name, n in self.rows.items()]
+        items += [(f"peak_mb_{stage}", f"{mb:.1f}") for stage, mb in self.peaks.items()]
+        return items
+
+    def report(self) -> dict:
+        out = {
+            "stages": {stage: round(sec, 3) for stage, sec in self.stages.items()},
+            "sections": {name: round(sec, 3) for name, sec in self.sections.items()},
+            "total": round(self._total if self._total is not None else time.perf_counter() - self._started, 3),
+            "rows": dict(self.rows),
+        }
+        if self.trace_memory:
+            out["peak_mb"] = {stage: round(mb, 1) for stage, mb in self.peaks.items()}
+        if pyarrow is not None:
+            out["arrow_peak_mb"] = round((self._arrow_peak - self._arrow_start) / 2**20, 1)
+        if self.profile_path:
+            out["profile"] = self.profile_path
+        return out
+
+
+def instrumented(fn: Callable[..., dict]) -> Callable[..., dict]:
+    # runs an operation under its own StageTimer and adds the report to the result as "timings";
+    # an operation called by another one with a StageTimer as progress reports into that one
+    @functools.wraps(fn)
+    def run(*args, progress: Optional[Callable[[str], None]] = None, **kwargs) -> dict:
+        if isinstance(progress, StageTimer):
+            return fn(*args, progress=progress, **kwargs)
+        timer = StageTimer(progress)
+        try:
+            result = fn(*args, progress=timer, **kwargs)
+        finally:
+            timer.close()
+        result["timings"] = timer.report()
+        return result
+
+    return run
+
+
+def timed_section(progress: Optional[Callable[[str], None]], name: str):
+    return progress.section(name) if isinstance(progress, StageTimer) else contextlib.nullcontext()
+
+
+def note_rows(progress: Optional[Callable[[str], None]], **counts: int) -> None:
+    if isinstance(progress, StageTimer):
+        progress.note_rows(**counts)
+
+
+def stage_meta_items(progress: Optional[Callable[[str], None]]) -> List[Tuple[str, str]]:
+    return progress.meta_items() if isinstance(progress, StageTimer) else []
+
+
+def with_stage_meta(meta: pd.DataFrame, progress: Optional[Callable[[str], None]]) -> pd.DataFrame:
+    items = stage_meta_items(progress)
+    if not items:
+        return meta
+    return pd.concat([meta, pd.DataFrame(items, columns=["item", "value"])], ignore_index=True)
+
 
 def is_excel(path: str) -> bool:
     return os.path.splitext(path.lower())[1] in [".xlsx", ".xlsm", ".xls"]
@@ -50,7 +341,16 @@ def parse_sheet_spec(sheet: Optional[str]) -> Union[str, int, None]:
     return sh
 
 
+def _fast_xlsx(path: str) -> bool:
+    return xlsx_reader is not None and EXCEL_READER == "fast" and os.path.splitext(path.lower())[1] in (".xlsx", ".xlsm")
+
+
 def get_excel_sheet_names(path: str) -> List[str]:
+    if _fast_xlsx(path):
+        try:
+            return xlsx_reader.read_sheet_names(path)
+        except xlsx_reader.XlsxLayoutError:
+            pass
     if openpyxl is None:
         return pd.ExcelFile(path).sheet_names
     wb = openpyxl.load_workbook(path, read_only=True, data_only=True)
@@ -61,6 +361,14 @@ def get_excel_sheet_names(path: str) -> List[str]:
 
 
 def get_excel_last_col_letter(path: str, sheet: Union[str, int, None]) -> Optional[str]:
+    if _fast_xlsx(path):
+        try:
+            with xlsx_reader.XlsxPackage(path) as pkg:
+                max_col = pkg.dimension_max_column(sheet)
+            if max_col:
+                return index_to_excel_col_letter(max_col - 1)
+        except xlsx_reader.XlsxLayoutError:
+            pass
     if openpyxl is None:
         return None
     wb = openpyxl.load_workbook(path, read_only=True, data_only=True)
@@ -78,16 +386,19 @@ def get_excel_last_col_letter(path: str, sheet: Union[str, int, None]) -> Option
 
 
 def read_excel_auto_usecols(path: str, sheet: Union[str, int, None], header: Optional[int]) -> pd.DataFrame:
-    last = get_excel_last_col_letter(path, sheet)
-    usecols = f"A:{last}" if last else None
-    return pd.read_excel(path, sheet_name=sheet, header=header, usecols=usecols, engine="openpyxl", dtype="string")
+    # the grid already stops at the last column holding data
+    return frame_from_grid(read_excel_raw_grid(path, sheet), header)
 
 
-def read_csv(path: str, header: Optional[int]) -> pd.DataFrame:
+def _read_csv_any_encoding(path: str, **kwargs) -> pd.DataFrame:
     try:
-        return pd.read_csv(path, header=header, encoding="utf-8-sig", dtype="string")
+        return pd.read_csv(path, encoding="utf-8-sig", **kwargs)
     except UnicodeDecodeError:
-        return pd.read_csv(path, header=header, encoding="cp1256", dtype="string")
+        return pd.read_csv(path, encoding="cp1256", **kwargs)
+
+
+def read_csv(path: str, header: Optional[int]) -> pd.DataFrame:
+    return _read_csv_any_encoding(path, header=header, dtype=string_dtype())
 
 
 def looks_like_bad_header(cols: List[object]) -> bool:
@@ -103,57 +414,585 @@ def looks_like_bad_header(cols: List[object]) -> bool:
     return (bad / max(1, len(cols))) >= 0.5
 
 
-def auto_detect_header_and_load(path: str, sheet: Union[str, int, None]) -> Tuple[pd.DataFrame, Optional[int], str]:
-    if is_csv(path):
-        df0 = read_csv(path, header=0)
-        dfN = read_csv(path, header=None)
-    else:
-        df0 = read_excel_auto_usecols(path, sheet, header=0)
-        dfN = read_excel_auto_usecols(path, sheet, header=None)
+def read_excel_raw_grid(path: str, sheet: Union[str, int, None], max_rows: Optional[int] = None) -> List[list]:
+    if _fast_xlsx(path):
+        try:
+            with xlsx_reader.XlsxPackage(path) as pkg:
+                return _grid_from_rows(pkg.iter_rows(sheet, max_rows))
+        except xlsx_reader.XlsxLayoutError:
+            pass
+    if openpyxl is None or os.path.splitext(path.lower())[1] == ".xls":
+        raw = pd.read_excel(path, sheet_name=0 if sheet is None else sheet, header=None, dtype=object, nrows=max_rows)
+        return raw.astype(object).where(raw.notna(), "").values.tolist()
+
+    wb = openpyxl.load_workbook(path, read_only=True, data_only=True)
+    try:
+        if sheet is None:
+            ws = wb.worksheets[0]
+        elif isinstance(sheet, int):
+            ws = wb.worksheets[sheet]
+        else:
+            ws = wb[sheet]
+        return _worksheet_grid(ws, max_rows)
+    finally:
+        wb.close()
+
 
-    score0 = (0 if looks_like_bad_header(list(df0.columns)) else 2) + min(df0.shape[1], 20) / 20
-    scoreN = (2 if looks_like_bad_header(list(df0.columns)) else 0) + min(dfN.shape[1], 20) / 20
+def read_workbook_grids(path: str, sheets: Optional[List[str]] = None) -> List[Tuple[str, List[list]]]:
+    # every requested sheet (default: all) from one open of the workbook, in workbook order
+    if _fast_xlsx(path):
+        try:
+            with xlsx_reader.XlsxPackage(path) as pkg:
+                wanted = pkg.sheet_names if sheets is None else [n for n in pkg.sheet_names if n in sheets]
+                return [(name, _grid_from_rows(pkg.iter_rows(name))) for name in wanted]
+        except xlsx_reader.XlsxLayoutError:
+            pass
+    if openpyxl is None or os.path.splitext(path.lower())[1] == ".xls":
+        raw = pd.read_excel(path, sheet_name=sheets if sheets is not None else None, header=None, dtype=object)
+        return [(name, df.astype(object).where(df.notna(), "").values.tolist()) for name, df in raw.items()]
+
+    wb = openpyxl.load_workbook(path, read_only=True, data_only=True)
+    try:
+        wanted = wb.sheetnames if sheets is None else [n for n in wb.sheetnames if n in sheets]
+        return [(name, _worksheet_grid(wb[name])) for name in wanted]
+    finally:
+        wb.close()
+
+
+def _worksheet_grid(ws, max_rows: Optional[int] = None) -> List[list]:
+    ws.reset_dimensions()
+    return _grid_from_rows(ws.iter_rows(max_row=max_rows, values_only=True))
+
+
+def _grid_from_rows(rows: Iterable[Iterable[object]]) -> List[list]:
+    # same cell conversion as pandas' openpyxl reader, without building cell objects
+    data = []
+    last_row_with_data = -1
+    for row_number, row in enumerate(rows):
+        converted = []
+        for v in row:
+            if v is None:
+                converted.append("")
+            elif isinstance(v, float) and v.is_integer():
+                converted.append(int(v))
+            elif isinstance(v, str) and v in _EXCEL_ERROR_CODES:
+                converted.append(float("nan"))
+            else:
+                converted.append(v)
+        while converted and converted[-1] == "":
+            converted.pop()
+        if converted:
+            last_row_with_data = row_number
+        data.append(converted)
+
+    data = data[: last_row_with_data + 1]
+    if data:
+        width = max(len(r) for r in data)
+        data = [r + [""] * (width - len(r)) if len(r) < width else r for r in data]
+    return data
+
+
+def frame_from_grid(data: List[list], header: Optional[int]) -> pd.DataFrame:
+    if not data:
+        return pd.DataFrame()
+    try:
+        parser = TextParser(data, header=header, dtype=string_dtype(), skip_blank_lines=False)
+        return parser.read()
+    except EmptyDataError:
+        return pd.DataFrame()
+
+
+def _header_scores(header_cols: List[object], ncols_0: int, ncols_n: int) -> Tuple[float, float]:
+    bad = looks_like_bad_header(header_cols)
+    score0 = (0 if bad else 2) + min(ncols_0, 20) / 20
+    scoreN = (2 if bad else 0) + min(ncols_n, 20) / 20
+    return score0, scoreN
+
+
+def detect_csv_header(path: str) -> Optional[int]:
+    try:
+        head0 = _read_csv_any_encoding(path, header=0, nrows=0, dtype=string_dtype())
+        cols0 = list(head0.columns)
+    except EmptyDataError:
+        cols0 = []
+    headN = _read_csv_any_encoding(path, header=None, nrows=1, dtype=string_dtype()) if cols0 else pd.DataFrame()
+    score0, scoreN = _header_scores(cols0, len(cols0), headN.shape[1])
+    return None if scoreN > score0 else 0
+
+
+def auto_detect_header_and_load(
+    path: str, sheet: Union[str, int, None], use_cache: bool = False
+) -> Tuple[pd.DataFrame, Optional[int], str]:
+    if use_cache:
+        hit = load_cached_sheet(path, sheet)
+        if hit is not None:
+            return hit
+        loaded = auto_detect_header_and_load(path, sheet, use_cache=False)
+        store_cached_sheet(path, sheet, *loaded)
+        return loaded
+
+    if is_csv(path):
+        header = detect_csv_header(path)
+        return read_csv(path, header=header), header, "header_0" if header == 0 else "no_header"
+
+    # one pass over the workbook; header candidates are scored on the in-memory grid
+    return _frame_with_detected_header(read_excel_raw_grid(path, sheet))
+
+
+def load_workbook_sheets(path: str, use_cache: bool = True) -> List[Tuple[str, pd.DataFrame, Optional[int], str]]:
+    # every sheet with its detected header; sheets missing from the cache are parsed in one open of the workbook
+    if not is_excel(path):
+        raise ValueError(f"Workbook mode needs an Excel file: {path}")
+    names = get_excel_sheet_names(path)
+    loaded = {name: load_cached_sheet(path, name) for name in names} if use_cache else {}
+    misses = [name for name in names if loaded.get(name) is None]
+    if misses:
+        for name, grid in read_workbook_grids(path, misses):
+            loaded[name] = _frame_with_detected_header(grid)
+            if use_cache:
+                store_cached_sheet(path, name, *loaded[name])
+    return [(name, *loaded[name]) for name in names]
+
+
+def _frame_with_detected_header(data: List[list]) -> Tuple[pd.DataFrame, Optional[int], str]:
+    head0 = frame_from_grid(data[:1], header=0)
+    cols0 = list(head0.columns)
+    width = len(data[0]) if data else 0
+    score0, scoreN = _header_scores(cols0, len(cols0), width)
 
     if scoreN > score0:
-        return dfN, None, "no_header"
-    return df0, 0, "header_0"
+        return frame_from_grid(data, header=None), None, "no_header"
+    return frame_from_grid(data, header=0), 0, "header_0"
 
 
-def normalize_values(series: pd.Series, case_insensitive: bool, drop_blanks: bool) -> pd.Series:
-    s = series.astype("string").copy().str.strip()
-    if case_insensitive:
-        s = s.str.lower()
-    if drop_blanks:
-        s = s.replace("", pd.NA)
-    return s
+def load_preview(
+    path: str, sheet: Union[str, int, None], nrows: int = PREVIEW_ROWS
+) -> Tuple[pd.DataFrame, Optional[int], str]:
+    # header detection as in auto_detect_header_and_load, but only the first nrows data rows are read
+    if is_csv(path):
+        header = detect_csv_header(path)
+        df = _read_csv_any_encoding(path, header=header, nrows=nrows, dtype=string_dtype())
+        return df, header, "header_0" if header == 0 else "no_header"
 
+    df, header, mode = _frame_with_detected_header(read_excel_raw_grid(path, sheet, max_rows=nrows + 1))
+    return df.head(nrows), header, mode
 
-def auto_pick_best_column_index(df: pd.DataFrame) -> int:
-    best_idx = 0
-    best_score = -1.0
-    nrows = len(df)
-    if nrows == 0:
+
+def file_content_hash(path: str) -> str:
+    # memoized per (path, size, mtime): every sheet of a workbook shares the file's hash
+    st = os.stat(path)
+    memo = (os.path.abspath(path), st.st_size, st.st_mtime_ns)
+    if memo in _content_hashes:
+        _content_hashes.move_to_end(memo)
+        return _content_hashes[memo]
+    h = hashlib.blake2b(digest_size=20)
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            h.update(chunk)
+    _content_hashes[memo] = h.hexdigest()
+    while len(_content_hashes) > CONTENT_HASH_CACHE_SIZE:
+        _content_hashes.popitem(last=False)
+    return _content_hashes[memo]
+
+
+def _cache_path_prefix(path: str) -> str:
+    return hashlib.blake2b(os.path.abspath(path).encode("utf-8"), digest_size=8).hexdigest()
+
+
+def sheet_cache_key(path: str, sheet: Union[str, int, None]) -> str:
+    st = os.stat(path)
+    spec = f"{_SHEET_CACHE_VERSION}|{st.st_size}|{st.st_mtime_ns}|{file_content_hash(path)}|{type(sheet).__name__}:{sheet}"
+    key = hashlib.blake2b(spec.encode("utf-8"), digest_size=16).hexdigest()
+    return f"{_cache_path_prefix(path)}-{key}"
+
+
+def _cache_entry_files(key: str) -> List[str]:
+    return [os.path.join(SHEET_CACHE_DIR, key + ext) for ext in _CACHE_ENTRY_EXTS]
+
+
+def _write_replace(final_path: str, write: Callable[[str], None]) -> None:
+    # every writer gets its own temp file: batch / workbook workers may store the same entry at once
+    fd, tmp = tempfile.mkstemp(dir=SHEET_CACHE_DIR, suffix=".tmp")
+    os.close(fd)
+    try:
+        write(tmp)
+        os.replace(tmp, final_path)
+    except BaseException:
+        try:
+            os.remove(tmp)
+        except OSError:
+            pass
+        raise
+
+
+def _label_to_json(label: object) -> object:
+    # str / int / float / bool / None as they are, dates and times as {"datetime": iso}; TypeError otherwise
+    if label is None or isinstance(label, (str, int, float)):
+        return label
+    for name, kind in _LABEL_TYPES.items():
+        if type(label) is kind:
+            return {name: label.isoformat()}
+    raise TypeError(f"Column label of type {type(label).__name__} is not cached")
+
+
+def _label_from_json(value: object) -> object:
+    if isinstance(value, dict):
+        (name, text), = value.items()
+        return _LABEL_TYPES[name].fromisoformat(text)
+    return value
+
+
+def load_cached_sheet(path: str, sheet: Union[str, int, None]) -> Optional[Tuple[pd.DataFrame, Optional[int], str]]:
+    # entries are plain JSON plus Feather, never unpickled: the cache directory may be shared and writable by others
+    if feather is None:
+        return None
+    try:
+        key = sheet_cache_key(path, sheet)
+    except OSError:
+        return None
+    meta_path, feather_path, _ = _cache_entry_files(key)
+    if not os.path.exists(meta_path):
+        return None
+
+    try:
+        with open(meta_path, "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        df = feather.read_table(feather_path).to_pandas().astype(string_dtype())
+        df.columns = pd.Index([_label_from_json(c) for c in meta["columns"]], dtype=object)
+    except Exception:
+        invalidate_sheet_cache(key=key)
+        return None
+
+    # LRU: a hit refreshes the entry's mtime (another process may have evicted it meanwhile)
+    for p in (meta_path, feather_path):
+        try:
+            os.utime(p, None)
+        except OSError:
+            pass
+    return df, meta["header"], meta["mode"]
+
+
+def store_cached_sheet(path: str, sheet: Union[str, int, None], df: pd.DataFrame, header: Optional[int], mode: str) -> None:
+    if feather is None:
+        return
+    try:
+        key = sheet_cache_key(path, sheet)
+        os.makedirs(SHEET_CACHE_DIR, exist_ok=True)
+    except OSError:
+        return
+    meta_path, feather_path, _ = _cache_entry_files(key)
+
+    data = df.reset_index(drop=True)
+    data.columns = [f"c{i}" for i in range(data.shape[1])]
+
+    # keys are content addressed, so concurrent writers of one entry write the same data; a failed store
+    # leaves at most a data file without meta, which loads ignore and eviction removes
+    try:
+        meta = json.dumps(
+            {
+                "columns": [_label_to_json(c) for c in df.columns],
+                "header": header,
+                "mode": mode,
+                "source": os.path.abspath(path),
+            },
+            ensure_ascii=False,
+        )
+
+        def _dump_meta(tmp: str) -> None:
+            with open(tmp, "w", encoding="utf-8") as f:
+                f.write(meta)
+
+        _write_replace(feather_path, lambda tmp: feather.write_feather(data, tmp, compression="lz4"))
+        _write_replace(meta_path, _dump_meta)
+        evict_sheet_cache()
+    except Exception:
+        return
+
+
+def evict_sheet_cache(max_bytes: Optional[int] = None) -> int:
+    max_bytes = SHEET_CACHE_MAX_BYTES if max_bytes is None else max_bytes
+    if not os.path.isdir(SHEET_CACHE_DIR):
+        return 0
+
+    entries = {}
+    now = time.time()
+    for name in os.listdir(SHEET_CACHE_DIR):
+        key, ext = os.path.splitext(name)
+        full = os.path.join(SHEET_CACHE_DIR, name)
+        try:
+            st = os.stat(full)
+            if ext == ".tmp" and now - st.st_mtime > _STALE_TMP_SECONDS:
+                os.remove(full)
+        except OSError:
+            # removed by another process in the meantime
+            continue
+        if ext not in _CACHE_ENTRY_EXTS:
+            continue
+        size, used = entries.get(key, (0, 0.0))
+        entries[key] = (size + st.st_size, max(used, st.st_mtime))
+
+    total = sum(size for size, _ in entries.values())
+    removed = 0
+    for key, (size, _) in sorted(entries.items(), key=lambda kv: kv[1][1]):
+        if total <= max_bytes:
+            break
+        invalidate_sheet_cache(key=key)
+        total -= size
+        removed += 1
+    return removed
+
+
+def invalidate_sheet_cache(path: Optional[str] = None, key: Optional[str] = None) -> int:
+    if not os.path.isdir(SHEET_CACHE_DIR):
         return 0
+    if key is not None:
+        prefix = key
+    elif path is not None:
+        prefix = _cache_path_prefix(path) + "-"
+    else:
+        prefix = ""
+
+    removed = 0
+    for name in os.listdir(SHEET_CACHE_DIR):
+        # complete entry files only; temp files belong to writers still in flight
+        if name.startswith(prefix) and os.path.splitext(name)[1] in _CACHE_ENTRY_EXTS:
+            try:
+                os.remove(os.path.join(SHEET_CACHE_DIR, name))
+                removed += 1
+            except OSError:
+                pass
+    return removed
+
+
+def normalize_steps(case_insensitive: bool = False, normalize: Optional[Iterable[str]] = None) -> Tuple[str, ...]:
+    chosen = {"strip", *(normalize or ())}
+    if case_insensitive:
+        chosen.add("lower")
+    unknown = chosen.difference(NORMALIZE_STEPS)
+    if unknown:
+        raise ValueError(f"Unknown normalization step(s): {', '.join(sorted(unknown))}")
+    return tuple(step for step in NORMALIZE_STEPS if step in chosen)
+
+
+def _canonical_number(text: str) -> str:
+    # exact decimal form: "1.0" -> "1", "1.50" -> "1.5", "1e3" -> "1000", "-0" -> "0"; text outside what
+    # Decimal can hold ("1e99999999999999999999") is kept as is
+    try:
+        d = Decimal(text)
+        if not d:
+            return "0"
+        # every digit kept and no exponent limit, so normalizing never rounds, overflows or underflows
+        d = d.normalize(Context(prec=len(d.as_tuple().digits), Emax=MAX_EMAX, Emin=MIN_EMIN))
+    except ArithmeticError:
+        return text
+    return format(d, "f") if -30 <= d.adjusted() <= 30 else str(d)
+
+
+def _canonical_numbers(s: pd.Series) -> pd.Series:
+    numeric = s.str.fullmatch(_NUMBER).to_numpy(dtype=bool, na_value=False)
+    if not numeric.any():
+        return s
+    values = s.to_numpy(dtype=object)
+    rows = np.flatnonzero(numeric)
+    values[rows] = [_canonical_number(v) for v in values[rows]]
+    return pd.Series(values, index=s.index, name=s.name, dtype=s.dtype)
+
+
+_NORMALIZE_FUNCS = {
+    "nfkc": lambda s: s.str.normalize("NFKC"),
+    "digits": lambda s: s.str.translate(_DIGIT_TABLE),
+    "whitespace": lambda s: s.str.replace(r"\s+", " ", regex=True),
+    "strip": lambda s: s.str.strip(),
+    "lower": lambda s: s.str.lower(),
+    "leading_zeros": lambda s: s.str.replace(r"^([+-]?)0+(\d+(?:\.\d*)?)$", r"\1\2", regex=True),
+    "numeric": _canonical_numbers,
+}
+
+
+@functools.lru_cache(maxsize=None)
+def compile_normalizer(steps: Tuple[str, ...]) -> Callable[[pd.Series], pd.Series]:
+    # string Series -> normalized string Series. Pipelines with Python-level steps run on the distinct
+    # values and are mapped back by code, so a rule costs one pass over the uniques, not over every row
+    funcs = [_NORMALIZE_FUNCS[step] for step in steps]
+
+    def run(s: pd.Series) -> pd.Series:
+        for f in funcs:
+            s = f(s)
+        return s
+
+    if not any(step in _PER_VALUE_STEPS for step in steps):
+        return run
+
+    def run_distinct(s: pd.Series) -> pd.Series:
+        codes, uniques = s.array.factorize()
+        done = run(pd.Series(uniques, dtype=s.dtype)).array
+        return pd.Series(done.take(codes, allow_fill=True), index=s.index, name=s.name)
+
+    return run_distinct
+
+
+def _arrow_source(s: pd.Series):
+    # Arrow buffers are immutable and an in-place write swaps the chunked array, so its identity is a safe cache key
+    if s.dtype.storage != "pyarrow":
+        return None
+    return s.array.__arrow_array__()
+
 
+def normalize_column(series: pd.Series, steps: Tuple[str, ...], drop_blanks: bool = False) -> pd.Series:
+    s = series.astype(string_dtype())
+    source = _arrow_source(s)
+    key = (id(source), steps, drop_blanks)
+    if source is not None:
+        hit = _normalized_columns.get(key)
+        if hit is not None and hit[0]() is source:
+            _normalized_columns.move_to_end(key)
+            return pd.Series(hit[1], index=series.index, name=series.name)
+
+    out = compile_normalizer(steps)(s)
+    if drop_blanks:
+        out = out.replace("", pd.NA)
+
+    if source is not None:
+        for k in [k for k, (ref, _) in _normalized_columns.items() if ref() is None]:
+            del _normalized_columns[k]
+        _normalized_columns[key] = (weakref.ref(source), out.array)
+        while len(_normalized_columns) > NORMALIZE_CACHE_SIZE:
+            _normalized_columns.popitem(last=False)
+    return out
+
+
+def normalize_values(
+    series: pd.Series, case_insensitive: bool, drop_blanks: bool, normalize: Optional[Iterable[str]] = None
+) -> pd.Series:
+    return normalize_column(series, normalize_steps(case_insensitive, normalize), drop_blanks)
+
+
+def sample_rows(df: pd.DataFrame, size: int = KEY_SAMPLE_ROWS, head: int = KEY_SAMPLE_HEAD, seed: int = 0) -> pd.DataFrame:
+    # the first `head` rows plus a uniform sample of the rest, kept in sheet order
+    if len(df) <= size:
+        return df
+    rest = np.random.default_rng(seed).choice(np.arange(head, len(df)), size=size - head, replace=False)
+    return df.iloc[np.concatenate([np.arange(head), np.sort(rest)])]
+
+
+def estimate_distinct(values: pd.Series, population: float) -> float:
+    # Haas-Stokes Duj1 estimator: scales the sample's distinct count by how many values were seen once
+    n = len(values)
+    if n == 0 or population <= n:
+        return float(values.nunique())
+    counts = values.value_counts(sort=False)
+    d = len(counts)
+    f1 = int((counts == 1).sum())
+    q = n / population
+    est = d / max(1 - (1 - q) * f1 / n, 1e-12)
+    return float(min(max(est, d), population))
+
+
+def _key_scores(df: pd.DataFrame, nrows: int, sampled: bool) -> List[Tuple[float, int]]:
+    scores = []
+    n = len(df)
     for i in range(df.shape[1]):
-        col = df.iloc[:, i].astype("string").str.strip()
+        col = df.iloc[:, i].astype(string_dtype()).str.strip()
         non_null = col.dropna()
         nn = len(non_null)
         if nn == 0:
             continue
-        non_null_ratio = nn / nrows
-        uniq = non_null.nunique(dropna=True)
+        non_null_ratio = nn / n
+        if sampled:
+            nn = non_null_ratio * nrows
+            uniq = estimate_distinct(non_null, nn)
+        else:
+            uniq = non_null.nunique(dropna=True)
         unique_ratio = uniq / max(1, nn)
 
         if non_null_ratio < 0.2 and nn < 10:
             continue
 
-        score = (non_null_ratio * 0.6) + (unique_ratio * 0.4)
-        if score > best_score:
-            best_score = score
-            best_idx = i
+        scores.append(((non_null_ratio * 0.6) + (unique_ratio * 0.4), i))
+    return scores
+
+
+def detect_key_column(df: pd.DataFrame, mode: Optional[str] = None) -> Tuple[int, float]:
+    # returns (column index, confidence); confidence is the chance the winner still beats the
+    # runner-up given the sampling error of the scores, 1.0 when every row was scored
+    mode = mode or KEY_DETECTION_MODE
+    if mode not in KEY_DETECTION_MODES:
+        raise ValueError(f"Unknown key detection mode: {mode}")
+    nrows = len(df)
+    if nrows == 0:
+        return 0, 1.0
+
+    sampled = mode == "sample" or (mode == "auto" and nrows > KEY_SAMPLE_ROWS)
+    sample = sample_rows(df) if sampled else df
+    sampled = sampled and len(sample) < nrows
+    scores = _key_scores(sample, nrows, sampled)
+    if not scores:
+        return 0, 1.0
+
+    # first best column wins ties, like the full scan
+    best_score, best_idx = max(scores, key=lambda si: (si[0], -si[1]))
+    if not sampled or len(scores) == 1:
+        return best_idx, 1.0
+    runner_up = max(score for score, i in scores if i != best_idx)
+    se = 0.5 / math.sqrt(len(sample))
+    confidence = 0.5 * (1 + math.erf((best_score - runner_up) / (2 * se)))
+    return best_idx, round(confidence, 4)
+
+
+def auto_pick_best_column_index(df: pd.DataFrame, mode: Optional[str] = None) -> int:
+    return detect_key_column(df, mode)[0]
+
+
+def resolve_key_column(df: pd.DataFrame, col: KeySpec) -> Tuple[KeySpec, Optional[float]]:
+    if col:
+        return col, None
+    idx, confidence = detect_key_column(df)
+    return index_to_excel_col_letter(idx), confidence
+
+
+def key_counts(norm_a: pd.Series, norm_b: pd.Series) -> pd.DataFrame:
+    # multiset view of the keys: occurrences of every distinct key on each side (one factorize over A and B,
+    # then a bincount per side), surplus = count_a - count_b; sorted in code point order
+    codes, uniq = pd.factorize(pd.concat([norm_a, norm_b], ignore_index=True))
+    codes_a, codes_b = codes[: len(norm_a)], codes[len(norm_a):]
+    counts = pd.DataFrame(
+        {
+            "key": pd.Series(uniq, dtype=norm_a.dtype),
+            "count_a": np.bincount(codes_a[codes_a >= 0], minlength=len(uniq)),
+            "count_b": np.bincount(codes_b[codes_b >= 0], minlength=len(uniq)),
+        }
+    )
+    counts["surplus"] = counts["count_a"] - counts["count_b"]
+    return counts.sort_values("key", kind="stable").reset_index(drop=True)
+
+
+def key_set_ops(
+    norm_a: pd.Series, norm_b: pd.Series, counts: Optional[pd.DataFrame] = None
+) -> Tuple[pd.Series, pd.Series, pd.Series]:
+    # (matched, only in A, only in B) distinct keys, sorted in code point order (what sorted() on the old
+    # Python sets produced); read off key_counts, which one sort of the distinct keys serves for all three
+    if counts is None:
+        counts = key_counts(norm_a, norm_b)
+    in_a = counts["count_a"].to_numpy() > 0
+    in_b = counts["count_b"].to_numpy() > 0
+    return tuple(counts["key"][mask].reset_index(drop=True) for mask in (in_a & in_b, ~in_b, ~in_a))
+
+
+def check_tolerance(abs_tol: float, rel_tol: float, granularity: str) -> None:
+    if abs_tol < 0 or rel_tol < 0:
+        raise ValueError("abs_tol and rel_tol must not be negative")
+    if granularity not in DATE_GRANULARITIES:
+        raise ValueError(f"Unknown date granularity: {granularity} (expected one of {', '.join(DATE_GRANULARITIES)})")
+
 
-    return best_idx
+def check_fuzzy_threshold(fuzzy: bool, threshold: float) -> None:
+    if fuzzy and not 0 < threshold <= 1:
+        raise ValueError(f"fuzzy_threshold must be in (0, 1], got {threshold!r}")
+
+
+def _single_fuzzy_key(col_a: KeySpec, col_b: KeySpec) -> None:
+    if len(key_columns(col_a)) > 1 or len(key_columns(col_b)) > 1:
+        raise ValueError("Fuzzy matching needs a single key column on each side")
 
 
 def pick_series_by_index_or_name(df: pd.DataFrame, spec: str) -> pd.Series:
@@ -169,99 +1008,500 @@ def pick_series_by_index_or_name(df: pd.DataFrame, spec: str) -> pd.Series:
     raise KeyError(f"Column not found: {spec}")
 
 
-def compare_files(
+def key_columns(col: KeySpec) -> List[str]:
+    if not col:
+        return []
+    if isinstance(col, (list, tuple)):
+        return [str(c) for c in col]
+    return [col]
+
+
+def _composite_codes(parts_a: List[pd.Series], parts_b: List[pd.Series]) -> Tuple[np.ndarray, np.ndarray]:
+    # one dense int64 id per distinct tuple of parts over A and B together, -1 where any part is NA.
+    # ids come from hash-table factorization, so equal ids always mean equal strings
+    n_a = len(parts_a[0])
+    combined = None
+    for pa, pb in zip(parts_a, parts_b):
+        codes, uniq = pd.factorize(pd.concat([pa, pb], ignore_index=True))
+        codes = codes.astype(np.int64)
+        if combined is None:
+            combined = codes
+            continue
+        valid = (combined >= 0) & (codes >= 0)
+        pair = combined[valid] * len(uniq) + codes[valid]
+        combined = np.full(len(codes), -1, dtype=np.int64)
+        combined[valid] = pd.factorize(pair)[0]
+    return combined[:n_a], combined[n_a:]
+
+
+def _joined_parts(parts: List[pd.Series], rows: np.ndarray, sep: str) -> pd.Series:
+    taken = [p.take(rows).reset_index(drop=True) for p in parts]
+    return taken[0].str.cat(taken[1:], sep=sep)
+
+
+def build_keys(
+    df_a: pd.DataFrame,
+    df_b: pd.DataFrame,
+    col_a: KeySpec,
+    col_b: KeySpec,
+    case_insensitive: bool,
+    drop_blanks: bool,
+    normalize: Optional[Iterable[str]] = None,
+) -> Tuple[pd.Series, pd.Series, Optional[Callable[[pd.Series], pd.Series]]]:
+    # single column: the normalized strings, as before. Several columns: a nullable Int64 id of the
+    # normalized parts (NA when any part is NA) and a function that renders ids as "part | part" for output
+    cols_a, cols_b = key_columns(col_a), key_columns(col_b)
+    if len(cols_a) != len(cols_b):
+        raise ValueError("col_a and col_b must name the same number of key columns")
+    steps = normalize_steps(case_insensitive, normalize)
+    parts_a = [normalize_column(pick_series_by_index_or_name(df_a, c), steps, drop_blanks) for c in cols_a]
+    parts_b = [normalize_column(pick_series_by_index_or_name(df_b, c), steps, drop_blanks) for c in cols_b]
+    if len(parts_a) == 1:
+        return parts_a[0], parts_b[0], None
+
+    codes_a, codes_b = _composite_codes(parts_a, parts_b)
+    key_a = pd.Series(pd.arrays.IntegerArray(codes_a, codes_a < 0), index=df_a.index)
+    key_b = pd.Series(pd.arrays.IntegerArray(codes_b, codes_b < 0), index=df_b.index)
+
+    def label(keys: pd.Series) -> pd.Series:
+        # render from the first A row carrying each id, else the first B row
+        out = pd.Series(pd.NA, index=range(len(keys)), dtype=string_dtype())
+        wanted = keys.reset_index(drop=True)
+        for codes, parts in ((codes_a, parts_a), (codes_b, parts_b)):
+            todo = np.flatnonzero(out.isna().to_numpy(dtype=bool) & wanted.notna().to_numpy(dtype=bool))
+            if not todo.size:
+                break
+            rows = np.flatnonzero(codes >= 0)
+            first = pd.Series(rows, index=codes[rows])
+            first = first[~first.index.duplicated()]
+            pos = first.reindex(wanted.take(todo).to_numpy(dtype=np.int64)).to_numpy()
+            hit = ~np.isnan(pos)
+            if hit.any():
+                out.iloc[todo[hit]] = _joined_parts(parts, pos[hit].astype(np.int64), KEY_SEPARATOR).to_numpy()
+        return out
+
+    return key_a, key_b, label
+
+
+def _column_cells(ser: pd.Series) -> list:
+    values = ser.astype(object)
+    return values.where(ser.notna(), None).tolist()
+
+
+def frame_rows(df: pd.DataFrame) -> Iterator[tuple]:
+    # converts a bounded slice at a time so the whole frame never exists twice as Python objects
+    for start in range(0, len(df), WRITE_CHUNK_ROWS):
+        part = df.iloc[start:start + WRITE_CHUNK_ROWS]
+        yield from zip(*[_column_cells(part.iloc[:, j]) for j in range(part.shape[1])])
+
+
+def write_sheet_rows(wb: StreamWorkbook, name: str, header: List[object], rows: Iterable[tuple]) -> List[str]:
+    # rows past Excel's limit continue on name_2, name_3, ... with the header repeated
+    header = [None if pd.isna(label) else label for label in header]
+    names = []
+    ws = None
+    for row in rows:
+        if ws is None or ws.rows >= EXCEL_MAX_ROWS:
+            names.append(name if not names else f"{name}_{len(names) + 1}")
+            ws = wb.add_sheet(names[-1])
+            ws.append(header, style=STYLE_HEADER)
+        ws.append(row)
+    if ws is None:
+        names.append(name)
+        wb.add_sheet(name).append(header, style=STYLE_HEADER)
+    return names
+
+
+def resolve_output_format(out_path: str, out_format: Optional[str] = None) -> str:
+    if out_format:
+        fmt = out_format.lower().lstrip(".")
+    else:
+        ext = os.path.splitext(out_path.rstrip("/\\"))[1].lower()
+        fmt = _OUTPUT_EXTENSIONS.get(ext, "xlsx")
+    if fmt not in OUTPUT_FORMATS:
+        raise ValueError(f"Unknown output format: {out_format}")
+    if fmt == "parquet" and parquet is None:
+        raise RuntimeError("pyarrow is required for Parquet output")
+    return fmt
+
+
+def _column_labels(header: List[object]) -> List[str]:
+    # csv/parquet need unique string labels; blank headers get pandas' "Unnamed: n"
+    labels, seen = [], set()
+    for i, label in enumerate(header):
+        name = f"Unnamed: {i}" if label is None or pd.isna(label) else str(label)
+        base, n = name, 1
+        while name in seen:
+            name = f"{base}.{n}"
+            n += 1
+        seen.add(name)
+        labels.append(name)
+    return labels
+
+
+def _write_rows_csv(path: str, header: List[object], rows: Iterable[tuple]) -> None:
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(_column_labels(header))
+        writer.writerows(rows)
+
+
+def _rows_table(batch: List[tuple], schema) -> "pyarrow.Table":
+    columns = [pyarrow.array([None if v is None else str(v) for v in col], type=pyarrow.string()) for col in zip(*batch)]
+    return pyarrow.Table.from_arrays(columns, schema=schema)
+
+
+def _write_rows_parquet(path: str, header: List[object], rows: Iterable[tuple]) -> None:
+    # row sinks only carry keys and loaded cells, so every column is written as string
+    schema = pyarrow.schema([(label, pyarrow.string()) for label in _column_labels(header)])
+    with parquet.ParquetWriter(path, schema) as writer:
+        batch = []
+        for row in rows:
+            batch.append(row)
+            if len(batch) >= WRITE_CHUNK_ROWS:
+                writer.write_table(_rows_table(batch, schema))
+                batch = []
+        if batch:
+            writer.write_table(_rows_table(batch, schema))
+
+
+def write_result_rows(
+    out_path: str, sheets: List[Tuple[str, List[object], Iterable[tuple]]], out_format: Optional[str] = None
+) -> List[str]:
+    fmt = resolve_output_format(out_path, out_format)
+    if fmt == "xlsx":
+        written = []
+        with StreamWorkbook(out_path) as wb:
+            for name, header, rows in sheets:
+                written += write_sheet_rows(wb, name, header, rows)
+        return written
+    os.makedirs(out_path, exist_ok=True)
+    write = _write_rows_csv if fmt == "csv" else _write_rows_parquet
+    for name, header, rows in sheets:
+        write(os.path.join(out_path, f"{name}.{fmt}"), header, rows)
+    return [name for name, _, _ in sheets]
+
+
+def write_result_sets(out_path: str, sheets: List[Tuple[str, pd.DataFrame]], out_format: Optional[str] = None) -> List[str]:
+    fmt = resolve_output_format(out_path, out_format)
+    if fmt == "xlsx":
+        return write_result_rows(out_path, [(name, list(df.columns), frame_rows(df)) for name, df in sheets], fmt)
+    # frames go through pandas/arrow's columnar writers, no per-cell Python work
+    os.makedirs(out_path, exist_ok=True)
+    for name, df in sheets:
+        out = df.set_axis(_column_labels(list(df.columns)), axis=1)
+        path = os.path.join(out_path, f"{name}.{fmt}")
+        if fmt == "csv":
+            out.to_csv(path, index=False, encoding="utf-8")
+        else:
+            parquet.write_table(pyarrow.Table.from_pandas(out, preserve_index=False), path)
+    return [name for name, _ in sheets]
+
+
+def _parse_sheet_ipc(path: str, sheet: Union[str, int, None]) -> Tuple[bytes, List[object], Optional[int], str]:
+    # runs in a worker process; column labels travel separately, like the sheet cache stores them
+    df, header, mode = auto_detect_header_and_load(path, sheet, use_cache=False)
+    data = df.reset_index(drop=True)
+    data.columns = [f"c{i}" for i in range(data.shape[1])]
+    table = pyarrow.Table.from_pandas(data, preserve_index=False)
+    sink = pyarrow.BufferOutputStream()
+    with pyarrow.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes(), list(df.columns), header, mode
+
+
+def _frame_from_ipc(payload: bytes, columns: List[object]) -> pd.DataFrame:
+    table = pyarrow.ipc.open_stream(payload).read_all()
+    dtype = string_dtype()
+    df = table.to_pandas(types_mapper=lambda t: dtype if pyarrow.types.is_string(t) or pyarrow.types.is_large_string(t) else None)
+    df.columns = pd.Index(columns, dtype=object)
+    return df
+
+
+def _get_load_pool() -> ProcessPoolExecutor:
+    global _load_pool
+    if _load_pool is None:
+        _load_pool = ProcessPoolExecutor(max_workers=LOAD_WORKERS)
+    return _load_pool
+
+
+def _shutdown_load_pool() -> None:
+    global _load_pool
+    if _load_pool is not None:
+        _load_pool.shutdown(wait=False, cancel_futures=True)
+        _load_pool = None
+
+
+def iter_loaded_sheets(
+    items: List[Tuple[str, Union[str, int, None]]], use_cache: bool = True, parallel: Optional[bool] = None
+) -> Iterator[Tuple[pd.DataFrame, Optional[int], str]]:
+    # yields auto_detect_header_and_load() results in the order of items; cache misses are parsed concurrently
+    parallel = PARALLEL_LOAD if parallel is None else parallel
+    hits = [load_cached_sheet(path, sheet) if use_cache else None for path, sheet in items]
+    misses = [i for i, hit in enumerate(hits) if hit is None]
+    if not parallel or pyarrow is None or len(misses) < 2:
+        for (path, sheet), hit in zip(items, hits):
+            yield hit if hit is not None else auto_detect_header_and_load(path, sheet, use_cache=use_cache)
+        return
+
+    try:
+        pool = _get_load_pool()
+        futures = {i: pool.submit(_parse_sheet_ipc, *items[i]) for i in misses}
+    except (BrokenProcessPool, RuntimeError, OSError):
+        _shutdown_load_pool()
+        futures = {}
+    try:
+        for i, (path, sheet) in enumerate(items):
+            if hits[i] is not None:
+                yield hits[i]
+                continue
+            loaded = None
+            if i in futures:
+                try:
+                    payload, columns, header, mode = futures[i].result()
+                    loaded = _frame_from_ipc(payload, columns), header, mode
+                except BrokenProcessPool:
+                    _shutdown_load_pool()
+            if loaded is None:
+                loaded = auto_detect_header_and_load(path, sheet, use_cache=False)
+            if use_cache:
+                store_cached_sheet(path, sheet, *loaded)
+            yield loaded
+    finally:
+        for fut in futures.values():
+            fut.cancel()
+
+
+def frame_source(
+    file: str = "<DataFrame>", sheet: Union[str, int, None] = None, header: Optional[int] = None, header_mode: str = "given"
+) -> dict:
+    return {"file": file, "sheet": sheet, "header": header, "header_mode": header_mode}
+
+
+def load_pair(
     file_a: str,
     file_b: str,
     sheet_a: Optional[str] = None,
     sheet_b: Optional[str] = None,
-    col_a: Optional[str] = None,
-    col_b: Optional[str] = None,
+    use_cache: bool = True,
+    progress: Optional[Callable[[str], None]] = None,
+    parallel: Optional[bool] = None,
+) -> Tuple[pd.DataFrame, pd.DataFrame, dict, dict]:
+    loads = iter_loaded_sheets(
+        [(file_a, parse_sheet_spec(sheet_a)), (file_b, parse_sheet_spec(sheet_b))], use_cache=use_cache, parallel=parallel
+    )
+    try:
+        report_stage(progress, "loading_a")
+        df_a, header_a, header_mode_a = next(loads)
+        report_stage(progress, "loading_b")
+        df_b, header_b, header_mode_b = next(loads)
+    finally:
+        loads.close()
+    return (
+        df_a,
+        df_b,
+        frame_source(file_a, sheet_a, header_a, header_mode_a),
+        frame_source(file_b, sheet_b, header_b, header_mode_b),
+    )
+
+
+@instrumented
+def compare_frames(
+    df_a: pd.DataFrame,
+    df_b: pd.DataFrame,
+    col_a: KeySpec = None,
+    col_b: KeySpec = None,
     out_path: str = "compare_result.xlsx",
+    out_format: Optional[str] = None,
     case_insensitive: bool = False,
     keep_duplicates: bool = False,
+    multiset: bool = False,
     keep_blanks: bool = False,
+    normalize: Optional[List[str]] = None,
+    fuzzy: bool = False,
+    fuzzy_threshold: float = FUZZY_THRESHOLD,
+    source_a: Optional[dict] = None,
+    source_b: Optional[dict] = None,
+    progress: Optional[Callable[[str], None]] = None,
 ) -> dict:
-    sa = parse_sheet_spec(sheet_a)
-    sb = parse_sheet_spec(sheet_b)
-
-    df_a, header_a, header_mode_a = auto_detect_header_and_load(file_a, sa)
-    df_b, header_b, header_mode_b = auto_detect_header_and_load(file_b, sb)
-
-    if not col_a:
-        idx = auto_pick_best_column_index(df_a)
-        col_a = index_to_excel_col_letter(idx)
-    if not col_b:
-        idx = auto_pick_best_column_index(df_b)
-        col_b = index_to_excel_col_letter(idx)
-
-    ser_a = pick_series_by_index_or_name(df_a, col_a)
-    ser_b = pick_series_by_index_or_name(df_b, col_b)
-
-    norm_a = normalize_values(ser_a, case_insensitive, drop_blanks=not keep_blanks)
-    norm_b = normalize_values(ser_b, case_insensitive, drop_blanks=not keep_blanks)
-
+    source_a = source_a or frame_source()
+    source_b = source_b or frame_source()
+    check_fuzzy_threshold(fuzzy, fuzzy_threshold)
+
+    report_stage(progress, "normalizing")
+    note_rows(progress, a=len(df_a), b=len(df_b))
+    with timed_section(progress, "key_pick"):
+        col_a, confidence_a = resolve_key_column(df_a, col_a)
+        col_b, confidence_b = resolve_key_column(df_b, col_b)
+    if fuzzy:
+        _single_fuzzy_key(col_a, col_b)
+
+    norm_a, norm_b, label = build_keys(
+        df_a, df_b, col_a, col_b, case_insensitive, drop_blanks=not keep_blanks, normalize=normalize
+    )
+
+    report_stage(progress, "joining")
+    counts = key_counts(norm_a, norm_b)
+    matched, only_a, only_b = key_set_ops(norm_a, norm_b, counts)
+    if not multiset:
+        counts = None
+    fuzzy_pairs = None
+    if fuzzy:
+        # only the exact-match residue is searched; a fuzzy pair leaves both OnlyIn lists
+        from compare_fuzzy import fuzzy_key_map
+
+        fuzzy_pairs = fuzzy_key_map(only_a, only_b, fuzzy_threshold)
+        only_a = only_a[~only_a.isin(fuzzy_pairs["key_a"]).to_numpy(dtype=bool)].reset_index(drop=True)
+        only_b = only_b[~only_b.isin(fuzzy_pairs["key_b"]).to_numpy(dtype=bool)].reset_index(drop=True)
+    if label is not None:
+        matched, only_a, only_b = (
+            label(keys).sort_values(kind="stable").reset_index(drop=True) for keys in (matched, only_a, only_b)
+        )
+        if counts is not None:
+            counts["key"] = label(counts["key"])
+            counts = counts.sort_values("key", kind="stable").reset_index(drop=True)
     if keep_duplicates:
-        list_a = norm_a.dropna().tolist()
-        list_b = norm_b.dropna().tolist()
-        set_a = set(list_a)
-        set_b = set(list_b)
-        matched = sorted(set_a & set_b)
-        only_a = sorted(set_a - set_b)
-        only_b = sorted(set_b - set_a)
-        occ_a = pd.DataFrame({"key": list_a})
-        occ_b = pd.DataFrame({"key": list_b})
+        occ_a = norm_a.dropna().reset_index(drop=True)
+        occ_b = norm_b.dropna().reset_index(drop=True)
+        if label is not None:
+            occ_a, occ_b = label(occ_a), label(occ_b)
+        occ_a = pd.DataFrame({"key": occ_a})
+        occ_b = pd.DataFrame({"key": occ_b})
     else:
-        set_a = set(norm_a.dropna().unique().tolist())
-        set_b = set(norm_b.dropna().unique().tolist())
-        matched = sorted(set_a & set_b)
-        only_a = sorted(set_a - set_b)
-        only_b = sorted(set_b - set_a)
         occ_a = occ_b = None
 
-    with pd.ExcelWriter(out_path, engine="openpyxl") as writer:
-        pd.DataFrame({"key": matched}).to_excel(writer, index=False, sheet_name="Matched")
-        pd.DataFrame({"key": only_a}).to_excel(writer, index=False, sheet_name="OnlyInA")
-        pd.DataFrame({"key": only_b}).to_excel(writer, index=False, sheet_name="OnlyInB")
-
-        meta = pd.DataFrame(
-            {
-                "item": [
-                    "file_a","file_b","sheet_a","sheet_b",
-                    "header_a_auto","header_b_auto",
-                    "col_a_used","col_b_used",
-                    "case_insensitive","unique_only","blanks_dropped",
-                    "count_matched","count_only_in_a","count_only_in_b",
-                ],
-                "value": [
-                    file_a,file_b,str(sheet_a),str(sheet_b),
-                    str(header_a),str(header_b),
-                    str(col_a),str(col_b),
-                    str(case_insensitive),str(not keep_duplicates),str(not keep_blanks),
-                    str(len(matched)),str(len(only_a)),str(len(only_b)),
-                ],
-            }
-        )
-        meta.to_excel(writer, index=False, sheet_name="Meta")
-
-        if occ_a is not None and occ_b is not None:
-            occ_a.to_excel(writer, index=False, sheet_name="A_Occurrences")
-            occ_b.to_excel(writer, index=False, sheet_name="B_Occurrences")
+    report_stage(progress, "writing")
+    meta = pd.DataFrame(
+        {
+            "item": [
+                "file_a","file_b","sheet_a","sheet_b",
+                "header_a_auto","header_b_auto",
+                "col_a_used","col_b_used",
+                "case_insensitive","unique_only","blanks_dropped",
+                "count_matched","count_only_in_a","count_only_in_b",
+            ] + (["normalize"] if normalize else []),
+            "value": [
+                source_a["file"],source_b["file"],str(source_a["sheet"]),str(source_b["sheet"]),
+                str(source_a["header"]),str(source_b["header"]),
+                str(col_a),str(col_b),
+                str(case_insensitive),str(not keep_duplicates),str(not keep_blanks),
+                str(len(matched)),str(len(only_a)),str(len(only_b)),
+            ] + ([", ".join(normalize_steps(case_insensitive, normalize))] if normalize else []),
+        }
+    )
+    if fuzzy_pairs is not None:
+        meta = pd.concat([meta, pd.DataFrame({
+            "item": ["fuzzy_threshold", "count_fuzzy_matched"],
+            "value": [str(fuzzy_threshold), str(len(fuzzy_pairs))],
+        })], ignore_index=True)
+    if counts is not None:
+        surplus = counts["surplus"].to_numpy()
+        meta = pd.concat([meta, pd.DataFrame({
+            "item": ["multiset", "count_unbalanced_keys", "count_surplus_a", "count_surplus_b"],
+            "value": ["True", str(int((surplus != 0).sum())), str(int(surplus[surplus > 0].sum())),
+                      str(int(-surplus[surplus < 0].sum()))],
+        })], ignore_index=True)
+    meta = with_stage_meta(meta, progress)
+    sheets = [("Matched", pd.DataFrame({"key": matched}))]
+    if fuzzy_pairs is not None:
+        sheets.append(("FuzzyMatched", fuzzy_pairs))
+    sheets += [
+        ("OnlyInA", pd.DataFrame({"key": only_a})),
+        ("OnlyInB", pd.DataFrame({"key": only_b})),
+        ("Meta", meta),
+    ]
+    if counts is not None:
+        sheets.append(("KeyCounts", counts))
+    if occ_a is not None and occ_b is not None:
+        sheets += [("A_Occurrences", occ_a), ("B_Occurrences", occ_b)]
+    note_rows(progress, written=sum(len(df) for name, df in sheets if name != "Meta"))
+    write_result_sets(out_path, sheets, out_format)
 
     return {
         "out": out_path,
         "mode": "compare",
         "matched": len(matched),
+        "fuzzy_matched": len(fuzzy_pairs) if fuzzy_pairs is not None else 0,
         "only_a": len(only_a),
         "only_b": len(only_b),
+        "unbalanced_keys": int((counts["surplus"] != 0).sum()) if counts is not None else None,
         "col_a": col_a,
         "col_b": col_b,
-        "header_mode_a": header_mode_a,
-        "header_mode_b": header_mode_b,
+        "col_a_confidence": confidence_a,
+        "col_b_confidence": confidence_b,
+        "header_mode_a": source_a["header_mode"],
+        "header_mode_b": source_b["header_mode"],
         "df_a_shape": df_a.shape,
         "df_b_shape": df_b.shape,
     }
 
 
+@instrumented
+def compare_files(
+    file_a: str,
+    file_b: str,
+    sheet_a: Optional[str] = None,
+    sheet_b: Optional[str] = None,
+    col_a: KeySpec = None,
+    col_b: KeySpec = None,
+    out_path: str = "compare_result.xlsx",
+    out_format: Optional[str] = None,
+    case_insensitive: bool = False,
+    keep_duplicates: bool = False,
+    multiset: bool = False,
+    keep_blanks: bool = False,
+    normalize: Optional[List[str]] = None,
+    fuzzy: bool = False,
+    fuzzy_threshold: float = FUZZY_THRESHOLD,
+    use_cache: bool = True,
+    progress: Optional[Callable[[str], None]] = None,
+    streaming: bool = False,
+) -> dict:
+    out_format = resolve_output_format(out_path, out_format)
+    normalize_steps(case_insensitive, normalize)
+    check_fuzzy_threshold(fuzzy, fuzzy_threshold)
+    if fuzzy and streaming:
+        raise ValueError("Fuzzy matching is not available with the streaming engine")
+    if multiset and streaming:
+        raise ValueError("Multiset counts are not available with the streaming engine")
+    if streaming:
+        from compare_stream import compare_csv_streaming
+
+        return compare_csv_streaming(
+            file_a,
+            file_b,
+            col_a=col_a,
+            col_b=col_b,
+            out_path=out_path,
+            out_format=out_format,
+            case_insensitive=case_insensitive,
+            keep_duplicates=keep_duplicates,
+            keep_blanks=keep_blanks,
+            normalize=normalize,
+            progress=progress,
+        )
+
+    df_a, df_b, source_a, source_b = load_pair(file_a, file_b, sheet_a, sheet_b, use_cache=use_cache, progress=progress)
+    return compare_frames(
+        df_a,
+        df_b,
+        col_a=col_a,
+        col_b=col_b,
+        out_path=out_path,
+        out_format=out_format,
+        case_insensitive=case_insensitive,
+        keep_duplicates=keep_duplicates,
+        multiset=multiset,
+        keep_blanks=keep_blanks,
+        normalize=normalize,
+        fuzzy=fuzzy,
+        fuzzy_threshold=fuzzy_threshold,
+        source_a=source_a,
+        source_b=source_b,
+        progress=progress,
+    )
+
+
 def _dedupe_b(df_b: pd.DataFrame, key_col_name: str) -> tuple[pd.DataFrame, pd.DataFrame]:
     tmp = df_b.copy()
     dup_mask = tmp[key_col_name].duplicated(keep=False) & tmp[key_col_name].notna()
@@ -270,36 +1510,39 @@ def _dedupe_b(df_b: pd.DataFrame, key_col_name: str) -> tuple[pd.DataFrame, pd.D
     return first, dup_report
 
 
-def xlookup_join(
-    file_a: str,
-    file_b: str,
-    sheet_a: Optional[str] = None,
-    sheet_b: Optional[str] = None,
-    col_a: Optional[str] = None,
-    col_b: Optional[str] = None,
+@instrumented
+def xlookup_join_frames(
+    df_a: pd.DataFrame,
+    df_b: pd.DataFrame,
+    col_a: KeySpec = None,
+    col_b: KeySpec = None,
     b_return_cols: Optional[list[str]] = None,
     out_path: str = "lookup_result.xlsx",
+    out_format: Optional[str] = None,
     case_insensitive: bool = False,
     keep_blanks: bool = False,
+    normalize: Optional[List[str]] = None,
+    fuzzy: bool = False,
+    fuzzy_threshold: float = FUZZY_THRESHOLD,
+    source_a: Optional[dict] = None,
+    source_b: Optional[dict] = None,
+    progress: Optional[Callable[[str], None]] = None,
 ) -> dict:
-    sa = parse_sheet_spec(sheet_a)
-    sb = parse_sheet_spec(sheet_b)
-
-    df_a, header_a, header_mode_a = auto_detect_header_and_load(file_a, sa)
-    df_b, header_b, header_mode_b = auto_detect_header_and_load(file_b, sb)
-
-    if not col_a:
-        idx = auto_pick_best_column_index(df_a)
-        col_a = index_to_excel_col_letter(idx)
-    if not col_b:
-        idx = auto_pick_best_column_index(df_b)
-        col_b = index_to_excel_col_letter(idx)
-
-    ser_a = pick_series_by_index_or_name(df_a, col_a)
-    ser_b = pick_series_by_index_or_name(df_b, col_b)
-
-    key_a = normalize_values(ser_a, case_insensitive, drop_blanks=not keep_blanks)
-    key_b = normalize_values(ser_b, case_insensitive, drop_blanks=not keep_blanks)
+    source_a = source_a or frame_source()
+    source_b = source_b or frame_source()
+    check_fuzzy_threshold(fuzzy, fuzzy_threshold)
+
+    report_stage(progress, "normalizing")
+    note_rows(progress, a=len(df_a), b=len(df_b))
+    with timed_section(progress, "key_pick"):
+        col_a, confidence_a = resolve_key_column(df_a, col_a)
+        col_b, confidence_b = resolve_key_column(df_b, col_b)
+    if fuzzy:
+        _single_fuzzy_key(col_a, col_b)
+
+    key_a, key_b, _ = build_keys(
+        df_a, df_b, col_a, col_b, case_insensitive, drop_blanks=not keep_blanks, normalize=normalize
+    )
 
     a2 = df_a.copy()
     b2 = df_b.copy()
@@ -311,6 +1554,7 @@ def xlookup_join(
     else:
         selected = [c for c in b2.columns if c != "_key__"]
 
+    report_stage(progress, "joining")
     b_first, dup_report = _dedupe_b(b2, "_key__")
 
     lookup_b = b_first[["_key__"] + selected].copy()
@@ -322,6 +1566,21 @@ def xlookup_join(
         selected_out.append(new_name)
     lookup_b = lookup_b.rename(columns=rename_map)
 
+    fuzzy_matched = 0
+    if fuzzy:
+        # A keys without an exact B key are looked up under their best fuzzy B key instead
+        from compare_fuzzy import fuzzy_key_map
+
+        exact = a2["_key__"].isin(b_first["_key__"]).to_numpy(dtype=bool)
+        pairs = fuzzy_key_map(a2["_key__"][~exact], b_first["_key__"], fuzzy_threshold, many_to_one=True)
+        fuzzy_matched = len(pairs)
+        pairs = pairs.set_index("key_a")
+        fuzzy_b = a2["_key__"].map(pairs["key_b"]).astype(key_a.dtype)
+        a2["MATCH__key_b"] = a2["_key__"].where(exact, fuzzy_b)
+        a2["MATCH__score"] = a2["_key__"].map(pairs["score"]).mask(exact, 1.0)
+        # unmatched keys keep their own value so they still land in NotFound_in_B
+        a2["_key__"] = a2["MATCH__key_b"].fillna(a2["_key__"])
+
     merged = a2.merge(lookup_b, on="_key__", how="left")
 
     if selected_out:
@@ -329,82 +1588,347 @@ def xlookup_join(
     else:
         not_found = merged[merged["_key__"].notna()].copy()
 
-    with pd.ExcelWriter(out_path, engine="openpyxl") as writer:
-        merged.drop(columns=["_key__"]).to_excel(writer, index=False, sheet_name="A_with_lookups")
-        not_found.drop(columns=["_key__"]).to_excel(writer, index=False, sheet_name="NotFound_in_B")
-        if "_key__" in dup_report.columns:
-            dup_report = dup_report.drop(columns=["_key__"])
-        dup_report.to_excel(writer, index=False, sheet_name="Duplicates_in_B")
-
-        meta = pd.DataFrame(
-            {
-                "item": [
-                    "file_a","file_b",
-                    "sheet_a","sheet_b",
-                    "header_a_auto","header_b_auto",
-                    "col_a_used","col_b_used",
-                    "selected_b_cols",
-                    "case_insensitive","blanks_dropped",
-                    "count_a_rows",
-                    "count_not_found",
-                    "count_dup_rows_in_b",
-                ],
-                "value": [
-                    file_a,file_b,
-                    str(sheet_a),str(sheet_b),
-                    str(header_a),str(header_b),
-                    str(col_a),str(col_b),
-                    ", ".join(map(str, selected_out)),
-                    str(bool(case_insensitive)), str(not keep_blanks),
-                    str(len(df_a)),
-                    str(len(not_found)),
-                    str(len(dup_report)),
-                ],
-            }
-        )
-        meta.to_excel(writer, index=False, sheet_name="Meta")
+    report_stage(progress, "writing")
+    if "_key__" in dup_report.columns:
+        dup_report = dup_report.drop(columns=["_key__"])
+    meta = pd.DataFrame(
+        {
+            "item": [
+                "file_a","file_b",
+                "sheet_a","sheet_b",
+                "header_a_auto","header_b_auto",
+                "col_a_used","col_b_used",
+                "selected_b_cols",
+                "case_insensitive","blanks_dropped",
+                "count_a_rows",
+                "count_not_found",
+                "count_dup_rows_in_b",
+            ] + (["normalize"] if normalize else [])
+            + (["fuzzy_threshold", "count_fuzzy_matched"] if fuzzy else []),
+            "value": [
+                source_a["file"],source_b["file"],
+                str(source_a["sheet"]),str(source_b["sheet"]),
+                str(source_a["header"]),str(source_b["header"]),
+                str(col_a),str(col_b),
+                ", ".join(map(str, selected_out)),
+                str(bool(case_insensitive)), str(not keep_blanks),
+                str(len(df_a)),
+                str(len(not_found)),
+                str(len(dup_report)),
+            ] + ([", ".join(normalize_steps(case_insensitive, normalize))] if normalize else [])
+            + ([str(fuzzy_threshold), str(fuzzy_matched)] if fuzzy else []),
+        }
+    )
+    meta = with_stage_meta(meta, progress)
+    note_rows(progress, written=len(merged) + len(not_found) + len(dup_report))
+    write_result_sets(out_path, [
+        ("A_with_lookups", merged.drop(columns=["_key__"])),
+        ("NotFound_in_B", not_found.drop(columns=["_key__"])),
+        ("Duplicates_in_B", dup_report),
+        ("Meta", meta),
+    ], out_format)
 
     return {
         "out": out_path,
         "mode": "lookup",
         "col_a": col_a,
         "col_b": col_b,
+        "col_a_confidence": confidence_a,
+        "col_b_confidence": confidence_b,
         "selected_b_cols": selected_out,
         "not_found": len(not_found),
+        "fuzzy_matched": fuzzy_matched,
         "dup_rows_in_b": len(dup_report),
         "a_rows": len(df_a),
-        "header_mode_a": header_mode_a,
-        "header_mode_b": header_mode_b,
+        "header_mode_a": source_a["header_mode"],
+        "header_mode_b": source_b["header_mode"],
     }
 
 
-def differences_report(
+@instrumented
+def xlookup_join(
     file_a: str,
     file_b: str,
     sheet_a: Optional[str] = None,
     sheet_b: Optional[str] = None,
-    col_a: Optional[str] = None,
-    col_b: Optional[str] = None,
+    col_a: KeySpec = None,
+    col_b: KeySpec = None,
+    b_return_cols: Optional[list[str]] = None,
+    out_path: str = "lookup_result.xlsx",
+    out_format: Optional[str] = None,
+    case_insensitive: bool = False,
+    keep_blanks: bool = False,
+    normalize: Optional[List[str]] = None,
+    fuzzy: bool = False,
+    fuzzy_threshold: float = FUZZY_THRESHOLD,
+    use_cache: bool = True,
+    progress: Optional[Callable[[str], None]] = None,
+    out_of_core: bool = False,
+) -> dict:
+    out_format = resolve_output_format(out_path, out_format)
+    normalize_steps(case_insensitive, normalize)
+    check_fuzzy_threshold(fuzzy, fuzzy_threshold)
+    if fuzzy and out_of_core:
+        raise ValueError("Fuzzy matching is not available with the out-of-core engine")
+    if out_of_core:
+        from compare_stream import xlookup_join_partitioned
+
+        return xlookup_join_partitioned(
+            file_a,
+            file_b,
+            sheet_a=sheet_a,
+            sheet_b=sheet_b,
+            col_a=col_a,
+            col_b=col_b,
+            b_return_cols=b_return_cols,
+            out_path=out_path,
+            out_format=out_format,
+            case_insensitive=case_insensitive,
+            keep_blanks=keep_blanks,
+            normalize=normalize,
+            use_cache=use_cache,
+            progress=progress,
+        )
+
+    df_a, df_b, source_a, source_b = load_pair(file_a, file_b, sheet_a, sheet_b, use_cache=use_cache, progress=progress)
+    return xlookup_join_frames(
+        df_a,
+        df_b,
+        col_a=col_a,
+        col_b=col_b,
+        b_return_cols=b_return_cols,
+        out_path=out_path,
+        out_format=out_format,
+        case_insensitive=case_insensitive,
+        keep_blanks=keep_blanks,
+        normalize=normalize,
+        fuzzy=fuzzy,
+        fuzzy_threshold=fuzzy_threshold,
+        source_a=source_a,
+        source_b=source_b,
+        progress=progress,
+    )
+
+
+def column_diff_masks(
+    left: List[pd.Series],
+    right: List[pd.Series],
+    n: int,
+    steps: Tuple[str, ...] = ("strip",),
+    typed: Optional[List[Optional[Callable[[pd.Series, pd.Series], Tuple[np.ndarray, np.ndarray]]]]] = None,
+) -> Tuple[np.ndarray, np.ndarray]:
+    # differs: both sides present and unequal after normalization (and, for typed columns, outside the
+    # tolerance); one_sided: exactly one side missing
+    differs = np.zeros((n, len(left)), dtype=bool, order="F")
+    one_sided = np.zeros((n, len(left)), dtype=bool, order="F")
+    left = [a.astype(string_dtype()) for a in left]
+    right = [b.astype(string_dtype()) for b in right]
+    normalize = compile_normalizer(steps)
+
+    # row fast path: a row whose cells are all identical (or missing on both sides) has no differences
+    # and no one-sided cells, so the per-column checks below only see the rows with some raw mismatch
+    pending = np.zeros(n, dtype=bool)
+    for a, b in zip(left, right):
+        same = (a == b).to_numpy(dtype=bool, na_value=False) | (a.isna() & b.isna()).to_numpy(dtype=bool)
+        pending |= ~same
+    rows = np.flatnonzero(pending)
+    if not rows.size:
+        return differs, one_sided
+
+    for j, (a, b) in enumerate(zip(left, right)):
+        a = a.take(rows)
+        b = b.take(rows)
+        a_na = a.isna().to_numpy(dtype=bool)
+        b_na = b.isna().to_numpy(dtype=bool)
+        neq = (a != b).to_numpy(dtype=bool, na_value=False) & ~(a_na | b_na)
+        # values equal before normalization are equal after it, so only raw mismatches get normalized
+        cand = np.flatnonzero(neq)
+        if cand.size:
+            sa = normalize(a.take(cand))
+            sb = normalize(b.take(cand))
+            neq[cand] = (sa != sb).to_numpy(dtype=bool, na_value=False)
+        compare = typed[j] if typed else None
+        cand = np.flatnonzero(neq)
+        if compare is not None and cand.size:
+            close, _ = compare(a.take(cand), b.take(cand))
+            neq[cand[close]] = False
+        differs[rows, j] = neq
+        one_sided[rows, j] = a_na ^ b_na
+    return differs, one_sided
+
+
+def _parse_numbers(s: pd.Series) -> np.ndarray:
+    # float64, NaN where the cell is not a number
+    values = pd.to_numeric(s.astype(string_dtype()).str.strip(), errors="coerce")
+    return values.to_numpy(dtype=np.float64, na_value=np.nan)
+
+
+def _parse_dates(s: pd.Series) -> np.ndarray:
+    # datetime64[ns], NaT where the cell is not a date; numbers are Excel serial days
+    text = s.astype(string_dtype()).str.strip()
+    codes, uniques = text.array.factorize()
+    parsed = pd.to_datetime(pd.Series(uniques, dtype=object), errors="coerce", format="mixed")
+    out = np.append(parsed.to_numpy(dtype="datetime64[ns]"), np.datetime64("NaT", "ns"))[codes]
+    serial = _parse_numbers(text)
+    use = np.isnat(out) & (np.abs(serial) < _EXCEL_MAX_SERIAL)
+    if use.any():
+        out[use] = (_EXCEL_EPOCH + pd.to_timedelta(serial[use], unit="D")).to_numpy(dtype="datetime64[ns]")
+    return out
+
+
+def infer_value_kind(series: pd.Series, size: int = KEY_SAMPLE_ROWS) -> str:
+    # "number", "date" or "text" from a seeded sample of the non-blank cells
+    s = series.astype(string_dtype()).str.strip()
+    s = s[s.notna() & (s != "").to_numpy(dtype=bool, na_value=False)]
+    if s.empty:
+        return "text"
+    if len(s) > size:
+        s = s.sample(size, random_state=0)
+    numbers = np.isfinite(_parse_numbers(s))
+    if numbers.mean() >= TYPED_MIN_SHARE:
+        return "number"
+    dates = ~np.isnat(_parse_dates(s))
+    if dates.mean() >= TYPED_MIN_SHARE and (dates & ~numbers).any():
+        return "date"
+    return "text"
+
+
+def typed_column_kinds(df_a: pd.DataFrame, df_b: pd.DataFrame, cols: List[object]) -> Dict[object, str]:
+    # inferred once per run; a date column may hold serial numbers on the other side
+    kinds = {}
+    for c in cols:
+        kind_a, kind_b = infer_value_kind(df_a[c]), infer_value_kind(df_b[c])
+        if kind_a == kind_b == "number":
+            kinds[c] = "number"
+        elif "date" in (kind_a, kind_b) and {kind_a, kind_b} <= {"date", "number"}:
+            kinds[c] = "date"
+    return kinds
+
+
+def typed_compare(
+    a: pd.Series, b: pd.Series, kind: str, abs_tol: float = 0.0, rel_tol: float = 0.0, granularity: str = "day"
+) -> Tuple[np.ndarray, np.ndarray]:
+    # per row: equal within tolerance, and the B - A delta (numbers, or dates in granularity units);
+    # False / NaN where either side does not parse
+    if kind == "number":
+        va, vb = _parse_numbers(a), _parse_numbers(b)
+        with np.errstate(invalid="ignore"):
+            delta = vb - va
+            close = (np.abs(delta) <= np.maximum(abs_tol, rel_tol * np.maximum(np.abs(va), np.abs(vb)))) | (va == vb)
+        return close, delta
+    unit = DATE_GRANULARITIES[granularity]
+    va = _parse_dates(a).astype(f"datetime64[{unit}]")
+    vb = _parse_dates(b).astype(f"datetime64[{unit}]")
+    ok = ~(np.isnat(va) | np.isnat(vb))
+    delta = np.full(len(va), np.nan)
+    delta[ok] = (vb[ok] - va[ok]).astype(np.int64)
+    return ok & (delta == 0), delta
+
+
+def diff_flag_array(differs: np.ndarray, one_sided: np.ndarray, j: int, rows: np.ndarray) -> pd.arrays.BooleanArray:
+    return pd.arrays.BooleanArray(differs[rows, j], one_sided[rows, j])
+
+
+def _diff_views(
+    a2: pd.DataFrame,
+    b_first: pd.DataFrame,
+    cols: List[object],
+    label: Optional[Callable[[pd.Series], pd.Series]],
+    steps: Tuple[str, ...] = ("strip",),
+    typed: Optional[Dict[object, Callable[[pd.Series, pd.Series], Tuple[np.ndarray, np.ndarray]]]] = None,
+) -> Tuple[pd.DataFrame, pd.DataFrame, np.ndarray, np.ndarray]:
+    # Differences and Same views for the rows of a2, plus per row: kind (0 no key, 1 differs, 2 same)
+    # and whether the key was not found in B
+    merged = a2.merge(b_first, on="_key__", how="left", suffixes=("_A", "_B"))
+    has_key = merged["_key__"].notna().to_numpy(dtype=bool)
+
+    b_cols = [c for c in merged.columns if str(c).endswith("_B")]
+    if b_cols:
+        nf = has_key & merged[b_cols].isna().all(axis=1).to_numpy(dtype=bool)
+    else:
+        b_keys = set(b_first["_key__"].dropna().tolist())
+        nf = has_key & ~merged["_key__"].isin(b_keys).to_numpy(dtype=bool)
+
+    pairs = []
+    for c in cols:
+        a_col = f"{c}_A" if f"{c}_A" in merged.columns else c
+        b_col = f"{c}_B" if f"{c}_B" in merged.columns else c
+        if a_col not in merged.columns or b_col not in merged.columns:
+            continue
+        pairs.append((c, a_col, b_col))
+
+    differs, one_sided = column_diff_masks(
+        [merged[a] for _, a, _ in pairs],
+        [merged[b] for _, _, b in pairs],
+        len(merged),
+        steps,
+        [typed.get(c) for c, _, _ in pairs] if typed else None,
+    )
+    any_diff = differs.any(axis=1)
+    diff_rows = np.flatnonzero(any_diff & has_key)
+    same_rows = np.flatnonzero(~any_diff & has_key)
+
+    def _flags(rows):
+        return {f"DIFF__{c}": diff_flag_array(differs, one_sided, j, rows) for j, (c, _, _) in enumerate(pairs)}
+
+    diff_keys = merged["_key__"].take(diff_rows)
+    diff_view = {"key": (label(diff_keys) if label is not None else diff_keys).array}
+    diff_flags = _flags(diff_rows)
+    for c, a_col, b_col in pairs:
+        diff_view[a_col] = merged[a_col].take(diff_rows).array
+        diff_view[b_col] = merged[b_col].take(diff_rows).array
+        diff_view[f"DIFF__{c}"] = diff_flags[f"DIFF__{c}"]
+        if typed and c in typed:
+            _, delta = typed[c](merged[a_col].take(diff_rows), merged[b_col].take(diff_rows))
+            diff_view[f"DELTA__{c}"] = delta
+    differences_view = pd.DataFrame(diff_view)
+
+    # one positional take per output sheet instead of filter-copy-drop chains
+    keep_pos = [i for i, c in enumerate(merged.columns) if c != "_key__"]
+    same = pd.concat(
+        [merged.iloc[same_rows, keep_pos].reset_index(drop=True), pd.DataFrame(_flags(same_rows))], axis=1
+    )
+
+    kind = np.zeros(len(merged), dtype=np.int8)
+    kind[diff_rows] = 1
+    kind[same_rows] = 2
+    return differences_view, same, kind, nf
+
+
+@instrumented
+def differences_report_frames(
+    df_a: pd.DataFrame,
+    df_b: pd.DataFrame,
+    col_a: KeySpec = None,
+    col_b: KeySpec = None,
     compare_cols: Optional[list[str]] = None,
     out_path: str = "diff_result.xlsx",
+    out_format: Optional[str] = None,
     case_insensitive: bool = False,
     keep_blanks: bool = False,
+    normalize: Optional[List[str]] = None,
+    typed: bool = False,
+    abs_tol: float = 0.0,
+    rel_tol: float = 0.0,
+    granularity: str = "day",
+    source_a: Optional[dict] = None,
+    source_b: Optional[dict] = None,
+    progress: Optional[Callable[[str], None]] = None,
 ) -> dict:
-    sa = parse_sheet_spec(sheet_a)
-    sb = parse_sheet_spec(sheet_b)
-
-    df_a, header_a, header_mode_a = auto_detect_header_and_load(file_a, sa)
-    df_b, header_b, header_mode_b = auto_detect_header_and_load(file_b, sb)
+    source_a = source_a or frame_source()
+    source_b = source_b or frame_source()
+    check_tolerance(abs_tol, rel_tol, granularity)
 
-    if not col_a:
-        idx = auto_pick_best_column_index(df_a)
-        col_a = index_to_excel_col_letter(idx)
-    if not col_b:
-        idx = auto_pick_best_column_index(df_b)
-        col_b = index_to_excel_col_letter(idx)
+    report_stage(progress, "normalizing")
+    note_rows(progress, a=len(df_a), b=len(df_b))
+    with timed_section(progress, "key_pick"):
+        col_a, confidence_a = resolve_key_column(df_a, col_a)
+        col_b, confidence_b = resolve_key_column(df_b, col_b)
 
-    key_a = normalize_values(pick_series_by_index_or_name(df_a, col_a), case_insensitive, drop_blanks=not keep_blanks)
-    key_b = normalize_values(pick_series_by_index_or_name(df_b, col_b), case_insensitive, drop_blanks=not keep_blanks)
+    key_a, key_b, label = build_keys(
+        df_a, df_b, col_a, col_b, case_insensitive, drop_blanks=not keep_blanks, normalize=normalize
+    )
+    value_steps = normalize_steps(False, normalize)
 
     a2 = df_a.copy()
     b2 = df_b.copy()
@@ -422,74 +1946,56 @@ def differences_report(
         if re.fullmatch(r"\d+", spec):
             return df.columns[int(spec) - 1]
         return spec if spec in df.columns else None
-    ka = _colname(df_a, col_a)
-    kb = _colname(df_b, col_b)
-    if ka in cols: cols.remove(ka)
-    if kb in cols: cols.remove(kb)
+    for df, col in ((df_a, col_a), (df_b, col_b)):
+        for spec in key_columns(col):
+            name = _colname(df, spec)
+            if name in cols: cols.remove(name)
+
+    kinds = typed_column_kinds(df_a, df_b, cols) if typed else {}
+    comparers = {
+        c: functools.partial(typed_compare, kind=kind, abs_tol=abs_tol, rel_tol=rel_tol, granularity=granularity)
+        for c, kind in kinds.items()
+    }
 
+    report_stage(progress, "joining")
     b_first, dup_report = _dedupe_b(b2, "_key__")
-    merged = a2.merge(b_first, on="_key__", how="left", suffixes=("_A", "_B"))
-
-    b_cols = [c for c in merged.columns if str(c).endswith("_B")]
-    if b_cols:
-        not_found = merged[merged["_key__"].notna() & merged[b_cols].isna().all(axis=1)].copy()
-    else:
-        b_keys = set(b_first["_key__"].dropna().tolist())
-        not_found = merged[merged["_key__"].notna() & ~merged["_key__"].isin(b_keys)].copy()
 
-    diff_flags = []
-    for c in cols:
-        a_col = f"{c}_A" if f"{c}_A" in merged.columns else c
-        b_col = f"{c}_B" if f"{c}_B" in merged.columns else c
-        if a_col not in merged.columns or b_col not in merged.columns:
-            continue
-        a_vals = merged[a_col].astype("string").str.strip()
-        b_vals = merged[b_col].astype("string").str.strip()
-        is_diff = (a_vals != b_vals) & ~(a_vals.isna() & b_vals.isna())
-        flag = f"DIFF__{c}"
-        merged[flag] = is_diff
-        diff_flags.append(flag)
-
-    any_diff = merged[diff_flags].any(axis=1) if diff_flags else pd.Series([False]*len(merged))
-    differences = merged[any_diff & merged["_key__"].notna()].copy()
-    same = merged[(~any_diff) & merged["_key__"].notna()].copy()
-
-    diff_view_cols = ["_key__"]
-    for c in cols:
-        a_col = f"{c}_A" if f"{c}_A" in merged.columns else c
-        b_col = f"{c}_B" if f"{c}_B" in merged.columns else c
-        d_col = f"DIFF__{c}"
-        if a_col in differences.columns: diff_view_cols.append(a_col)
-        if b_col in differences.columns: diff_view_cols.append(b_col)
-        if d_col in differences.columns: diff_view_cols.append(d_col)
-
-    differences_view = differences[diff_view_cols].copy().rename(columns={"_key__":"key"})
-
-    with pd.ExcelWriter(out_path, engine="openpyxl") as writer:
-        differences_view.to_excel(writer, index=False, sheet_name="Differences")
-        same.drop(columns=["_key__"]).to_excel(writer, index=False, sheet_name="Same")
-        not_found.drop(columns=["_key__"]).to_excel(writer, index=False, sheet_name="NotFound_in_B")
-        if "_key__" in dup_report.columns:
-            dup_report = dup_report.drop(columns=["_key__"])
-        dup_report.to_excel(writer, index=False, sheet_name="Duplicates_in_B")
-
-        meta = pd.DataFrame(
-            {
-                "item":[
-                    "file_a","file_b","sheet_a","sheet_b",
-                    "col_a_used","col_b_used","compare_cols",
-                    "case_insensitive","blanks_dropped",
-                    "count_differences","count_same","count_not_found","count_dup_rows_in_b"
-                ],
-                "value":[
-                    file_a,file_b,str(sheet_a),str(sheet_b),
-                    str(col_a),str(col_b),", ".join(map(str, cols)),
-                    str(bool(case_insensitive)),str(not keep_blanks),
-                    str(len(differences_view)),str(len(same)),str(len(not_found)),str(len(dup_report))
-                ]
-            }
-        )
-        meta.to_excel(writer, index=False, sheet_name="Meta")
+    differences_view, same, kind, nf = _diff_views(a2, b_first, cols, label, value_steps, comparers)
+
+    # not-found rows never differ, so they are the flagged rows of Same without the DIFF__ columns
+    n_flags = sum(1 for c in differences_view.columns if str(c).startswith("DIFF__"))
+    not_found = same.iloc[np.flatnonzero(nf[kind == 2]), : same.shape[1] - n_flags]
+
+    report_stage(progress, "writing")
+    if "_key__" in dup_report.columns:
+        dup_report = dup_report.drop(columns=["_key__"])
+    meta = pd.DataFrame(
+        {
+            "item":[
+                "file_a","file_b","sheet_a","sheet_b",
+                "col_a_used","col_b_used","compare_cols",
+                "case_insensitive","blanks_dropped",
+                "count_differences","count_same","count_not_found","count_dup_rows_in_b"
+            ] + (["normalize"] if normalize else [])
+            + (["typed_cols", "abs_tol", "rel_tol", "date_granularity"] if typed else []),
+            "value":[
+                source_a["file"],source_b["file"],str(source_a["sheet"]),str(source_b["sheet"]),
+                str(col_a),str(col_b),", ".join(map(str, cols)),
+                str(bool(case_insensitive)),str(not keep_blanks),
+                str(len(differences_view)),str(len(same)),str(len(not_found)),str(len(dup_report))
+            ] + ([", ".join(value_steps)] if normalize else [])
+            + ([", ".join(f"{c}:{k}" for c, k in kinds.items()), str(abs_tol), str(rel_tol), granularity] if typed else [])
+        }
+    )
+    meta = with_stage_meta(meta, progress)
+    note_rows(progress, written=len(differences_view) + len(same) + len(not_found) + len(dup_report))
+    write_result_sets(out_path, [
+        ("Differences", differences_view),
+        ("Same", same),
+        ("NotFound_in_B", not_found),
+        ("Duplicates_in_B", dup_report),
+        ("Meta", meta),
+    ], out_format)
 
     return {
         "out": out_path,
@@ -499,4 +2005,55 @@ def differences_report(
         "not_found": len(not_found),
         "dup_rows_in_b": len(dup_report),
         "compare_cols": cols,
+        "col_a": col_a,
+        "col_b": col_b,
+        "col_a_confidence": confidence_a,
+        "col_b_confidence": confidence_b,
+        "typed_cols": {str(c): k for c, k in kinds.items()},
     }
+
+
+@instrumented
+def differences_report(
+    file_a: str,
+    file_b: str,
+    sheet_a: Optional[str] = None,
+    sheet_b: Optional[str] = None,
+    col_a: KeySpec = None,
+    col_b: KeySpec = None,
+    compare_cols: Optional[list[str]] = None,
+    out_path: str = "diff_result.xlsx",
+    out_format: Optional[str] = None,
+    case_insensitive: bool = False,
+    keep_blanks: bool = False,
+    normalize: Optional[List[str]] = None,
+    typed: bool = False,
+    abs_tol: float = 0.0,
+    rel_tol: float = 0.0,
+    granularity: str = "day",
+    use_cache: bool = True,
+    progress: Optional[Callable[[str], None]] = None,
+) -> dict:
+    out_format = resolve_output_format(out_path, out_format)
+    normalize_steps(case_insensitive, normalize)
+    check_tolerance(abs_tol, rel_tol, granularity)
+    df_a, df_b, source_a, source_b = load_pair(file_a, file_b, sheet_a, sheet_b, use_cache=use_cache, progress=progress)
+    return differences_report_frames(
+        df_a,
+        df_b,
+        col_a=col_a,
+        col_b=col_b,
+        compare_cols=compare_cols,
+        out_path=out_path,
+        out_format=out_format,
+        case_insensitive=case_insensitive,
+        keep_blanks=keep_blanks,
+        normalize=normalize,
+        typed=typed,
+        abs_tol=abs_tol,
+        rel_tol=rel_tol,
+        granularity=granularity,
+        source_a=source_a,
+        source_b=source_b,
+        progress=progress,
+    )
@@ -0,0 +1,210 @@
+# compare_fuzzy.py
+# Approximate key matching: keys are folded (case, punctuation, Persian/Arabic letter variants, digits),
+# candidates come from a character trigram index, and only those pairs are scored.
+import difflib
+import re
+from typing import Iterable, List, Tuple
+
+import numpy as np
+import pandas as pd
+
+from compare_core import DIGIT_FOLD, FUZZY_THRESHOLD, string_dtype
+
+try:
+    from rapidfuzz.distance import Indel
+except Exception:
+    Indel = None
+
+
+NGRAM = 3
+TOP_K = 10
+# trigrams shared by more than this many B keys carry no signal and would blow up the candidate join
+MAX_BLOCK = 1000
+PAIR_CHUNK = 2_000_000
+
+_FOLD = str.maketrans(
+    {
+        "ي": "ی",  # ي -> ی
+        "ى": "ی",  # ى -> ی
+        "ئ": "ی",  # ئ -> ی
+        "ك": "ک",  # ك -> ک
+        "ة": "ه",  # ة -> ه
+        "أ": "ا",  # أ -> ا
+        "إ": "ا",  # إ -> ا
+        "آ": "ا",  # آ -> ا
+        "ٱ": "ا",  # ٱ -> ا
+        "ؤ": "و",  # ؤ -> و
+        "\u0640": None,  # tatweel
+        "\u200c": " ",  # ZWNJ
+        "\u200d": None,  # ZWJ
+        **{chr(c): None for c in range(0x064B, 0x0653)},  # harakat
+        "\u0670": None,  # superscript alef
+        **DIGIT_FOLD,
+    }
+)
+_PUNCT = re.compile(r"[^\w\s]")
+_SPACES = re.compile(r"\s+")
+
+
+def fold_keys(keys: pd.Series) -> pd.Series:
+    s = keys.astype(string_dtype()).str.casefold().str.translate(_FOLD)
+    s = s.str.replace(_PUNCT, "", regex=True).str.replace(_SPACES, " ", regex=True).str.strip()
+    return s.replace("", pd.NA)
+
+
+def similarity(a: str, b: str, cutoff: float = 0.0) -> float:
+    # normalized Indel similarity (what difflib's ratio() approximates), 1.0 for equal strings;
+    # 0.0 for anything below cutoff
+    if Indel is not None:
+        return Indel.normalized_similarity(a, b, score_cutoff=cutoff)
+    m = difflib.SequenceMatcher(None, a, b, autojunk=False)
+    if m.quick_ratio() < cutoff:
+        return 0.0
+    r = m.ratio()
+    return r if r >= cutoff else 0.0
+
+
+def _grams(keys: Iterable[str], n: int) -> Tuple[np.ndarray, List[str]]:
+    ids, grams = [], []
+    for i, key in enumerate(keys):
+        padded = f"{' ' * (n - 1)}{key}{' ' * (n - 1)}"
+        g = {padded[j:j + n] for j in range(len(padded) - n + 1)}
+        ids.extend([i] * len(g))
+        grams.extend(g)
+    return np.asarray(ids, dtype=np.int64), grams
+
+
+def candidate_pairs(keys_a: List[str], keys_b: List[str], n: int = NGRAM, top_k: int = TOP_K) -> pd.DataFrame:
+    # blocking: pairs sharing at least one informative n-gram, the top_k by shared count per A key.
+    # B postings are a CSR over gram codes; A is expanded in chunks so the pair list stays bounded
+    ids_a, grams_a = _grams(keys_a, n)
+    ids_b, grams_b = _grams(keys_b, n)
+    codes, _ = pd.factorize(np.asarray(grams_a + grams_b, dtype=object))
+    codes_a, codes_b = codes[: len(grams_a)], codes[len(grams_a):]
+    n_codes = int(codes.max()) + 1 if len(codes) else 0
+
+    order = np.argsort(codes_b, kind="stable")
+    post_b = ids_b[order]
+    sizes = np.bincount(codes_b, minlength=n_codes)
+    starts = np.concatenate(([0], np.cumsum(sizes)[:-1])) if n_codes else sizes
+
+    keep = sizes[codes_a] <= MAX_BLOCK
+    ids_a, codes_a = ids_a[keep], codes_a[keep]
+    lens = sizes[codes_a]
+    n_b = max(len(keys_b), 1)
+
+    # chunks hold whole A keys (ids_a is ascending) and about PAIR_CHUNK expanded pairs each
+    per_key = np.cumsum(np.bincount(ids_a, weights=lens, minlength=len(keys_a)))
+    marks = np.arange(PAIR_CHUNK, per_key[-1] + PAIR_CHUNK, PAIR_CHUNK) if len(per_key) else np.empty(0)
+    key_cuts = np.unique(np.searchsorted(per_key, marks))
+    row_cuts = np.searchsorted(ids_a, key_cuts + 1)
+
+    out_a, out_b, out_shared = [], [], []
+    lo = 0
+    for hi in list(row_cuts) + [len(ids_a)]:
+        if hi <= lo:
+            continue
+        l = lens[lo:hi]
+        total = int(l.sum())
+        if total:
+            rep_a = np.repeat(ids_a[lo:hi], l)
+            offs = np.repeat(starts[codes_a[lo:hi]] - np.concatenate(([0], np.cumsum(l)[:-1])), l) + np.arange(total)
+            pair, shared = np.unique(rep_a * n_b + post_b[offs], return_counts=True)
+            a, b = pair // n_b, pair % n_b
+            rank = np.lexsort((b, -shared, a))
+            a, b, shared = a[rank], b[rank], shared[rank]
+            first = np.searchsorted(a, a)
+            top = (np.arange(len(a)) - first) < top_k
+            out_a.append(a[top])
+            out_b.append(b[top])
+            out_shared.append(shared[top])
+        lo = hi
+
+    if not out_a:
+        return pd.DataFrame({"a": np.empty(0, np.int64), "b": np.empty(0, np.int64), "shared": np.empty(0, np.int64)})
+    return pd.DataFrame({"a": np.concatenate(out_a), "b": np.concatenate(out_b), "shared": np.concatenate(out_shared)})
+
+
+def one_to_one(pairs: pd.DataFrame) -> pd.DataFrame:
+    # greedy matching on columns a, b, score: best score first (ties by a, then b), every a and every b used once.
+    # each round keeps the pairs that are the best remaining pair of both their a and their b, which picks the
+    # same pairs as walking the sorted list one by one
+    pairs = pairs.sort_values(["score", "a", "b"], ascending=[False, True, True], kind="stable")
+    kept = []
+    while not pairs.empty:
+        take = pairs[~pairs["a"].duplicated().to_numpy() & ~pairs["b"].duplicated().to_numpy()]
+        kept.append(take)
+        pairs = pairs[~pairs["a"].isin(take["a"]).to_numpy() & ~pairs["b"].isin(take["b"]).to_numpy()]
+    return pd.concat(kept) if kept else pairs
+
+
+def best_per_a(pairs: pd.DataFrame) -> pd.DataFrame:
+    # the best pair of every a on columns a, b, score (ties by b); a b may serve any number of a
+    pairs = pairs.sort_values(["score", "a", "b"], ascending=[False, True, True], kind="stable")
+    return pairs[~pairs["a"].duplicated().to_numpy()]
+
+
+def fuzzy_key_map(
+    keys_a: pd.Series,
+    keys_b: pd.Series,
+    threshold: float = FUZZY_THRESHOLD,
+    top_k: int = TOP_K,
+    many_to_one: bool = False,
+) -> pd.DataFrame:
+    # pairs of A and B keys with score >= threshold: columns key_a, key_b, score. Keys equal after folding score 1.0
+    # without going through the index and are paired first. One-to-one by default (compare: a B key pairs with at
+    # most one A key); many_to_one gives every A key its best B key (lookup).
+    # sorted, so equal scores are settled by key text whatever order the caller passes the keys in
+    uniq_a = pd.Series(keys_a.dropna().unique(), dtype=string_dtype()).sort_values(kind="stable").reset_index(drop=True)
+    uniq_b = pd.Series(keys_b.dropna().unique(), dtype=string_dtype()).sort_values(kind="stable").reset_index(drop=True)
+    empty = pd.DataFrame(
+        {"key_a": pd.Series(dtype=string_dtype()), "key_b": pd.Series(dtype=string_dtype()), "score": pd.Series(dtype=float)}
+    )
+    if uniq_a.empty or uniq_b.empty:
+        return empty
+
+    folded_a = fold_keys(uniq_a)
+    folded_b = fold_keys(uniq_b)
+    exact = pd.DataFrame({"fold": folded_a.array, "a": np.arange(len(uniq_a))}).dropna().merge(
+        pd.DataFrame({"fold": folded_b.array, "b": np.arange(len(uniq_b))}).dropna(), on="fold"
+    )
+    pick = best_per_a if many_to_one else one_to_one
+    exact = pick(exact.assign(score=1.0))
+    found = [exact]
+
+    rest_a = np.setdiff1d(np.flatnonzero(folded_a.notna().to_numpy(dtype=bool)), exact["a"].to_numpy())
+    free_b = np.flatnonzero(folded_b.notna().to_numpy(dtype=bool))
+    if not many_to_one:
+        free_b = np.setdiff1d(free_b, exact["b"].to_numpy())
+    # one index entry per folded text; the other B keys folding to it have the same scores
+    first_b = pd.Series(free_b, index=folded_b.take(free_b).array)
+    first_b = first_b[~first_b.index.duplicated()]
+    cand_b = first_b.to_numpy()
+    if rest_a.size and cand_b.size:
+        texts_a = folded_a.take(rest_a).tolist()
+        texts_b = folded_b.take(cand_b).tolist()
+        pairs = candidate_pairs(texts_a, texts_b, top_k=top_k)
+        # the score can't exceed 2*min(len)/(len_a+len_b); skip pairs that can't reach the threshold on length alone
+        len_a = np.fromiter(map(len, texts_a), dtype=np.int64, count=len(texts_a))[pairs["a"].to_numpy()]
+        len_b = np.fromiter(map(len, texts_b), dtype=np.int64, count=len(texts_b))[pairs["b"].to_numpy()]
+        pairs = pairs[2 * np.minimum(len_a, len_b) >= threshold * (len_a + len_b)]
+        scores = np.fromiter(
+            (similarity(texts_a[a], texts_b[b], threshold) for a, b in zip(pairs["a"].to_numpy(), pairs["b"].to_numpy())),
+            dtype=float,
+            count=len(pairs),
+        )
+        pairs = pick(pairs.assign(score=scores)[scores >= threshold])
+        found.append(pd.DataFrame({"a": rest_a[pairs["a"].to_numpy()], "b": cand_b[pairs["b"].to_numpy()],
+                                   "score": pairs["score"].round(4).to_numpy()}))
+
+    best = pd.concat(found, ignore_index=True)
+    if best.empty:
+        return empty
+    out = pd.DataFrame(
+        {
+            "key_a": uniq_a.take(best["a"].to_numpy()).array,
+            "key_b": uniq_b.take(best["b"].to_numpy()).array,
+            "score": best["score"].to_numpy(dtype=float),
+        }
+    )
+    return out.sort_values("key_a", kind="stable").reset_index(drop=True)
@@ -0,0 +1,496 @@
+# compare_stream.py
+import codecs
+import heapq
+import itertools
+import os
+import pickle
+import shutil
+import tempfile
+from typing import Callable, Iterator, List, Optional, Tuple
+
+import pandas as pd
+
+from compare_core import (
+    auto_detect_header_and_load,
+    auto_pick_best_column_index,
+    detect_csv_header,
+    index_to_excel_col_letter,
+    is_csv,
+    key_columns,
+    normalize_steps,
+    normalize_values,
+    pick_series_by_index_or_name,
+    parse_sheet_spec,
+    report_stage,
+    resolve_key_column,
+    stage_meta_items,
+    string_dtype,
+    write_result_rows,
+)
+
+SPILL_CHUNK_ROWS = 50_000
+
+
+def csv_encoding(path: str) -> str:
+    # decode incrementally so a cp1256 file is detected before any chunk is consumed
+    decoder = codecs.getincrementaldecoder("utf-8-sig")()
+    try:
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(1024 * 1024), b""):
+                decoder.decode(block)
+            decoder.decode(b"", final=True)
+    except UnicodeDecodeError:
+        return "cp1256"
+    return "utf-8-sig"
+
+
+def csv_columns(path: str, header: Optional[int], encoding: str) -> List[object]:
+    head = pd.read_csv(path, header=header, nrows=1 if header is None else 0, encoding=encoding, dtype=string_dtype())
+    return list(head.columns)
+
+
+def iter_csv_column(
+    path: str, header: Optional[int], encoding: str, col_idx: int, chunksize: int
+) -> Iterator[pd.Series]:
+    reader = pd.read_csv(
+        path, header=header, usecols=[col_idx], encoding=encoding, dtype=string_dtype(), chunksize=chunksize
+    )
+    with reader:
+        for chunk in reader:
+            yield chunk.iloc[:, 0]
+
+
+def resolve_csv_key_column(path: str, header: Optional[int], encoding: str, col: Optional[str], chunksize: int) -> Tuple[int, str]:
+    # auto mode scores the first chunk only; pass col explicitly for exact parity with compare_files
+    sample = pd.read_csv(path, header=header, nrows=chunksize, encoding=encoding, dtype=string_dtype())
+    if not col:
+        col = index_to_excel_col_letter(auto_pick_best_column_index(sample))
+    ser = pick_series_by_index_or_name(sample, col)
+    return list(sample.columns).index(ser.name), col
+
+
+def _dump_rows(f, values: List[str]) -> None:
+    for start in range(0, len(values), SPILL_CHUNK_ROWS):
+        pickle.dump(values[start:start + SPILL_CHUNK_ROWS], f, protocol=pickle.HIGHEST_PROTOCOL)
+
+
+def _load_rows(path: str) -> Iterator[str]:
+    if not os.path.exists(path):
+        return
+    with open(path, "rb") as f:
+        while True:
+            try:
+                block = pickle.load(f)
+            except EOFError:
+                return
+            yield from block
+
+
+class _KeySpill:
+    # Unique keys of one side, held in memory until max_keys is exceeded and then
+    # hash-partitioned into append-only spill files.
+    def __init__(self, tmp_dir: str, side: str, partitions: int, max_keys: int):
+        self.tmp_dir = tmp_dir
+        self.side = side
+        self.partitions = partitions
+        self.max_keys = max_keys
+        self.buffer: List[set] = [set() for _ in range(partitions)]
+        self.buffered = 0
+        self.spilled = False
+
+    def part_path(self, p: int) -> str:
+        return os.path.join(self.tmp_dir, f"{self.side}_keys_{p}.pkl")
+
+    def add(self, keys: pd.Series) -> None:
+        keys = keys.dropna()
+        if keys.empty:
+            return
+        parts = pd.util.hash_pandas_object(keys, index=False).to_numpy() % self.partitions
+        for p, group in keys.groupby(parts, sort=False):
+            bucket = self.buffer[p]
+            before = len(bucket)
+            bucket.update(group.tolist())
+            self.buffered += len(bucket) - before
+        if self.buffered > self.max_keys:
+            self.flush()
+
+    def flush(self) -> None:
+        for p, bucket in enumerate(self.buffer):
+            if bucket:
+                with open(self.part_path(p), "ab") as f:
+                    _dump_rows(f, list(bucket))
+                bucket.clear()
+        self.buffered = 0
+        self.spilled = True
+
+    def partition(self, p: int) -> set:
+        keys = set(_load_rows(self.part_path(p)))
+        keys.update(self.buffer[p])
+        return keys
+
+
+def _spill_sorted(tmp_dir: str, name: str, values) -> str:
+    path = os.path.join(tmp_dir, name)
+    with open(path, "wb") as f:
+        _dump_rows(f, sorted(values))
+    return path
+
+
+def _single_key(col) -> Optional[str]:
+    cols = key_columns(col)
+    if len(cols) > 1:
+        raise ValueError("Composite keys are not supported by the streaming engines")
+    return cols[0] if cols else None
+
+
+def compare_csv_streaming(
+    file_a: str,
+    file_b: str,
+    col_a: Optional[str] = None,
+    col_b: Optional[str] = None,
+    out_path: str = "compare_result.xlsx",
+    out_format: Optional[str] = None,
+    case_insensitive: bool = False,
+    keep_duplicates: bool = False,
+    keep_blanks: bool = False,
+    normalize: Optional[List[str]] = None,
+    chunksize: int = 200_000,
+    partitions: int = 64,
+    max_keys_in_memory: int = 2_000_000,
+    tmp_dir: Optional[str] = None,
+    progress: Optional[Callable[[str], None]] = None,
+) -> dict:
+    if not (is_csv(file_a) and is_csv(file_b)):
+        raise ValueError("Streaming compare needs CSV inputs on both sides")
+    col_a, col_b = _single_key(col_a), _single_key(col_b)
+
+    work_dir = tempfile.mkdtemp(prefix="compare_stream_", dir=tmp_dir)
+    try:
+        sides = {}
+        for stage, side, path, col in (("loading_a", "a", file_a, col_a), ("loading_b", "b", file_b, col_b)):
+            report_stage(progress, stage)
+            header = detect_csv_header(path)
+            encoding = csv_encoding(path)
+            ncols = len(csv_columns(path, header, encoding))
+            col_idx, col_used = resolve_csv_key_column(path, header, encoding, col, chunksize)
+
+            spill = _KeySpill(work_dir, side, partitions, max_keys_in_memory)
+            occ_path = os.path.join(work_dir, f"{side}_occurrences.pkl")
+            nrows = 0
+            with open(occ_path, "wb") as occ:
+                for chunk in iter_csv_column(path, header, encoding, col_idx, chunksize):
+                    nrows += len(chunk)
+                    keys = normalize_values(chunk, case_insensitive, drop_blanks=not keep_blanks, normalize=normalize)
+                    spill.add(keys)
+                    if keep_duplicates:
+                        _dump_rows(occ, keys.dropna().tolist())
+            sides[side] = {
+                "spill": spill,
+                "occ_path": occ_path,
+                "header": header,
+                "col": col_used,
+                "header_mode": "header_0" if header == 0 else "no_header",
+                "shape": (nrows, ncols),
+            }
+
+        report_stage(progress, "joining")
+        spill_a, spill_b = sides["a"]["spill"], sides["b"]["spill"]
+        counts = {"matched": 0, "only_a": 0, "only_b": 0}
+        parts = {"matched": [], "only_a": [], "only_b": []}
+        for p in range(partitions):
+            keys_a = spill_a.partition(p)
+            keys_b = spill_b.partition(p)
+            for name, values in (("matched", keys_a & keys_b), ("only_a", keys_a - keys_b), ("only_b", keys_b - keys_a)):
+                if values:
+                    counts[name] += len(values)
+                    parts[name].append(_spill_sorted(work_dir, f"{name}_{p}.pkl", values))
+
+        def merged(name: str) -> Iterator[tuple]:
+            return ((k,) for k in heapq.merge(*(_load_rows(path) for path in parts[name])))
+
+        a, b = sides["a"], sides["b"]
+        meta_rows = list(zip(
+            [
+                "file_a","file_b","sheet_a","sheet_b",
+                "header_a_auto","header_b_auto",
+                "col_a_used","col_b_used",
+                "case_insensitive","unique_only","blanks_dropped",
+                "count_matched","count_only_in_a","count_only_in_b",
+                "engine",
+            ] + (["normalize"] if normalize else []),
+            [
+                file_a,file_b,str(None),str(None),
+                str(a["header"]),str(b["header"]),
+                str(a["col"]),str(b["col"]),
+                str(case_insensitive),str(not keep_duplicates),str(not keep_blanks),
+                str(counts["matched"]),str(counts["only_a"]),str(counts["only_b"]),
+                f"streaming (partitions={partitions}, spilled={spill_a.spilled or spill_b.spilled})",
+            ] + ([", ".join(normalize_steps(case_insensitive, normalize))] if normalize else []),
+        ))
+
+        report_stage(progress, "writing")
+        meta_rows += stage_meta_items(progress)
+        sheets = [
+            ("Matched", ["key"], merged("matched")),
+            ("OnlyInA", ["key"], merged("only_a")),
+            ("OnlyInB", ["key"], merged("only_b")),
+            ("Meta", ["item", "value"], iter(meta_rows)),
+        ]
+        if keep_duplicates:
+            sheets.append(("A_Occurrences", ["key"], ((k,) for k in _load_rows(a["occ_path"]))))
+            sheets.append(("B_Occurrences", ["key"], ((k,) for k in _load_rows(b["occ_path"]))))
+        write_result_rows(out_path, sheets, out_format)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    return {
+        "out": out_path,
+        "mode": "compare",
+        "matched": counts["matched"],
+        "only_a": counts["only_a"],
+        "only_b": counts["only_b"],
+        "col_a": a["col"],
+        "col_b": b["col"],
+        "header_mode_a": a["header_mode"],
+        "header_mode_b": b["header_mode"],
+        "df_a_shape": a["shape"],
+        "df_b_shape": b["shape"],
+        "spilled": spill_a.spilled or spill_b.spilled,
+    }
+
+
+def iter_table_chunks(
+    path: str, sheet: Optional[str], col: Optional[str], chunksize: int, use_cache: bool = True
+) -> Tuple[Optional[int], str, Optional[str], Iterator[pd.DataFrame]]:
+    # CSV is streamed and an auto key stays None (picked from the first chunk by _partition_side); a workbook is
+    # bounded by Excel's row limit, is loaded normally and picks its auto key from the whole sheet like xlookup_join
+    if is_csv(path):
+        header = detect_csv_header(path)
+        reader = pd.read_csv(path, header=header, encoding=csv_encoding(path), dtype=string_dtype(), chunksize=chunksize)
+
+        def chunks() -> Iterator[pd.DataFrame]:
+            with reader:
+                yield from reader
+
+        return header, "header_0" if header == 0 else "no_header", col, chunks()
+
+    df, header, mode = auto_detect_header_and_load(path, parse_sheet_spec(sheet), use_cache=use_cache)
+    col, _ = resolve_key_column(df, col)
+    return header, mode, col, (df.iloc[i:i + chunksize] for i in range(0, max(len(df), 1), chunksize))
+
+
+def _dump_frame(path: str, df: pd.DataFrame) -> None:
+    with open(path, "ab") as f:
+        pickle.dump(df, f, protocol=pickle.HIGHEST_PROTOCOL)
+
+
+def _load_frames(path: str) -> Iterator[pd.DataFrame]:
+    if not os.path.exists(path):
+        return
+    with open(path, "rb") as f:
+        while True:
+            try:
+                yield pickle.load(f)
+            except EOFError:
+                return
+
+
+def _read_partition(path: str, columns: List[object]) -> pd.DataFrame:
+    frames = list(_load_frames(path))
+    if not frames:
+        return pd.DataFrame(columns=columns)
+    return pd.concat(frames, ignore_index=True)
+
+
+def _iter_row_tuples(paths: List[str]) -> Iterator[tuple]:
+    # each spill file holds frames already ordered by _row__; rows come out as (row_no, values)
+    for path in paths:
+        for df in _load_frames(path):
+            rows = df.drop(columns=["_row__"]).astype(object)
+            rows = rows.where(rows.notna(), None)
+            yield from zip(df["_row__"].tolist(), map(tuple, rows.itertuples(index=False, name=None)))
+
+
+def _merged_rows(parts: List[List[str]]) -> Iterator[tuple]:
+    streams = [_iter_row_tuples(paths) for paths in parts]
+    return (values for _, values in heapq.merge(*streams, key=lambda item: item[0]))
+
+
+def _partition_side(
+    chunks: Iterator[pd.DataFrame],
+    col: Optional[str],
+    case_insensitive: bool,
+    keep_blanks: bool,
+    normalize: Optional[List[str]],
+    work_dir: str,
+    side: str,
+    partitions: int,
+) -> Tuple[List[object], str, int]:
+    first = next(chunks, None)
+    if first is None:
+        first = pd.DataFrame()
+    columns = list(first.columns)
+    if not col:
+        # CSV only: scores the first chunk; pass col explicitly for exact parity with xlookup_join
+        col = index_to_excel_col_letter(auto_pick_best_column_index(first))
+
+    nrows = 0
+    for chunk in itertools.chain([first], chunks):
+        if chunk.empty:
+            continue
+        chunk = chunk.copy()
+        chunk["_key__"] = normalize_values(
+            pick_series_by_index_or_name(chunk, col), case_insensitive, drop_blanks=not keep_blanks, normalize=normalize
+        )
+        chunk["_row__"] = range(nrows, nrows + len(chunk))
+        nrows += len(chunk)
+
+        has_key = chunk["_key__"].notna()
+        keyed = chunk[has_key]
+        if not keyed.empty:
+            part_ids = pd.util.hash_pandas_object(keyed["_key__"], index=False).to_numpy() % partitions
+            for p, group in keyed.groupby(part_ids, sort=False):
+                _dump_frame(os.path.join(work_dir, f"{side}_part_{p}.pkl"), group)
+        if side == "a" and not has_key.all():
+            # rows without a key never match; they still belong in A_with_lookups
+            _dump_frame(os.path.join(work_dir, f"{side}_part_null.pkl"), chunk[~has_key])
+    return columns, col, nrows
+
+
+def xlookup_join_partitioned(
+    file_a: str,
+    file_b: str,
+    sheet_a: Optional[str] = None,
+    sheet_b: Optional[str] = None,
+    col_a: Optional[str] = None,
+    col_b: Optional[str] = None,
+    b_return_cols: Optional[list[str]] = None,
+    out_path: str = "lookup_result.xlsx",
+    out_format: Optional[str] = None,
+    case_insensitive: bool = False,
+    keep_blanks: bool = False,
+    normalize: Optional[List[str]] = None,
+    chunksize: int = 200_000,
+    partitions: int = 64,
+    tmp_dir: Optional[str] = None,
+    use_cache: bool = True,
+    progress: Optional[Callable[[str], None]] = None,
+) -> dict:
+    col_a, col_b = _single_key(col_a), _single_key(col_b)
+    work_dir = tempfile.mkdtemp(prefix="compare_join_", dir=tmp_dir)
+    try:
+        report_stage(progress, "loading_a")
+        header_a, header_mode_a, col_a, chunks_a = iter_table_chunks(
+            file_a, sheet_a, col_a, chunksize, use_cache
+        )
+        report_stage(progress, "normalizing")
+        cols_a, col_a, a_rows = _partition_side(
+            chunks_a, col_a, case_insensitive, keep_blanks, normalize, work_dir, "a", partitions
+        )
+
+        report_stage(progress, "loading_b")
+        header_b, header_mode_b, col_b, chunks_b = iter_table_chunks(
+            file_b, sheet_b, col_b, chunksize, use_cache
+        )
+        cols_b, col_b, _ = _partition_side(
+            chunks_b, col_b, case_insensitive, keep_blanks, normalize, work_dir, "b", partitions
+        )
+
+        if b_return_cols:
+            selected = [c for c in b_return_cols if c in cols_b]
+        else:
+            selected = list(cols_b)
+        selected_out = [f"B__{c}" for c in selected]
+        out_cols = cols_a + selected_out
+
+        report_stage(progress, "joining")
+        merged_parts, not_found_parts, dup_parts = [], [], []
+        not_found_count = dup_count = 0
+        for p in list(range(partitions)) + ["null"]:
+            part_a = _read_partition(os.path.join(work_dir, f"a_part_{p}.pkl"), cols_a + ["_key__", "_row__"])
+            if p == "null":
+                merged = part_a.reindex(columns=out_cols + ["_key__", "_row__"])
+            else:
+                part_b = _read_partition(os.path.join(work_dir, f"b_part_{p}.pkl"), cols_b + ["_key__", "_row__"])
+                part_b = part_b.sort_values("_row__", kind="stable")
+
+                dup_mask = part_b["_key__"].duplicated(keep=False)
+                dup_report = part_b.loc[dup_mask]
+                if not dup_report.empty:
+                    dup_count += len(dup_report)
+                    dup_parts.append([_spill_frame(work_dir, f"dup_{p}.pkl", dup_report.drop(columns=["_key__"]))])
+
+                lookup_b = part_b.drop_duplicates(subset=["_key__"], keep="first")[["_key__"] + selected]
+                lookup_b = lookup_b.rename(columns=dict(zip(selected, selected_out)))
+                merged = part_a.merge(lookup_b, on="_key__", how="left")
+
+            if p != "null":
+                if selected_out:
+                    not_found = merged[merged[selected_out].isna().all(axis=1)]
+                else:
+                    not_found = merged
+                if not not_found.empty:
+                    not_found_count += len(not_found)
+                    not_found_parts.append([_spill_frame(work_dir, f"nf_{p}.pkl", not_found.drop(columns=["_key__"]))])
+
+            if not merged.empty:
+                merged_parts.append([_spill_frame(work_dir, f"merged_{p}.pkl", merged.drop(columns=["_key__"]))])
+
+        meta_rows = list(zip(
+            [
+                "file_a","file_b",
+                "sheet_a","sheet_b",
+                "header_a_auto","header_b_auto",
+                "col_a_used","col_b_used",
+                "selected_b_cols",
+                "case_insensitive","blanks_dropped",
+                "count_a_rows",
+                "count_not_found",
+                "count_dup_rows_in_b",
+                "engine",
+            ] + (["normalize"] if normalize else []),
+            [
+                file_a,file_b,
+                str(sheet_a),str(sheet_b),
+                str(header_a),str(header_b),
+                str(col_a),str(col_b),
+                ", ".join(map(str, selected_out)),
+                str(bool(case_insensitive)), str(not keep_blanks),
+                str(a_rows),
+                str(not_found_count),
+                str(dup_count),
+                f"partitioned (partitions={partitions})",
+            ] + ([", ".join(normalize_steps(case_insensitive, normalize))] if normalize else []),
+        ))
+
+        report_stage(progress, "writing")
+        meta_rows += stage_meta_items(progress)
+        write_result_rows(out_path, [
+            ("A_with_lookups", out_cols, _merged_rows(merged_parts)),
+            ("NotFound_in_B", out_cols, _merged_rows(not_found_parts)),
+            ("Duplicates_in_B", cols_b, _merged_rows(dup_parts)),
+            ("Meta", ["item", "value"], iter(meta_rows)),
+        ], out_format)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    return {
+        "out": out_path,
+        "mode": "lookup",
+        "col_a": col_a,
+        "col_b": col_b,
+        "selected_b_cols": selected_out,
+        "not_found": not_found_count,
+        "dup_rows_in_b": dup_count,
+        "a_rows": a_rows,
+        "header_mode_a": header_mode_a,
+        "header_mode_b": header_mode_b,
+    }
+
+
+def _spill_frame(work_dir: str, name: str, df: pd.DataFrame) -> str:
+    path = os.path.join(work_dir, name)
+    df = df.sort_values("_row__", kind="stable")
+    for start in range(0, len(df), SPILL_CHUNK_ROWS):
+        _dump_frame(path, df.iloc[start:start + SPILL_CHUNK_ROWS])
+    return path
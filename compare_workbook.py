@@ -0,0 +1,301 @@
+# compare_workbook.py
+# Whole-workbook mode: each sheet of A against its counterpart in B (paired by name or position), or every
+# sheet stacked into one table per side; one consolidated result with a per-sheet Summary.
+import os
+import shutil
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Dict, List, Optional, Tuple
+
+import pandas as pd
+
+import compare_core
+from compare_core import (
+    KEY_SEPARATOR,
+    LOAD_WORKERS,
+    auto_detect_header_and_load,
+    compare_frames,
+    differences_report_frames,
+    frame_source,
+    instrumented,
+    load_workbook_sheets,
+    report_stage,
+    resolve_output_format,
+    string_dtype,
+    write_result_sets,
+    xlookup_join_frames,
+)
+
+try:
+    import pyarrow.parquet as parquet
+except Exception:
+    parquet = None
+
+
+WORKBOOK_PAIRINGS = ("name", "position", "stack")
+# stacked tables carry the source sheet in this column (usable as part of a composite key)
+SHEET_COLUMN = "_sheet"
+
+FRAME_OPERATIONS = {
+    "compare": compare_frames,
+    "lookup": xlookup_join_frames,
+    "diff": differences_report_frames,
+}
+# consolidated sheets in the order each operation writes them
+RESULT_SHEETS = {
+    "compare": ["Matched", "FuzzyMatched", "OnlyInA", "OnlyInB", "KeyCounts", "A_Occurrences", "B_Occurrences"],
+    "lookup": ["A_with_lookups", "NotFound_in_B", "Duplicates_in_B"],
+    "diff": ["Differences", "Same", "NotFound_in_B", "Duplicates_in_B"],
+}
+# result dict entries copied into the Summary sheet
+_SUMMARY_COUNTS = (
+    "matched", "fuzzy_matched", "only_a", "only_b", "unbalanced_keys",
+    "not_found", "dup_rows_in_b", "differences", "same",
+)
+
+
+def pair_sheets(
+    names_a: List[str], names_b: List[str], pairing: str = "name"
+) -> Tuple[List[Tuple[str, str]], List[str], List[str]]:
+    # (pairs, only in A, only in B); by name tries exact names first, then trimmed case-insensitive ones
+    if pairing == "position":
+        n = min(len(names_a), len(names_b))
+        return list(zip(names_a[:n], names_b[:n])), names_a[n:], names_b[n:]
+
+    pairs = {a: a for a in names_a if a in names_b}
+    loose_b = {}
+    for b in names_b:
+        if b not in pairs.values():
+            loose_b.setdefault(b.strip().casefold(), b)
+    for a in names_a:
+        if a not in pairs and a.strip().casefold() in loose_b:
+            pairs[a] = loose_b.pop(a.strip().casefold())
+    paired_b = set(pairs.values())
+    return (
+        [(a, pairs[a]) for a in names_a if a in pairs],
+        [a for a in names_a if a not in pairs],
+        [b for b in names_b if b not in paired_b],
+    )
+
+
+def sheet_column(frames: List[pd.DataFrame]) -> str:
+    # SHEET_COLUMN, or _sheet_2, _sheet_3, ... when a table already has a column of that name
+    taken = {str(c) for df in frames for c in df.columns}
+    name, n = SHEET_COLUMN, 1
+    while name in taken:
+        n += 1
+        name = f"{SHEET_COLUMN}_{n}"
+    return name
+
+
+def label_rows(labelled: List[Tuple[str, pd.DataFrame]]) -> pd.DataFrame:
+    # the frames stacked under the union of their columns, each row's label in front (see sheet_column)
+    column = sheet_column([df for _, df in labelled])
+    frames = []
+    for label, df in labelled:
+        frame = df.reset_index(drop=True)
+        frame.insert(0, column, pd.Series([label] * len(frame), dtype=string_dtype()))
+        frames.append(frame)
+    if not frames:
+        return pd.DataFrame({column: pd.Series(dtype=string_dtype())})
+    return pd.concat(frames, ignore_index=True)
+
+
+def stack_sheets(sheets: List[Tuple[str, pd.DataFrame, Optional[int], str]]) -> pd.DataFrame:
+    # rows of every sheet under the union of their columns, the sheet name in front
+    return label_rows([(name, df) for name, df, _, _ in sheets]).astype(string_dtype())
+
+
+def _sheet_label(sheet_a: str, sheet_b: str) -> str:
+    return sheet_a if sheet_a == sheet_b else f"{sheet_a}{KEY_SEPARATOR}{sheet_b}"
+
+
+def _init_sheet_worker() -> None:
+    # the sheets are already parsed; workers only read them back from the cache
+    compare_core.PARALLEL_LOAD = False
+
+
+def _run_sheet_pair(
+    op: str,
+    file_a: str,
+    sheet_a: str,
+    file_b: str,
+    sheet_b: str,
+    out_path: str,
+    out_format: str,
+    kwargs: dict,
+    frames: Optional[Tuple[tuple, tuple]] = None,
+) -> dict:
+    # frames: the loaded (df, header, mode) of both sides; None in pool workers, which read the sheet cache
+    started = time.perf_counter()
+    try:
+        if frames is None:
+            frames = (
+                auto_detect_header_and_load(file_a, sheet_a, use_cache=True),
+                auto_detect_header_and_load(file_b, sheet_b, use_cache=True),
+            )
+        (df_a, header_a, mode_a), (df_b, header_b, mode_b) = frames
+        result = FRAME_OPERATIONS[op](
+            df_a,
+            df_b,
+            out_path=out_path,
+            out_format=out_format,
+            source_a=frame_source(file_a, sheet_a, header_a, mode_a),
+            source_b=frame_source(file_b, sheet_b, header_b, mode_b),
+            **kwargs,
+        )
+        status, error = "ok", None
+        rows = (len(df_a), len(df_b))
+    except Exception as e:
+        result, status, error, rows = {}, "error", f"{type(e).__name__}: {e}", (None, None)
+    return {
+        "sheet_a": sheet_a,
+        "sheet_b": sheet_b,
+        "status": status,
+        "error": error,
+        "rows_a": rows[0],
+        "rows_b": rows[1],
+        "result": result,
+        "seconds": round(time.perf_counter() - started, 3),
+    }
+
+
+def _read_result_set(path: str, fmt: str) -> pd.DataFrame:
+    if fmt == "parquet":
+        dtype = string_dtype()
+        table = parquet.read_table(path)
+        return table.to_pandas(types_mapper=lambda t: dtype if str(t) in ("string", "large_string") else None)
+    return pd.read_csv(path, dtype=string_dtype(), keep_default_na=False, na_values=[""])
+
+
+@instrumented
+def compare_workbooks(
+    file_a: str,
+    file_b: str,
+    op: str = "compare",
+    pairing: str = "name",
+    out_path: str = "workbook_result.xlsx",
+    out_format: Optional[str] = None,
+    workers: Optional[int] = None,
+    use_cache: bool = True,
+    progress: Optional[Callable[[str], None]] = None,
+    **op_kwargs,
+) -> dict:
+    # op_kwargs go to the per-sheet compare_frames / xlookup_join_frames / differences_report_frames
+    if op not in FRAME_OPERATIONS:
+        raise ValueError(f"Unknown operation: {op} (expected one of {', '.join(FRAME_OPERATIONS)})")
+    if pairing not in WORKBOOK_PAIRINGS:
+        raise ValueError(f"Unknown sheet pairing: {pairing} (expected one of {', '.join(WORKBOOK_PAIRINGS)})")
+    out_format = resolve_output_format(out_path, out_format)
+    started = time.perf_counter()
+
+    report_stage(progress, "loading_a")
+    sheets_a = load_workbook_sheets(file_a, use_cache=use_cache)
+    report_stage(progress, "loading_b")
+    sheets_b = load_workbook_sheets(file_b, use_cache=use_cache)
+
+    if pairing == "stack":
+        result = FRAME_OPERATIONS[op](
+            stack_sheets(sheets_a),
+            stack_sheets(sheets_b),
+            out_path=out_path,
+            out_format=out_format,
+            source_a=frame_source(file_a, "<all sheets>", None, "stacked"),
+            source_b=frame_source(file_b, "<all sheets>", None, "stacked"),
+            progress=progress,
+            **op_kwargs,
+        )
+        return {
+            **result,
+            "mode": "workbook",
+            "op": op,
+            "pairing": pairing,
+            "sheets_a": {name: len(df) for name, df, _, _ in sheets_a},
+            "sheets_b": {name: len(df) for name, df, _, _ in sheets_b},
+            "seconds": round(time.perf_counter() - started, 3),
+        }
+
+    loaded_a = {name: (df, header, mode) for name, df, header, mode in sheets_a}
+    loaded_b = {name: (df, header, mode) for name, df, header, mode in sheets_b}
+    pairs, only_a, only_b = pair_sheets(list(loaded_a), list(loaded_b), pairing)
+    workers = max(1, min(LOAD_WORKERS if workers is None else workers, len(pairs)))
+    # per-sheet results go to a scratch directory in a columnar format and are stacked afterwards
+    part_fmt = "parquet" if parquet is not None else "csv"
+
+    report_stage(progress, "joining")
+    work_dir = tempfile.mkdtemp(prefix="compare_workbook_")
+    try:
+        jobs = [
+            (op, file_a, a, file_b, b, os.path.join(work_dir, f"pair_{i}"), part_fmt, op_kwargs)
+            for i, (a, b) in enumerate(pairs)
+        ]
+        if workers > 1 and use_cache:
+            with ProcessPoolExecutor(max_workers=workers, initializer=_init_sheet_worker) as pool:
+                runs = [f.result() for f in [pool.submit(_run_sheet_pair, *job) for job in jobs]]
+        else:
+            runs = [_run_sheet_pair(*job, frames=(loaded_a[job[2]], loaded_b[job[4]])) for job in jobs]
+
+        report_stage(progress, "writing")
+        names = list(RESULT_SHEETS[op])
+        stacked: Dict[str, List[Tuple[str, pd.DataFrame]]] = {}
+        for job, run in zip(jobs, runs):
+            if run["status"] != "ok":
+                continue
+            part_dir = job[5]
+            found = sorted(f.rsplit(".", 1)[0] for f in os.listdir(part_dir))
+            names += [n for n in found if n not in names and n != "Meta"]
+            for name in found:
+                if name == "Meta":
+                    continue
+                df = _read_result_set(os.path.join(part_dir, f"{name}.{part_fmt}"), part_fmt)
+                stacked.setdefault(name, []).append((_sheet_label(run["sheet_a"], run["sheet_b"]), df))
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    summary_rows = []
+    for run in runs:
+        row = {
+            "sheet": _sheet_label(run["sheet_a"], run["sheet_b"]),
+            "sheet_a": run["sheet_a"],
+            "sheet_b": run["sheet_b"],
+            "status": run["status"],
+            "rows_a": run["rows_a"],
+            "rows_b": run["rows_b"],
+        }
+        row.update({k: run["result"][k] for k in _SUMMARY_COUNTS if k in run["result"]})
+        row.update({"seconds": run["seconds"], "error": run["error"]})
+        summary_rows.append(row)
+    summary_rows += [{"sheet": a, "sheet_a": a, "status": "only_in_a", "rows_a": len(loaded_a[a][0])} for a in only_a]
+    summary_rows += [{"sheet": b, "sheet_b": b, "status": "only_in_b", "rows_b": len(loaded_b[b][0])} for b in only_b]
+    summary = pd.DataFrame(summary_rows, columns=list(dict.fromkeys(k for row in summary_rows for k in row)))
+
+    meta = pd.DataFrame(
+        {
+            "item": ["file_a", "file_b", "op", "pairing", "sheet_pairs", "sheets_only_in_a", "sheets_only_in_b", "workers"],
+            "value": [
+                file_a, file_b, op, pairing, str(len(pairs)),
+                ", ".join(only_a), ", ".join(only_b), str(workers),
+            ],
+        }
+    )
+    out_sheets = [("Summary", summary)]
+    out_sheets += [(name, label_rows(stacked[name])) for name in names if name in stacked]
+    out_sheets.append(("Meta", meta))
+    write_result_sets(out_path, out_sheets, out_format)
+
+    failed = sum(1 for run in runs if run["status"] != "ok")
+    return {
+        "out": out_path,
+        "mode": "workbook",
+        "op": op,
+        "pairing": pairing,
+        "pairs": len(pairs),
+        "ok": len(runs) - failed,
+        "failed": failed,
+        "only_in_a": only_a,
+        "only_in_b": only_b,
+        "sheets": summary_rows,
+        "workers": workers,
+        "seconds": round(time.perf_counter() - started, 3),
+    }
@@ -0,0 +1,101 @@
+# column_diff_masks skips rows that are raw-equal on every column; the masks must match a cell by cell reference
+import re
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import compare_core
+from compare_core import column_diff_masks, string_dtype
+
+_TOKENS = np.array(["a", "A", "b", "1", "1.0", "1.4", " ", "  ", "\t"], dtype=object)
+_STEPS = {
+    "strip": lambda v: v.strip(),
+    "lower": lambda v: v.lower(),
+    "whitespace": lambda v: re.sub(r"\s+", " ", v),
+}
+
+
+@pytest.fixture(params=["pyarrow", "python"])
+def storage(request, monkeypatch):
+    monkeypatch.setattr(compare_core, "STRING_STORAGE", request.param)
+    return request.param
+
+
+def _random_column(rng, n, base=None):
+    # short strings of letters, numbers and whitespace; NA in about 10% of the cells. With a base column most
+    # cells are copied (often with extra whitespace) so rows that are equal everywhere are common
+    values = np.array(["".join(rng.choice(_TOKENS, rng.integers(0, 3))) for _ in range(n)], dtype=object)
+    if base is not None:
+        copied = rng.random(n) < 0.8
+        padded = base.to_numpy(dtype=object, na_value=None)
+        pad = rng.choice(["", "", " ", "\t", "  "], n)
+        values[copied] = [None if v is None else p + v if i % 2 else v + p
+                          for i, (v, p) in enumerate(zip(padded[copied], pad[copied]))]
+    values[rng.random(n) < 0.1] = None
+    return pd.Series(values, dtype=string_dtype())
+
+
+def _close(a, b):
+    # typed comparator: numbers within 0.5 of each other are equal
+    x = pd.to_numeric(a, errors="coerce").to_numpy(dtype=float, na_value=np.nan)
+    y = pd.to_numeric(b, errors="coerce").to_numpy(dtype=float, na_value=np.nan)
+    return np.abs(x - y) <= 0.5, x - y
+
+
+def _reference(left, right, steps, typed):
+    n, m = len(left[0]), len(left)
+    differs = np.zeros((n, m), dtype=bool)
+    one_sided = np.zeros((n, m), dtype=bool)
+    for j in range(m):
+        for i in range(n):
+            a, b = left[j].iloc[i], right[j].iloc[i]
+            a = None if pd.isna(a) else a
+            b = None if pd.isna(b) else b
+            one_sided[i, j] = (a is None) != (b is None)
+            if a is None or b is None:
+                continue
+            na, nb = a, b
+            for step in steps:
+                na, nb = _STEPS[step](na), _STEPS[step](nb)
+            differs[i, j] = na != nb
+            if differs[i, j] and typed and typed[j] is not None:
+                close, _ = typed[j](pd.Series([a], dtype=string_dtype()), pd.Series([b], dtype=string_dtype()))
+                differs[i, j] = not close[0]
+    return differs, one_sided
+
+
+@pytest.mark.parametrize("steps", [("strip",), ("strip", "lower"), ("whitespace", "strip")])
+@pytest.mark.parametrize("seed", range(4))
+def test_masks_match_a_per_cell_reference(storage, steps, seed):
+    rng = np.random.default_rng(seed)
+    n, m = 300, 4
+    left = [_random_column(rng, n) for _ in range(m)]
+    right = [_random_column(rng, n, base=a) for a in left]
+    typed = [None, _close, None, _close] if seed % 2 else None
+
+    differs, one_sided = column_diff_masks(left, right, n, steps, typed)
+    ref_differs, ref_one_sided = _reference(left, right, steps, typed)
+
+    assert left[0].dtype.storage == storage
+    np.testing.assert_array_equal(differs, ref_differs)
+    np.testing.assert_array_equal(one_sided, ref_one_sided)
+    # the data has rows the gate skips, rows with whitespace-only differences and one-sided NA cells
+    raw_differs = np.column_stack(
+        [(a != b).to_numpy(dtype=bool, na_value=False) & a.notna().to_numpy() for a, b in zip(left, right)]
+    )
+    assert (~(differs | one_sided)).all(axis=1).any()
+    assert (raw_differs & ~differs).any()
+    assert one_sided.any()
+
+
+def test_whitespace_only_and_one_sided_cells():
+    left = [pd.Series(["x", " x", None, "y", None], dtype=string_dtype())]
+    right = [pd.Series(["x", "x\t", "z", "y ", None], dtype=string_dtype())]
+
+    differs, one_sided = column_diff_masks(left, right, 5, ("strip",))
+    assert differs[:, 0].tolist() == [False, False, False, False, False]
+    assert one_sided[:, 0].tolist() == [False, False, True, False, False]
+
+    differs, _ = column_diff_masks(left, right, 5, ())
+    assert differs[:, 0].tolist() == [False, True, False, True, False]
@@ -0,0 +1,43 @@
+import pandas as pd
+
+from compare_core import compare_frames, xlookup_join_frames
+from compare_fuzzy import fuzzy_key_map
+
+
+def test_lookup_maps_every_a_variant_to_the_same_b_key(tmp_path):
+    df_a = pd.DataFrame({"name": ["ACME Ltd.", "Acme Ltd", "acme ltd", "Acme  Ltd"], "qty": ["1", "2", "3", "4"]})
+    df_b = pd.DataFrame({"name": ["ACME LTD", "Other Co"], "city": ["Tehran", "Shiraz"]})
+
+    res = xlookup_join_frames(df_a, df_b, "A", "A", out_path=str(tmp_path / "out.csv"), fuzzy=True)
+
+    assert res["fuzzy_matched"] == 4
+    assert res["not_found"] == 0
+    merged = pd.read_csv(tmp_path / "out.csv" / "A_with_lookups.csv", dtype=str)
+    assert merged["B__city"].tolist() == ["Tehran"] * 4
+    assert merged["MATCH__key_b"].tolist() == ["ACME LTD"] * 4
+
+
+def test_compare_pairs_each_b_key_once(tmp_path):
+    df_a = pd.DataFrame({"name": ["ACME Ltd.", "Acme Ltd", "acme ltd"]})
+    df_b = pd.DataFrame({"name": ["ACME LTD"]})
+
+    res = compare_frames(df_a, df_b, "A", "A", out_path=str(tmp_path / "out.csv"), fuzzy=True)
+
+    assert res["fuzzy_matched"] == 1
+    assert res["only_a"] == 2
+    assert res["only_b"] == 0
+
+
+def test_many_to_one_keeps_the_best_score_per_a_key():
+    keys_a = pd.Series(["acme ltd", "acme limited", "globex corp"])
+    keys_b = pd.Series(["acme ltd.", "acme limitd", "globex corporation"])
+
+    pairs = fuzzy_key_map(keys_a, keys_b, threshold=0.6, many_to_one=True)
+
+    best = dict(zip(pairs["key_a"], pairs["key_b"]))
+    assert best["acme ltd"] == "acme ltd."
+    assert best["acme limited"] == "acme limitd"
+    assert pairs["key_a"].is_unique
+    # the same inputs in another order give the same map
+    again = fuzzy_key_map(keys_a[::-1], keys_b[::-1], threshold=0.6, many_to_one=True)
+    pd.testing.assert_frame_equal(pairs, again)
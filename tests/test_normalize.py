@@ -0,0 +1,29 @@
+import pandas as pd
+import pytest
+
+from compare_core import normalize_values
+
+
+def _numeric(values):
+    return normalize_values(pd.Series(values), False, True, normalize=["numeric"]).tolist()
+
+
+def test_numeric_canonical_forms():
+    assert _numeric(["1.0", "1.50", "1e3", "-0", "00012.500", "abc"]) == ["1", "1.5", "1000", "0", "12.5", "abc"]
+
+
+@pytest.mark.parametrize("text", ["1E+1000000", "1e999999999", "1e-999999999", "-7.5E+999999999"])
+def test_huge_exponents_do_not_overflow(text):
+    out = _numeric([text, text.lower()])
+    assert out[0] == out[1]
+    assert out[0].upper() == out[0]
+
+
+def test_exponents_beyond_decimal_are_kept_as_text():
+    assert _numeric(["1e99999999999999999999"]) == ["1e99999999999999999999"]
+
+
+def test_long_numbers_are_not_rounded():
+    a, b = _numeric(["1.0000000000000000000000000000001", "1.0000000000000000000000000000002"])
+    assert a != b
+    assert _numeric(["12345678901234567890123456789012345.000"]) == ["12345678901234567890123456789012345"]
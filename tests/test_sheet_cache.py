@@ -0,0 +1,64 @@
+import datetime
+import os
+import pickle
+
+import openpyxl
+import pytest
+
+import compare_core
+from compare_core import auto_detect_header_and_load, load_cached_sheet
+
+
+@pytest.fixture
+def cache_dir(tmp_path, monkeypatch):
+    path = tmp_path / "cache"
+    monkeypatch.setattr(compare_core, "SHEET_CACHE_DIR", str(path))
+    return path
+
+
+@pytest.fixture
+def book(tmp_path):
+    # header cells of every type a column label can take
+    path = tmp_path / "book.xlsx"
+    wb = openpyxl.Workbook()
+    ws = wb.active
+    ws.append([datetime.datetime(2020, 1, 1), 1.5, 3, True, None, datetime.time(1, 2), "x", "x", "نام"])
+    for i in range(5):
+        ws.append([f"r{i}"] * 9)
+    wb.save(path)
+    return str(path)
+
+
+def test_cached_sheet_round_trips(cache_dir, book):
+    df, header, mode = auto_detect_header_and_load(book, None, use_cache=True)
+    assert sorted(os.path.splitext(n)[1] for n in os.listdir(cache_dir)) == [".feather", ".meta"]
+
+    cached, cached_header, cached_mode = load_cached_sheet(book, None)
+    assert list(cached.columns) == list(df.columns)
+    assert [type(c) for c in cached.columns] == [type(c) for c in df.columns]
+    assert cached.equals(df)
+    assert (cached_header, cached_mode) == (header, mode)
+
+
+class _Planted:
+    # unpickling this creates the marker file
+    def __init__(self, marker):
+        self.marker = marker
+
+    def __reduce__(self):
+        return (open, (self.marker, "w"))
+
+
+def test_planted_pickle_meta_is_never_loaded(tmp_path, cache_dir, book):
+    auto_detect_header_and_load(book, None, use_cache=True)
+    (meta,) = [n for n in os.listdir(cache_dir) if n.endswith(".meta")]
+    marker = tmp_path / "planted"
+    with open(cache_dir / meta, "wb") as f:
+        pickle.dump(_Planted(str(marker)), f)
+
+    assert load_cached_sheet(book, None) is None
+    assert not marker.exists()
+    # the unreadable entry is dropped and the next load stores a fresh one
+    assert os.listdir(cache_dir) == []
+    auto_detect_header_and_load(book, None, use_cache=True)
+    assert load_cached_sheet(book, None) is not None
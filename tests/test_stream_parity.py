@@ -0,0 +1,117 @@
+# the streaming compare and the partitioned lookup must write what the in-memory engines write
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from compare_core import compare_files, xlookup_join
+from compare_stream import compare_csv_streaming, xlookup_join_partitioned
+
+# Meta items only one engine writes (engine description, stage timings, row counts)
+_ENGINE_ITEMS = ("engine", "rows_", "seconds_")
+
+
+def _side(n, seed):
+    # keys with case variants, duplicates, blanks and whitespace-only cells; low-cardinality other columns
+    rng = np.random.default_rng(seed)
+    keys = np.char.add(np.where(rng.random(n) < 0.5, "K", "k"), rng.integers(0, n, n).astype(str)).astype(object)
+    keys[rng.random(n) < 0.05] = ""
+    keys[rng.random(n) < 0.03] = "  "
+    return pd.DataFrame(
+        {"id": keys, "grp": rng.choice(["x", "y", "z"], n), "amount": rng.integers(0, 5, n).astype(str)}
+    )
+
+
+@pytest.fixture(scope="module")
+def inputs(tmp_path_factory):
+    root = tmp_path_factory.mktemp("parity")
+    a, b = _side(1200, 1), _side(1000, 2)
+    paths = {}
+    for ext in ("csv", "xlsx"):
+        paths[ext] = (str(root / f"a.{ext}"), str(root / f"b.{ext}"))
+        if ext == "csv":
+            a.to_csv(paths[ext][0], index=False)
+            b.to_csv(paths[ext][1], index=False)
+        else:
+            a.to_excel(paths[ext][0], index=False)
+            b.to_excel(paths[ext][1], index=False)
+    return paths
+
+
+def _read_sheets(out_dir):
+    return {
+        name[: -len(".csv")]: pd.read_csv(os.path.join(out_dir, name), dtype=str, keep_default_na=False)
+        for name in sorted(os.listdir(out_dir))
+    }
+
+
+def _assert_same_output(expected_dir, actual_dir):
+    expected, actual = _read_sheets(expected_dir), _read_sheets(actual_dir)
+    assert sorted(expected) == sorted(actual)
+    for name in expected:
+        if name == "Meta":
+            continue
+        pd.testing.assert_frame_equal(expected[name], actual[name], obj=name)
+
+    def items(meta):
+        return {k: v for k, v in zip(meta["item"], meta["value"]) if not k.startswith(_ENGINE_ITEMS)}
+
+    assert items(expected["Meta"]) == items(actual["Meta"])
+
+
+@pytest.mark.parametrize("keep_duplicates", [False, True])
+@pytest.mark.parametrize("case_insensitive", [False, True])
+@pytest.mark.parametrize("col", [None, "A"])
+def test_streaming_compare_matches_in_memory(tmp_path, inputs, keep_duplicates, case_insensitive, col):
+    file_a, file_b = inputs["csv"]
+    kwargs = dict(
+        col_a=col, col_b=col, out_format="csv", case_insensitive=case_insensitive, keep_duplicates=keep_duplicates
+    )
+    expected = compare_files(file_a, file_b, out_path=str(tmp_path / "mem"), use_cache=False, **kwargs)
+    # small chunks and a tiny key buffer: every side is spilled over several partitions
+    actual = compare_csv_streaming(
+        file_a, file_b, out_path=str(tmp_path / "stream"), chunksize=100, partitions=4, max_keys_in_memory=50, **kwargs
+    )
+
+    assert actual["spilled"]
+    for key in ("matched", "only_a", "only_b", "col_a", "col_b"):
+        assert actual[key] == expected[key]
+    _assert_same_output(tmp_path / "mem", tmp_path / "stream")
+
+
+@pytest.mark.parametrize("ext", ["csv", "xlsx"])
+@pytest.mark.parametrize("keep_blanks", [False, True])
+@pytest.mark.parametrize("b_return_cols", [None, ["amount"]])
+def test_partitioned_lookup_matches_in_memory(tmp_path, inputs, ext, keep_blanks, b_return_cols):
+    file_a, file_b = inputs[ext]
+    kwargs = dict(
+        out_format="csv", case_insensitive=True, keep_blanks=keep_blanks, b_return_cols=b_return_cols, use_cache=False
+    )
+    expected = xlookup_join(file_a, file_b, out_path=str(tmp_path / "mem"), **kwargs)
+    actual = xlookup_join_partitioned(
+        file_a, file_b, out_path=str(tmp_path / "part"), chunksize=100, partitions=4, **kwargs
+    )
+
+    for key in ("not_found", "dup_rows_in_b", "col_a", "col_b", "selected_b_cols"):
+        assert actual[key] == expected[key]
+    _assert_same_output(tmp_path / "mem", tmp_path / "part")
+
+
+def test_partitioned_lookup_picks_the_workbook_auto_key_from_every_row(tmp_path):
+    # the first chunk has a blank id column and a unique-looking x column; over the whole sheet id is the key
+    n = 400
+    df = pd.DataFrame(
+        {"x": [f"u{i}" for i in range(50)] + ["same"] * (n - 50), "id": [None] * 50 + [f"K{i}" for i in range(50, n)]}
+    )
+    df.to_excel(tmp_path / "a.xlsx", index=False)
+    df.sample(frac=1, random_state=1).to_excel(tmp_path / "b.xlsx", index=False)
+    files = (str(tmp_path / "a.xlsx"), str(tmp_path / "b.xlsx"))
+
+    expected = xlookup_join(*files, out_path=str(tmp_path / "mem"), out_format="csv", use_cache=False)
+    actual = xlookup_join_partitioned(
+        *files, out_path=str(tmp_path / "part"), out_format="csv", chunksize=50, use_cache=False
+    )
+
+    assert (actual["col_a"], actual["col_b"]) == (expected["col_a"], expected["col_b"]) == ("B", "B")
+    _assert_same_output(tmp_path / "mem", tmp_path / "part")
@@ -0,0 +1,61 @@
+import pandas as pd
+import pytest
+
+from compare_workbook import compare_workbooks
+
+
+def _write_workbook(path, sheets):
+    with pd.ExcelWriter(path) as writer:
+        for name, df in sheets.items():
+            df.to_excel(writer, sheet_name=name, index=False)
+
+
+@pytest.fixture
+def books(tmp_path):
+    # both sides carry a column literally named "sheet"
+    a = {
+        "Jan": pd.DataFrame({"id": ["1", "2", "3"], "sheet": ["x", "y", "z"], "amount": ["10", "20", "30"]}),
+        "Feb": pd.DataFrame({"id": ["4", "5"], "sheet": ["p", "q"], "amount": ["40", "50"]}),
+    }
+    b = {
+        "Jan": pd.DataFrame({"id": ["1", "2", "9"], "sheet": ["x", "Y", "w"], "amount": ["10", "21", "90"]}),
+        "Feb": pd.DataFrame({"id": ["4", "6"], "sheet": ["p", "r"], "amount": ["41", "60"]}),
+    }
+    path_a, path_b = tmp_path / "a.xlsx", tmp_path / "b.xlsx"
+    _write_workbook(path_a, a)
+    _write_workbook(path_b, b)
+    return str(path_a), str(path_b)
+
+
+@pytest.mark.parametrize("op", ["compare", "lookup", "diff"])
+def test_sheet_header_does_not_collide_with_the_label(tmp_path, books, op):
+    out = tmp_path / "out"
+    res = compare_workbooks(*books, op=op, out_path=str(out), out_format="csv", workers=1, col_a="A", col_b="A")
+
+    assert res["failed"] == 0
+    for name in {"compare": ["OnlyInA"], "lookup": ["A_with_lookups"], "diff": ["Differences"]}[op]:
+        df = pd.read_csv(out / f"{name}.csv", dtype=str)
+        assert df.columns[0] == "_sheet"
+        assert set(df["_sheet"]) == {"Jan", "Feb"}
+        if op == "lookup":
+            assert "sheet" in df.columns
+        if op == "diff":
+            assert {"sheet_A", "sheet_B"} <= set(df.columns)
+
+
+def test_stack_keeps_an_existing_sheet_label_column(tmp_path):
+    a = {"S1": pd.DataFrame({"id": ["1"], "_sheet": ["mine"]}), "S2": pd.DataFrame({"id": ["2"], "_sheet": ["too"]})}
+    b = {"S1": pd.DataFrame({"id": ["1"], "_sheet": ["mine"]})}
+    _write_workbook(tmp_path / "a.xlsx", a)
+    _write_workbook(tmp_path / "b.xlsx", b)
+
+    out = tmp_path / "out"
+    res = compare_workbooks(
+        str(tmp_path / "a.xlsx"), str(tmp_path / "b.xlsx"), op="lookup", pairing="stack",
+        out_path=str(out), out_format="csv", col_a="B", col_b="B",
+    )
+
+    assert res["not_found"] == 1
+    df = pd.read_csv(out / "A_with_lookups.csv", dtype=str)
+    assert list(df.columns[:3]) == ["_sheet_2", "id", "_sheet"]
+    assert df["_sheet_2"].tolist() == ["S1", "S2"]
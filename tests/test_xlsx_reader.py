@@ -0,0 +1,170 @@
+# the fast reader is the default; its grids must be what openpyxl's read-only reader gives
+import datetime
+import math
+import zipfile
+
+import openpyxl
+import pytest
+
+import compare_core
+import xlsx_reader
+from compare_core import _grid_from_rows
+
+CONTENT_TYPES = """<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">
+<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>
+<Default Extension="xml" ContentType="application/xml"/>
+<Override PartName="/xl/workbook.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>
+<Override PartName="/xl/worksheets/sheet1.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>
+<Override PartName="/xl/worksheets/sheet2.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>
+<Override PartName="/xl/sharedStrings.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sharedStrings+xml"/>
+<Override PartName="/xl/styles.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.styles+xml"/>
+</Types>"""
+ROOT_RELS = """<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">
+<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" Target="xl/workbook.xml"/>
+</Relationships>"""
+WORKBOOK = """<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">
+<sheets><sheet name="Cells" sheetId="1" r:id="rId1"/><sheet name="Sparse &amp; more" sheetId="2" r:id="rId2"/></sheets>
+</workbook>"""
+WB_RELS = """<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">
+<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" Target="worksheets/sheet1.xml"/>
+<Relationship Id="rId2" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" Target="worksheets/sheet2.xml"/>
+<Relationship Id="rId3" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/sharedStrings" Target="sharedStrings.xml"/>
+<Relationship Id="rId4" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/styles" Target="styles.xml"/>
+</Relationships>"""
+STYLES = """<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<styleSheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">
+<numFmts count="2"><numFmt numFmtId="164" formatCode="yyyy\\-mm\\-dd\\ hh:mm:ss"/><numFmt numFmtId="165" formatCode="0.000"/></numFmts>
+<fonts count="1"><font><sz val="11"/><name val="Calibri"/></font></fonts>
+<fills count="1"><fill><patternFill patternType="none"/></fill></fills>
+<borders count="1"><border/></borders>
+<cellStyleXfs count="1"><xf numFmtId="0" fontId="0" fillId="0" borderId="0"/></cellStyleXfs>
+<cellXfs count="6">
+<xf numFmtId="0" fontId="0" fillId="0" borderId="0" xfId="0"/>
+<xf numFmtId="14" fontId="0" fillId="0" borderId="0" xfId="0" applyNumberFormat="1"/>
+<xf numFmtId="164" fontId="0" fillId="0" borderId="0" xfId="0" applyNumberFormat="1"/>
+<xf numFmtId="21" fontId="0" fillId="0" borderId="0" xfId="0" applyNumberFormat="1"/>
+<xf numFmtId="10" fontId="0" fillId="0" borderId="0" xfId="0" applyNumberFormat="1"/>
+<xf numFmtId="165" fontId="0" fillId="0" borderId="0" xfId="0" applyNumberFormat="1"/>
+</cellXfs>
+<cellStyles count="1"><cellStyle name="Normal" xfId="0" builtinId="0"/></cellStyles>
+</styleSheet>"""
+SHARED_STRINGS = """<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<sst xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" count="6" uniqueCount="6">
+<si><t>id</t></si>
+<si><t>text</t></si>
+<si><t>a&amp;b &lt;c&gt; &quot;q&quot; &apos;s&apos;</t></si>
+<si><r><t xml:space="preserve">  lead</t></r><r><rPr><b/></rPr><t xml:space="preserve">ing  </t></r></si>
+<si><t>line&#10;break&#x9;tab &#128;&#x20AC;&#x1F600;</t></si>
+<si><t>ﻙﯼ فارسی ۱۲۳</t></si>
+</sst>"""
+SHEET1 = """<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"><dimension ref="A1:F9"/><sheetData>
+<row r="1"><c r="A1" t="s"><v>0</v></c><c r="B1" t="s"><v>1</v></c><c r="C1" t="inlineStr"><is><t>value</t></is></c><c r="D1" t="str"><v>kind</v></c></row>
+<row r="2"><c r="A2"><v>1</v></c><c r="B2" t="s"><v>2</v></c><c r="C2" t="b"><v>1</v></c><c r="D2" t="e"><v>#N/A</v></c></row>
+<row r="4"><c r="A4"><v>2.5</v></c><c r="C4" s="1"><v>45000</v></c><c r="D4" s="2"><v>45000.5</v></c></row>
+<row r="5"><c r="A5"><v>-1E-3</v></c><c r="B5" t="inlineStr"><is><t>x &amp; &#128;&#x20AC;&#13;&#x1F600;</t></is></c><c r="C5" s="3"><v>0.25</v></c><c r="E5" s="4"><v>0.125</v></c></row>
+<row r="6"><c r="A6" t="b"><v>0</v></c><c r="B6" t="s"><v>3</v></c><c r="C6" t="str"><f>A1&amp;"x"</f><v>idx &lt;&gt;</v></c><c r="D6" t="e"><v>#DIV/0!</v></c></row>
+<row r="7"><c r="A7" t="s"><v>4</v></c><c r="B7" t="s"><v>5</v></c><c r="C7" s="5"><v>3.14159</v></c></row>
+<row r="8"><c r="F8"><v>12345678901234567</v></c><c r="G8" s="1"/></row>
+<row r="9"><c r="A9" s="1"/><c r="B9" s="2"/></row>
+</sheetData></worksheet>"""
+SHEET2 = """<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"><sheetData>
+<row r="3" spans="2:3"><c r="B3" t="inlineStr"><is><t>k</t></is></c><c r="C3" t="inlineStr"><is><t>v</t></is></c></row>
+<row r="10"><c r="AA10"><v>7</v></c></row>
+<row r="11"><c r="B11" t="inlineStr"><is><t></t></is></c><c r="C11" t="s"><v>0</v></c></row>
+</sheetData></worksheet>"""
+
+
+
+def _write_package(path, sheet2=SHEET2):
+    parts = {
+        "[Content_Types].xml": CONTENT_TYPES,
+        "_rels/.rels": ROOT_RELS,
+        "xl/workbook.xml": WORKBOOK,
+        "xl/_rels/workbook.xml.rels": WB_RELS,
+        "xl/styles.xml": STYLES,
+        "xl/sharedStrings.xml": SHARED_STRINGS,
+        "xl/worksheets/sheet1.xml": SHEET1,
+        "xl/worksheets/sheet2.xml": sheet2,
+    }
+    with zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED) as zf:
+        for name, data in parts.items():
+            zf.writestr(name, data)
+    return str(path)
+
+
+def _plain(grid):
+    # NaN (error cells) compares unequal to itself; keep the type so 1 / 1.0 / True stay apart
+    return [[("nan" if isinstance(v, float) and math.isnan(v) else (type(v).__name__, v)) for v in row] for row in grid]
+
+
+def _openpyxl_grids(path, monkeypatch, max_rows=None):
+    monkeypatch.setattr(compare_core, "EXCEL_READER", "openpyxl")
+    names = compare_core.get_excel_sheet_names(path)
+    return [(name, compare_core.read_excel_raw_grid(path, name, max_rows=max_rows)) for name in names]
+
+
+def _fast_grids(path, max_rows=None):
+    # straight from XlsxPackage: an XlsxLayoutError must fail the test, not fall back to openpyxl
+    with xlsx_reader.XlsxPackage(path) as pkg:
+        return [(name, _grid_from_rows(pkg.iter_rows(name, max_rows))) for name in pkg.sheet_names]
+
+
+@pytest.fixture
+def handmade(tmp_path):
+    # shared (plain, escaped, rich text), inline and formula strings, bools, errors, date / datetime / time
+    # styles, numbers, character references and sparse rows and columns
+    return _write_package(tmp_path / "handmade.xlsx")
+
+
+@pytest.fixture
+def written(tmp_path):
+    path = tmp_path / "written.xlsx"
+    wb = openpyxl.Workbook()
+    ws = wb.active
+    ws.title = "Data"
+    ws.append(["id", "name", "amount", "when", "flag"])
+    ws.append([1, "a & b <c>", 10.5, datetime.datetime(2024, 2, 29, 13, 45), True])
+    ws.append([2, "  spaced  ", -3, datetime.date(1999, 12, 31), False])
+    ws.append([])
+    ws.append([None, "\u0643\u064a \u06f1\u06f2", 1e-9, datetime.time(8, 30), None])
+    ws["H9"] = "far"
+    ws["C7"] = "=A2+A3"
+    other = wb.create_sheet("Second")
+    other["B2"] = "only cell"
+    wb.save(path)
+    return str(path)
+
+
+@pytest.mark.parametrize("book", ["handmade", "written"])
+@pytest.mark.parametrize("max_rows", [None, 1, 3])
+def test_fast_reader_matches_openpyxl(request, monkeypatch, book, max_rows):
+    path = request.getfixturevalue(book)
+    fast = _fast_grids(path, max_rows)
+    expected = _openpyxl_grids(path, monkeypatch, max_rows)
+    assert [name for name, _ in fast] == [name for name, _ in expected]
+    for (name, got), (_, want) in zip(fast, expected):
+        assert _plain(got) == _plain(want), name
+
+
+def test_handmade_cells(handmade):
+    grid = dict(_fast_grids(handmade))["Cells"]
+    assert grid[1][1] == "a&b <c> \"q\" 's'"
+    assert grid[4][1] == "x & \x80\u20ac\r\U0001f600"
+    assert grid[5][1] == "  leading  "
+    assert grid[3][2] == datetime.datetime(2023, 3, 15)
+    assert grid[4][2] == datetime.time(6, 0)
+    assert math.isnan(grid[1][3])
+
+
+@pytest.mark.parametrize("reference", ["&amp", "&nbsp;", "&#0;"])
+def test_malformed_references_are_not_guessed(tmp_path, reference):
+    # html.unescape would accept these; XML does not, so the fast reader hands the file to openpyxl
+    path = _write_package(tmp_path / "bad.xlsx", sheet2=SHEET2.replace("<t>k</t>", f"<t>k{reference}</t>"))
+    with pytest.raises(xlsx_reader.XlsxLayoutError):
+        _fast_grids(path)
@@ -0,0 +1,47 @@
+# worker.py
+import queue
+import threading
+from typing import Callable
+
+from compare_core import JobCancelled
+
+
+class BackgroundJob:
+    # Runs fn(progress=..., **kwargs) on a daemon thread. The UI polls `events`
+    # for ("stage", name), ("done", result), ("error", exc) and ("cancelled", stage).
+    def __init__(self, fn: Callable, **kwargs):
+        self.fn = fn
+        self.kwargs = kwargs
+        self.events: queue.Queue = queue.Queue()
+        self._cancel = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self) -> "BackgroundJob":
+        self._thread.start()
+        return self
+
+    def cancel(self) -> None:
+        self._cancel.set()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancel.is_set()
+
+    def is_alive(self) -> bool:
+        return self._thread.is_alive()
+
+    def _progress(self, stage: str) -> None:
+        # stage boundaries are the cancellation points
+        if self._cancel.is_set():
+            raise JobCancelled(stage)
+        self.events.put(("stage", stage))
+
+    def _run(self) -> None:
+        try:
+            result = self.fn(progress=self._progress, **self.kwargs)
+        except JobCancelled as e:
+            self.events.put(("cancelled", str(e)))
+        except Exception as e:
+            self.events.put(("error", e))
+        else:
+            self.events.put(("done", result))
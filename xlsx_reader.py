@@ -0,0 +1,411 @@
+# xlsx_reader.py
+# Fast xlsx reader: the sheet XML and the shared-strings table are parsed straight from the zip with
+# iterparse, no openpyxl workbook or cell objects. Values come out as openpyxl's read_only/data_only
+# reader returns them (shared strings, numbers, bools, dates by number format), so callers see the same grid.
+import posixpath
+import re
+import zipfile
+from typing import Callable, Dict, Iterator, List, Optional, Set, Tuple, Union
+from xml.etree.ElementTree import ParseError, fromstring, iterparse
+
+from openpyxl.styles.numbers import BUILTIN_FORMATS, is_date_format, is_timedelta_format
+from openpyxl.utils.datetime import CALENDAR_MAC_1904, WINDOWS_EPOCH, from_excel, from_ISO8601
+
+_MAIN = "{http://schemas.openxmlformats.org/spreadsheetml/2006/main}"
+_REL = "{http://schemas.openxmlformats.org/officeDocument/2006/relationships}"
+_PKG_REL = "{http://schemas.openxmlformats.org/package/2006/relationships}"
+
+_ROW = _MAIN + "row"
+_CELL = _MAIN + "c"
+_VALUE = _MAIN + "v"
+_INLINE = _MAIN + "is"
+_TEXT = _MAIN + "t"
+_RUN = _MAIN + "r"
+_SI = _MAIN + "si"
+_DIMENSION = _MAIN + "dimension"
+_SHEET_DATA = _MAIN + "sheetData"
+
+_COORD = re.compile(r"([A-Z]+)(\d+)")
+_DIGITS = "0123456789"
+_ROOT_OPEN = re.compile(rb"<(?![?!])([\w.:-]+)[^>]*>")
+_SHEET_DATA_OPEN = re.compile(rb"<((?:[\w.-]+:)?)sheetData(?:\s[^>]*?)?(/?)>")
+# a cell as Excel writes it: r, s, t attributes (s before or after t), an optional formula, then <v> or <is>
+_CELL_SCAN = re.compile(
+    r'<c r="([A-Z]+)(\d+)"(?: s="(\d+)")?(?: t="(\w+)")?(?: s="(\d+)")?\s*'
+    r"(?:/>|>(?:<f\b[^>]*?(?:/>|>[^<]*</f>))?(?:<v>([^<]*)</v>|<is>(.*?)</is>)?</c>)",
+    re.S,
+)
+_PLAIN_INLINE = re.compile(r'<t(?: xml:space="preserve")?>([^<]*)</t>')
+# the references XML defines: the five predefined entities and numeric character references
+_XML_REF = re.compile(r"&(?:(amp|lt|gt|quot|apos)|#([0-9]+)|#x([0-9a-fA-F]+));|&")
+_XML_ENTITIES = {"amp": "&", "lt": "<", "gt": ">", "quot": '"', "apos": "'"}
+
+# compressed sheet XML is inflated and parsed this many bytes at a time
+ROW_BLOCK_BYTES = 1 << 20
+
+
+class XlsxLayoutError(ValueError):
+    # the package uses a layout this reader does not handle; callers fall back to openpyxl
+    pass
+
+
+def _column_index(letters: str) -> int:
+    # 1-based, as in the cell reference
+    n = 0
+    for ch in letters:
+        n = n * 26 + ord(ch) - 64
+    return n
+
+
+def _has(zf: zipfile.ZipFile, member: Optional[str]) -> bool:
+    try:
+        zf.getinfo(member)
+        return True
+    except (KeyError, TypeError):
+        return False
+
+
+def _rels(zf: zipfile.ZipFile, part: str) -> Dict[str, Tuple[str, str]]:
+    # relationship id -> (type, member path) for a part
+    folder, name = posixpath.split(part)
+    rels_path = posixpath.join(folder, "_rels", name + ".rels")
+    if not _has(zf, rels_path):
+        return {}
+    out = {}
+    for _, el in iterparse(zf.open(rels_path)):
+        if el.tag == _PKG_REL + "Relationship" and el.get("TargetMode") != "External":
+            target = el.get("Target", "")
+            path = target.lstrip("/") if target.startswith("/") else posixpath.normpath(posixpath.join(folder, target))
+            out[el.get("Id")] = (el.get("Type", "").rsplit("/", 1)[-1], path)
+    return out
+
+
+def _text_content(el) -> str:
+    # plain <t> plus the <t> of every rich text run; phonetic runs are skipped
+    parts = []
+    plain = el.find(_TEXT)
+    if plain is not None and plain.text:
+        parts.append(plain.text)
+    for run in el.iterfind(_RUN):
+        t = run.find(_TEXT)
+        if t is not None and t.text:
+            parts.append(t.text)
+    return "".join(parts)
+
+
+class XlsxPackage:
+    """Workbook-level parts of an xlsx (sheet list, shared strings, date styles) read once per open."""
+
+    def __init__(self, path: str):
+        self.zf = zipfile.ZipFile(path)
+        try:
+            self._read_workbook()
+        except Exception:
+            self.zf.close()
+            raise
+        self._strings: Optional[List[str]] = None
+        self._styles: Optional[Tuple[Set[int], Set[int]]] = None
+        # per-sheet scan state: root start/end tags wrapped around row blocks, column letters -> index
+        self._wrap = (b"", b"")
+        self._columns: Dict[str, int] = {}
+        self._row_counter = 0
+
+    def close(self) -> None:
+        self.zf.close()
+
+    def __enter__(self) -> "XlsxPackage":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def _read_workbook(self) -> None:
+        office = [p for kind, p in _rels(self.zf, "").values() if kind == "officeDocument"]
+        if not office or not _has(self.zf, office[0]):
+            raise XlsxLayoutError("No workbook part")
+        self.workbook_part = office[0]
+        rels = _rels(self.zf, self.workbook_part)
+
+        # (name, kind, member) in workbook order; kind is "worksheet" for sheets with cells
+        self.sheets: List[Tuple[str, str, str]] = []
+        self.epoch = WINDOWS_EPOCH
+        for _, el in iterparse(self.zf.open(self.workbook_part)):
+            if el.tag == _MAIN + "sheet":
+                kind, member = rels.get(el.get(_REL + "id"), ("", ""))
+                self.sheets.append((el.get("name"), kind, member))
+            elif el.tag == _MAIN + "workbookPr" and el.get("date1904", "").lower() in ("1", "true"):
+                self.epoch = CALENDAR_MAC_1904
+        self._parts = {kind: member for kind, member in rels.values() if kind in ("sharedStrings", "styles")}
+
+    @property
+    def sheet_names(self) -> List[str]:
+        return [name for name, _, _ in self.sheets]
+
+    def _worksheet_member(self, sheet: Union[str, int, None]) -> str:
+        worksheets = [(name, member) for name, kind, member in self.sheets if kind == "worksheet"]
+        if sheet is None or isinstance(sheet, int):
+            name, member = worksheets[sheet or 0]
+        else:
+            if sheet not in self.sheet_names:
+                raise KeyError(f"Worksheet {sheet} does not exist.")
+            found = [member for name, member in worksheets if name == sheet]
+            if not found:
+                raise XlsxLayoutError(f"{sheet} is not a worksheet")
+            member = found[0]
+        if not _has(self.zf, member):
+            raise XlsxLayoutError(f"Missing worksheet part {member}")
+        return member
+
+    @property
+    def shared_strings(self) -> List[str]:
+        if self._strings is None:
+            strings = []
+            member = self._parts.get("sharedStrings")
+            if _has(self.zf, member):
+                for _, el in iterparse(self.zf.open(member)):
+                    if el.tag == _SI:
+                        strings.append(_text_content(el).replace("x005F_", ""))
+                        el.clear()
+            self._strings = strings
+        return self._strings
+
+    @property
+    def date_styles(self) -> Tuple[Set[int], Set[int]]:
+        # cell style indices whose number format is a date / a duration
+        if self._styles is None:
+            dates, durations = set(), set()
+            member = self._parts.get("styles")
+            if _has(self.zf, member):
+                custom, xfs, in_cell_xfs = {}, [], False
+                for event, el in iterparse(self.zf.open(member), events=("start", "end")):
+                    if el.tag == _MAIN + "cellXfs":
+                        in_cell_xfs = event == "start"
+                    elif event == "end" and el.tag == _MAIN + "numFmt":
+                        custom[int(el.get("numFmtId"))] = el.get("formatCode")
+                    elif event == "end" and el.tag == _MAIN + "xf" and in_cell_xfs:
+                        xfs.append(int(el.get("numFmtId", 0)))
+                for idx, fmt_id in enumerate(xfs):
+                    fmt = custom.get(fmt_id, BUILTIN_FORMATS.get(fmt_id))
+                    if is_date_format(fmt):
+                        dates.add(idx)
+                    if is_timedelta_format(fmt):
+                        durations.add(idx)
+            self._styles = dates, durations
+        return self._styles
+
+    def dimension_max_column(self, sheet: Union[str, int, None]) -> Optional[int]:
+        # last column of the sheet's <dimension ref>, read without parsing the cells; None if absent
+        for _, el in iterparse(self.zf.open(self._worksheet_member(sheet))):
+            if el.tag == _DIMENSION:
+                m = _COORD.findall(el.get("ref", ""))
+                return _column_index(m[-1][0]) if m else None
+            if el.tag in (_SHEET_DATA, _ROW):
+                return None
+        return None
+
+    def _row_blocks(self, member: str) -> Iterator[Tuple[bytes, bytes]]:
+        # (prefix, block) for the <row> elements of sheetData, a block of whole rows at a time; prefix is the
+        # namespace prefix the sheet uses for its elements (b"" for the default namespace)
+        with self.zf.open(member) as f:
+            buf, prefix, rows_end, data_end = b"", None, None, None
+            while True:
+                data = f.read(ROW_BLOCK_BYTES)
+                buf += data
+                if prefix is None:
+                    m = _SHEET_DATA_OPEN.search(buf)
+                    if m is None:
+                        if not data:
+                            raise XlsxLayoutError(f"No sheetData in {member}")
+                        continue
+                    if m.group(2):  # <sheetData/>
+                        return
+                    root = _ROOT_OPEN.search(buf)
+                    self._wrap = root.group(0), b"</" + root.group(1) + b">"
+                    prefix = m.group(1)
+                    rows_end, data_end = b"</" + prefix + b"row>", b"</" + prefix + b"sheetData>"
+                    buf = buf[m.end():]
+
+                stop = buf.find(data_end)
+                if stop >= 0:
+                    cut = stop
+                else:
+                    cut = buf.rfind(rows_end)
+                    cut = cut + len(rows_end) if cut >= 0 else 0
+                if cut:
+                    yield prefix, buf[:cut]
+                    buf = buf[cut:]
+                if stop >= 0:
+                    return
+                if not data:
+                    raise XlsxLayoutError(f"Truncated sheetData in {member}")
+
+    def _scanned_rows(self, block: str, convert: Callable) -> Optional[List[Tuple[int, list]]]:
+        # (row number, values) of a block by one regex pass over its cells; None when some cell is not in the
+        # plain form Excel and most writers emit (r/s/t attributes, a <v> or a one-<t> inline string)
+        cells = _CELL_SCAN.findall(block)
+        if len(cells) != block.count("<c ") + block.count("<c>"):
+            return None
+        columns = self._columns
+        strings = self.shared_strings
+        dates = self.date_styles[0]
+        rows: List[Tuple[int, list]] = []
+        current, values = None, None
+        for letters, number, style, kind, style_after, value, inline in cells:
+            if number != current:
+                current, values = number, []
+                rows.append((int(number), values))
+            # plain numbers and shared strings inline; everything else through convert
+            style = style or style_after
+            if not value:
+                if kind == "inlineStr":
+                    m = _PLAIN_INLINE.fullmatch(inline)
+                    if m is None:
+                        return None
+                    value = _xml_text(m.group(1))
+                elif inline:
+                    return None
+                else:
+                    value = None
+            elif kind == "s":
+                value = strings[int(value)]
+            elif (not kind or kind == "n") and not (style and int(style) in dates):
+                value = float(value) if ("." in value or "E" in value or "e" in value) else int(value)
+            elif kind == "inlineStr":
+                return None
+            else:
+                value = convert(kind or "n", value, style)
+
+            col = columns.get(letters)
+            if col is None:
+                col = columns[letters] = _column_index(letters)
+            if col == len(values) + 1:
+                values.append(value)
+            elif col > len(values):
+                values.extend([None] * (col - len(values) - 1))
+                values.append(value)
+            else:
+                values[col - 1] = value
+        return rows
+
+    def _parsed_rows(self, block: bytes, convert: Callable) -> Iterator[Tuple[int, list]]:
+        # (row number, values) of a block parsed by the C XML parser inside a copy of the root start tag
+        try:
+            rows = fromstring(self._wrap[0] + block + self._wrap[1])
+        except ParseError as e:
+            raise XlsxLayoutError(f"Unreadable sheet rows: {e}") from e
+        columns = self._columns
+        for row in rows:
+            if row.tag != _ROW:
+                continue
+            r = row.get("r")
+            self._row_counter = int(r) if r else self._row_counter + 1
+            values = []
+            col = 0
+            for c in row:
+                if c.tag != _CELL:
+                    continue
+                ref = c.get("r")
+                if ref:
+                    letters = ref.rstrip(_DIGITS)
+                    col = columns.get(letters) or columns.setdefault(letters, _column_index(letters))
+                else:
+                    col += 1
+                kind = c.get("t", "n")
+                value = None
+                if kind == "inlineStr":
+                    for child in c:
+                        if child.tag == _INLINE:
+                            value = _text_content(child)
+                            break
+                else:
+                    for child in c:
+                        if child.tag == _VALUE:
+                            value = child.text or None
+                            break
+                    value = convert(kind, value, c.get("s"))
+                if col > len(values):
+                    values.extend([None] * (col - len(values)))
+                values[col - 1] = value
+            yield self._row_counter, values
+
+    def _converter(self) -> Callable:
+        strings = self.shared_strings
+        dates, durations = self.date_styles
+        epoch = self.epoch
+
+        def convert(kind: str, value: Optional[str], style: Optional[str]) -> object:
+            # a <v> text as openpyxl's read_only/data_only reader returns it
+            if value is None:
+                return None
+            if kind == "n":
+                value = float(value) if ("." in value or "E" in value or "e" in value) else int(value)
+                if style and int(style) in dates:
+                    try:
+                        return from_excel(value, epoch, timedelta=int(style) in durations)
+                    except (OverflowError, ValueError):
+                        return "#VALUE!"
+                return value
+            if kind == "s":
+                return strings[int(value)]
+            if kind == "b":
+                return bool(int(value))
+            if kind == "d":
+                return from_ISO8601(value)
+            return value
+
+        return convert
+
+    def iter_rows(self, sheet: Union[str, int, None], max_rows: Optional[int] = None) -> Iterator[list]:
+        # one list per sheet row from row 1, values by column with None in the gaps and [] for rows
+        # missing from the XML, like openpyxl's iter_rows(values_only=True) after reset_dimensions()
+        convert = self._converter()
+        # entities and line ends in <v> / inline text are resolved by _xml_text on the scanned path
+        convert_raw = _text_converter(convert)
+        self._columns = {}
+        self._row_counter = 0
+        row_number = 0
+        for prefix, block in self._row_blocks(self._worksheet_member(sheet)):
+            rows = None
+            if not prefix:
+                rows = self._scanned_rows(block.decode("utf-8"), convert_raw)
+                if rows:
+                    self._row_counter = rows[-1][0]
+            for number, values in rows if rows is not None else self._parsed_rows(block, convert):
+                if max_rows is not None and number > max_rows:
+                    return
+                for _ in range(row_number + 1, number):
+                    yield []
+                row_number = number
+                yield values
+
+
+def _xml_reference(m: "re.Match") -> str:
+    name, dec, hexa = m.groups()
+    if name:
+        return _XML_ENTITIES[name]
+    code = int(dec) if dec else int(hexa, 16) if hexa else -1
+    if code in (0x9, 0xA, 0xD) or 0x20 <= code <= 0xD7FF or 0xE000 <= code <= 0xFFFD or 0x10000 <= code <= 0x10FFFF:
+        return chr(code)
+    # the XML parser (and so openpyxl) rejects the sheet; the caller falls back to openpyxl for its error
+    raise XlsxLayoutError(f"Invalid XML reference {m.group(0)!r}")
+
+
+def _xml_text(text: str) -> str:
+    # character data as an XML parser reports it: line ends normalized, then references resolved
+    if "\r" in text:
+        text = text.replace("\r\n", "\n").replace("\r", "\n")
+    return _XML_REF.sub(_xml_reference, text) if "&" in text else text
+
+
+def _text_converter(convert: Callable) -> Callable:
+    def convert_raw(kind: str, value: Optional[str], style: Optional[str]) -> object:
+        if value is not None and kind not in ("n", "s", "b"):
+            value = _xml_text(value)
+        return convert(kind, value, style)
+
+    return convert_raw
+
+
+def read_sheet_names(path: str) -> List[str]:
+    with XlsxPackage(path) as pkg:
+        return pkg.sheet_names
@@ -0,0 +1,199 @@
+# xlsx_writer.py
+# Minimal constant-memory xlsx writer: each worksheet is streamed straight into the zip
+# as rows arrive, cells are written as inline strings / numbers, nothing is kept per cell.
+import datetime
+import math
+import re
+import zipfile
+from typing import Iterable, List, Optional
+from xml.sax.saxutils import escape
+
+_ILLEGAL_XML = re.compile("[\x00-\x08\x0b\x0c\x0e-\x1f\ufffe\uffff]")
+_EPOCH = datetime.datetime(1899, 12, 30)
+
+STYLE_DEFAULT = 0
+STYLE_HEADER = 1
+STYLE_DATETIME = 2
+
+_CONTENT_TYPES = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+    '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+    '<Default Extension="xml" ContentType="application/xml"/>'
+    '<Override PartName="/xl/workbook.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+    '<Override PartName="/xl/styles.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.styles+xml"/>'
+    "{sheets}"
+    "</Types>"
+)
+
+_ROOT_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" '
+    'Target="xl/workbook.xml"/>'
+    "</Relationships>"
+)
+
+_STYLES = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<styleSheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+    '<numFmts count="1"><numFmt numFmtId="164" formatCode="yyyy-mm-dd hh:mm:ss"/></numFmts>'
+    '<fonts count="2"><font><sz val="11"/><name val="Calibri"/></font>'
+    '<font><b/><sz val="11"/><name val="Calibri"/></font></fonts>'
+    '<fills count="2"><fill><patternFill patternType="none"/></fill>'
+    '<fill><patternFill patternType="gray125"/></fill></fills>'
+    '<borders count="1"><border><left/><right/><top/><bottom/><diagonal/></border></borders>'
+    '<cellStyleXfs count="1"><xf numFmtId="0" fontId="0" fillId="0" borderId="0"/></cellStyleXfs>'
+    '<cellXfs count="3">'
+    '<xf numFmtId="0" fontId="0" fillId="0" borderId="0" xfId="0"/>'
+    '<xf numFmtId="0" fontId="1" fillId="0" borderId="0" xfId="0" applyFont="1"/>'
+    '<xf numFmtId="164" fontId="0" fillId="0" borderId="0" xfId="0" applyNumberFormat="1"/>'
+    "</cellXfs>"
+    '<cellStyles count="1"><cellStyle name="Normal" xfId="0" builtinId="0"/></cellStyles>'
+    "</styleSheet>"
+)
+
+_SHEET_HEAD = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+    "<sheetData>"
+)
+_SHEET_TAIL = "</sheetData></worksheet>"
+
+
+def _col_letter(idx0: int) -> str:
+    n = idx0 + 1
+    letters = ""
+    while n:
+        n, rem = divmod(n - 1, 26)
+        letters = chr(rem + ord("A")) + letters
+    return letters
+
+
+def _text(value: str) -> str:
+    if _ILLEGAL_XML.search(value):
+        value = _ILLEGAL_XML.sub("", value)
+    value = escape(value[:32767])
+    if value[:1].isspace() or value[-1:].isspace():
+        return f'<is><t xml:space="preserve">{value}</t></is>'
+    return f"<is><t>{value}</t></is>"
+
+
+def _cell(ref: str, value: object, style: int) -> str:
+    s = f' s="{style}"' if style else ""
+    if isinstance(value, str):
+        return f'<c r="{ref}" t="inlineStr"{s}>{_text(value)}</c>'
+    if isinstance(value, bool):
+        return f'<c r="{ref}" t="b"{s}><v>{int(value)}</v></c>'
+    if isinstance(value, (int, float)):
+        if isinstance(value, float) and not math.isfinite(value):
+            return ""
+        return f'<c r="{ref}"{s}><v>{value!r}</v></c>'
+    if isinstance(value, datetime.datetime):
+        if value.tzinfo is not None:
+            value = value.replace(tzinfo=None)
+        serial = (value - _EPOCH).total_seconds() / 86400
+        return f'<c r="{ref}" s="{STYLE_DATETIME}"><v>{serial!r}</v></c>'
+    if isinstance(value, datetime.date):
+        serial = (datetime.datetime(value.year, value.month, value.day) - _EPOCH).days
+        return f'<c r="{ref}" s="{STYLE_DATETIME}"><v>{serial}</v></c>'
+    return f'<c r="{ref}" t="inlineStr"{s}>{_text(str(value))}</c>'
+
+
+class StreamSheet:
+    def __init__(self, stream):
+        self._stream = stream
+        self._letters: List[str] = []
+        self.rows = 0
+
+    def append(self, row: Iterable[object], style: int = STYLE_DEFAULT) -> None:
+        row = tuple(row)
+        if len(row) > len(self._letters):
+            self._letters += [_col_letter(i) for i in range(len(self._letters), len(row))]
+        self.rows += 1
+        r = self.rows
+        letters = self._letters
+        cells = "".join(
+            _cell(f"{letters[i]}{r}", v, style) for i, v in enumerate(row) if v is not None
+        )
+        self._stream.write(f'<row r="{r}">{cells}</row>'.encode("utf-8"))
+
+
+class StreamWorkbook:
+    # Only one sheet is open at a time; add_sheet() closes the previous one.
+    def __init__(self, path: str):
+        self._zip = zipfile.ZipFile(path, "w", compression=zipfile.ZIP_DEFLATED, compresslevel=1)
+        self._names: List[str] = []
+        self._stream = None
+
+    def add_sheet(self, name: str) -> StreamSheet:
+        self._close_sheet()
+        self._names.append(name[:31])
+        self._stream = self._zip.open(f"xl/worksheets/sheet{len(self._names)}.xml", "w", force_zip64=True)
+        self._stream.write(_SHEET_HEAD.encode("utf-8"))
+        return StreamSheet(self._stream)
+
+    def _close_sheet(self) -> None:
+        if self._stream is not None:
+            self._stream.write(_SHEET_TAIL.encode("utf-8"))
+            self._stream.close()
+            self._stream = None
+
+    def close(self) -> None:
+        if not self._names:
+            self.add_sheet("Sheet1")
+        self._close_sheet()
+        n = len(self._names)
+        sheet_types = "".join(
+            f'<Override PartName="/xl/worksheets/sheet{i}.xml" '
+            'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+            for i in range(1, n + 1)
+        )
+        sheets = "".join(
+            f'<sheet name="{escape(name, {chr(34): "&quot;"})}" sheetId="{i}" r:id="rId{i}"/>'
+            for i, name in enumerate(self._names, start=1)
+        )
+        rels = "".join(
+            f'<Relationship Id="rId{i}" '
+            'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" '
+            f'Target="worksheets/sheet{i}.xml"/>'
+            for i in range(1, n + 1)
+        )
+        rels += (
+            f'<Relationship Id="rId{n + 1}" '
+            'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/styles" '
+            'Target="styles.xml"/>'
+        )
+        self._zip.writestr("[Content_Types].xml", _CONTENT_TYPES.format(sheets=sheet_types))
+        self._zip.writestr("_rels/.rels", _ROOT_RELS)
+        self._zip.writestr(
+            "xl/workbook.xml",
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+            '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+            'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+            f"<sheets>{sheets}</sheets></workbook>",
+        )
+        self._zip.writestr(
+            "xl/_rels/workbook.xml.rels",
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+            '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+            f"{rels}</Relationships>",
+        )
+        self._zip.writestr("xl/styles.xml", _STYLES)
+        self._zip.close()
+
+    def __enter__(self) -> "StreamWorkbook":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> Optional[bool]:
+        if exc_type is None:
+            self.close()
+        else:
+            if self._stream is not None:
+                self._stream.close()
+                self._stream = None
+            self._zip.close()
+        return None